@@ -3,14 +3,14 @@ from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
 import difflib
 
-from rag.validate import VALIDATE_MAP, validate_common
-from rag.core import ValidationResult
+from rag.validate import evaluate
+from rag.core import ValidationResult, validate_rag_confidence
 from rag.chunk import split_text, Chunk
 from rag.auto_fix import should_fix, fix_chunk_with_llm
 from rag.fix_history import record_fix
-from rag.vector_store import add_chunk
-from rag.retriever import retrieve_chunks          # ★ 追加
-from rag.qa import answer_with_llm                  # ★ 追加
+from rag.retriever import get_retriever, retrieve_chunks  # ★ 追加
+from rag.qa import answer_with_llm, cite            # ★ 追加
+from rag.query_cache import cache_stats
 
 # =====================
 # Auto refresh (clock)
@@ -31,34 +31,35 @@ def detect_rule_key(text: str) -> str:
     return "default"
 
 # =====================
-# validator resolver
+# rule resolver
 # =====================
-def resolve_validators(rule_key: str):
-    validators = []
-    base = VALIDATE_MAP.get(rule_key)
-    validators.append(base if callable(base) else validate_common)
-
-    for k in ("require_citation", "rag_confidence"):
-        v = VALIDATE_MAP.get(k)
-        if callable(v):
-            validators.append(v)
-
-    return validators
+def resolve_rule_keys(rule_key: str):
+    return [rule_key, "require_citation", "rag_confidence"]
 
 # =====================
 # validation (chunk-aware)
 # =====================
 def validate_chunk(chunk: Chunk):
     rule_key = detect_rule_key(chunk.text)
-    validators = resolve_validators(rule_key)
-
-    results: list[ValidationResult] = []
-    for v in validators:
-        results.extend(v(chunk.text))
+    results: list[ValidationResult] = evaluate(chunk.text, resolve_rule_keys(rule_key))
 
     errors = [r for r in results if not r.ok and r.severity == "error"]
     return rule_key, errors
 
+# =====================
+# store（検索と同じ backend に書く）
+# =====================
+def store_chunks(chunks: list[Chunk]):
+    """
+    retrieve_chunks と同じ RAG_RETRIEVER の backend に登録して永続化する
+    """
+    retriever = get_retriever()
+    retriever.add([
+        {"text": c.text, "source": c.source, "chunk_index": c.index}
+        for c in chunks
+    ])
+    retriever.flush()
+
 # =====================
 # diff renderer
 # =====================
@@ -106,6 +107,10 @@ if "chunks" not in st.session_state:
 if "merged_text" not in st.session_state:
     st.session_state.merged_text = ""
 
+# Vector DB 登録済み chunk（rerun のたびに再登録して index を変えないため）
+if "stored_chunks" not in st.session_state:
+    st.session_state.stored_chunks = set()
+
 # =====================
 # File upload
 # =====================
@@ -136,16 +141,15 @@ if uploaded_files:
 if st.session_state.chunks:
     st.subheader("🧩 チャンク単位検証結果")
 
+    passed_chunks: list[Chunk] = []
+
     for i, chunk in enumerate(st.session_state.chunks):
         rule, errors = validate_chunk(chunk)
 
-        # ---- OK → Vector DB 登録 ----
+        # ---- OK → Vector DB 登録（ループ後にまとめて、未登録分のみ） ----
         if not errors:
-            add_chunk(
-                text=chunk.text,
-                source=chunk.source,
-                chunk_index=chunk.index,
-            )
+            if (chunk.source, chunk.index, chunk.text) not in st.session_state.stored_chunks:
+                passed_chunks.append(chunk)
             continue
 
         with st.expander(
@@ -193,10 +197,9 @@ if st.session_state.chunks:
                     )
 
                     if not new_errors:
-                        add_chunk(
-                            text=new_chunk.text,
-                            source=new_chunk.source,
-                            chunk_index=new_chunk.index,
+                        store_chunks([new_chunk])
+                        st.session_state.stored_chunks.add(
+                            (new_chunk.source, new_chunk.index, new_chunk.text)
                         )
 
                         st.session_state.chunks[i] = new_chunk
@@ -206,6 +209,13 @@ if st.session_state.chunks:
                         )
                         st.rerun()
 
+    # ---- Vector DB へ一括登録 + 永続化 ----
+    if passed_chunks:
+        store_chunks(passed_chunks)
+        st.session_state.stored_chunks.update(
+            (c.source, c.index, c.text) for c in passed_chunks
+        )
+
     st.divider()
 
 # =====================
@@ -226,14 +236,33 @@ if question:
             question=question,
             contexts=contexts,
             llm_call=call_llm,
+            llm_name="call_llm",
         )
 
         st.markdown("### 🤖 回答")
         st.write(answer)
 
+        # ---- 検索類似度の確認（閾値未満なら LLM は呼ばれていない） ----
+        for r in validate_rag_confidence(
+            answer,
+            rag_scores=[c["score"] for c in contexts if c["score"] is not None],
+        ):
+            st.warning(f"{r.message}（{r.fix_hint}）")
+
         st.markdown("### 📚 参照元")
         for c in contexts:
-            st.caption(f"- {c['source']} / chunk {c['chunk_index']}")
+            score = "-" if c["score"] is None else f"{c['score']:.2f}"
+            st.caption(f"- {cite(c)}（類似度 {score}）")
+
+# =====================
+# Cache metrics
+# =====================
+with st.sidebar.expander("📈 キャッシュ"):
+    for name, s in cache_stats().items():
+        st.caption(
+            f"{name}: hit {s['hits']} / miss {s['misses']}"
+            f"（{s['hit_rate']:.0%}, {s['entries']} 件）"
+        )
 
 # =====================
 # Merged text
@@ -1,36 +1,35 @@
 ﻿# scripts/analyze_validation_errors.py
-import json
 from collections import Counter, defaultdict
 from pathlib import Path
 
-LOG_PATH = Path("logs/validation_errors.jsonl")
+from rag.log_analytics import LogAnalytics
+
+# 日付パーティション（logs/validation_errors/YYYY-MM-DD.jsonl）
+LOG_DIR = Path("logs/validation_errors")
 OUT_PATH = Path("logs/rule_candidates.md")
 
 MIN_COUNT = 2  # 何回以上出たら「ルール化候補」か
 
 
-def load_errors():
-    records = []
-    if not LOG_PATH.exists():
-        return records
+def load_message_counts():
+    """
+    [(rule, message, count)]（全パーティションの追記分だけを集計に取り込む）
+    """
+    if not LOG_DIR.exists():
+        return []
 
-    with LOG_PATH.open(encoding="utf-8") as f:
-        for line in f:
-            records.append(json.loads(line))
-    return records
+    with LogAnalytics(LOG_DIR) as la:
+        la.update()
+        return la.message_counts()
 
 
-def analyze(records):
+def analyze(rows):
     counter = Counter()
     by_rule = defaultdict(list)
 
-    for r in records:
-        rule = r["rule"]
-        for e in r["errors"]:
-            msg = e.get("message", "").strip()
-            if msg:
-                counter[msg] += 1
-                by_rule[rule].append(msg)
+    for rule, msg, count in rows:
+        counter[msg] += count
+        by_rule[rule].append(msg)
 
     return counter, by_rule
 
@@ -62,12 +61,12 @@ def generate_markdown(counter, by_rule):
 
 
 def main():
-    records = load_errors()
-    if not records:
+    rows = load_message_counts()
+    if not rows:
         print("No validation errors found.")
         return
 
-    counter, by_rule = analyze(records)
+    counter, by_rule = analyze(rows)
     md = generate_markdown(counter, by_rule)
 
     OUT_PATH.write_text(md, encoding="utf-8")
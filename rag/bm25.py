@@ -0,0 +1,149 @@
+# rag/bm25.py
+# 転置インデックスによる BM25 検索 + Reciprocal Rank Fusion
+#
+# MiniLM の embedding は ledc_channel_config / Wire.begin / GPIO 番号などの
+# 完全一致に弱いため、キーワード検索と組み合わせて使う。
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+# C/C++ 識別子（ドット区切りのメンバ呼び出しを含む）
+_IDENT_RE = re.compile(r"[a-z_][a-z0-9_]*(?:\.[a-z_][a-z0-9_]*)*")
+_NUM_RE = re.compile(r"\d+")
+# ひらがな・カタカナ・漢字の連続
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3005]+")
+# 識別子 + 数字のトークン（gpio12 → gpio / 12）
+_ALNUM_SPLIT_RE = re.compile(r"[a-z]+|\d+")
+
+_TOKEN_RE = re.compile(
+    "|".join((_IDENT_RE.pattern, _NUM_RE.pattern, _CJK_RE.pattern))
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    - 識別子はそのまま + '.' / '_' で分割した部分も（Wire.begin → wire.begin, wire, begin）
+    - 英数字混在は文字種で分割した部分も（gpio12 → gpio12, gpio, 12）
+    - 日本語は文字 bigram（1 文字だけなら unigram）
+    """
+    tokens: List[str] = []
+
+    for m in _TOKEN_RE.finditer(text.lower()):
+        tok = m.group(0)
+
+        if _CJK_RE.fullmatch(tok):
+            if len(tok) == 1:
+                tokens.append(tok)
+            else:
+                tokens.extend(tok[i:i + 2] for i in range(len(tok) - 1))
+            continue
+
+        tokens.append(tok)
+
+        parts = [p for p in re.split(r"[._]", tok) if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+
+        for p in parts:
+            pieces = _ALNUM_SPLIT_RE.findall(p)
+            if len(pieces) > 1:
+                tokens.extend(pieces)
+
+    return tokens
+
+
+class BM25Index:
+    """
+    追加・削除をインクリメンタルに行える BM25 インデックス
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._postings: Dict[str, Dict[Hashable, int]] = defaultdict(dict)
+        self._doc_len: Dict[Hashable, int] = {}
+        self._doc_terms: Dict[Hashable, List[str]] = {}
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, doc_id: Hashable, text: str):
+        tf = Counter(tokenize(text))
+
+        with self._lock:
+            if doc_id in self._doc_len:
+                self.remove(doc_id)
+
+            for term, n in tf.items():
+                self._postings[term][doc_id] = n
+
+            length = sum(tf.values())
+            self._doc_len[doc_id] = length
+            self._doc_terms[doc_id] = list(tf)
+            self._total_len += length
+
+    def add_many(self, docs: Iterable[Tuple[Hashable, str]]):
+        for doc_id, text in docs:
+            self.add(doc_id, text)
+
+    def remove(self, doc_id: Hashable):
+        with self._lock:
+            length = self._doc_len.pop(doc_id, None)
+            if length is None:
+                return
+            self._total_len -= length
+
+            for term in self._doc_terms.pop(doc_id):
+                del self._postings[term][doc_id]
+                if not self._postings[term]:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Hashable, float]]:
+        terms = set(tokenize(query))
+
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs or not terms:
+                return []
+
+            avgdl = self._total_len / n_docs
+            scores: Dict[Hashable, float] = defaultdict(float)
+
+            for term in terms:
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = 1 - self.b + self.b * self._doc_len[doc_id] / avgdl
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+
+
+def rrf_fuse(
+    rankings: Sequence[Sequence[Hashable]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[Hashable, float]]:
+    """
+    Reciprocal Rank Fusion: score(d) = Σ w_i / (k + rank_i(d))
+    rankings は各検索結果の id リスト（上位順）
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = defaultdict(float)
+
+    for ranking, w in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += w / (k + rank)
+
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
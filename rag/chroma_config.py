@@ -0,0 +1,23 @@
+# rag/chroma_config.py
+# Chroma の保存先・collection・行 id
+#
+# 検索（rag.retriever.ChromaRetriever）と書き込み（rag.ingest / scripts/ingest_docs.py）が
+# 別々の既定値を持つと、ingest したチャンクが検索から見えなくなるため、ここに一本化する。
+# dry-run の CLI からも読むので chromadb / numpy は import しない。
+from __future__ import annotations
+
+import os
+
+CHROMA_PATH = os.environ.get("RAG_CHROMA_PATH", "chroma_db")
+CHROMA_COLLECTION = os.environ.get("RAG_CHROMA_COLLECTION", "docs_collection")
+
+# score を他 backend とそろえるため cosine 距離を使う
+# （metadata は新規作成時だけ効く。既存の collection は元の space のまま）
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+
+def chunk_id(path, chunk_index) -> str:
+    """
+    Chroma の行 id（path + chunk 番号。upsert なので再実行しても重複しない）
+    """
+    return f"{path}_{chunk_index}"
@@ -1,5 +1,40 @@
+# rag/chunk.py
+# チャンク分割エンジン（rag.chunk.split_text / rag.ingest.chunker.chunk_text 共通）
+#
+# - Markdown の見出しでチャンクを区切り、```cpp などのコードフェンスの途中では切らない
+# - 段落は 。/. などの文境界で文に分け、文単位で詰める
+# - 予算は embedding モデルの tokenizer のトークン数（使えない環境では近似）
+# - ブロック検出は regex で段落ごとにまとめて行う。ファイルオブジェクトを渡せば少しずつ読むので全体をメモリに載せない
+# - iter_chunks_many は複数文書のトークン数・スコアをまとめて計算する
+from __future__ import annotations
+
+import os
+import re
+import threading
 from dataclasses import dataclass
-from typing import List
+from itertools import groupby, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import yaml
+
+from .embedding import EMBED_MODEL_NAME
+
+# all-MiniLM-L6-v2 の max_seq_length は 256（[CLS]/[SEP] 分の余裕をとる）
+MAX_TOKENS = 240
+OVERLAP_TOKENS = 32
+# tokenizer にまとめて渡す単位数 / score_chunks にまとめて渡すチャンク数
+COUNT_BATCH = 256
+SCORE_BATCH = 64
+
+SCORING_PATH = Path("data/chunk_scoring.yaml")
+
+# RAG_CHUNK_TOKENIZER=approx で tokenizer をロードせず近似で数える
+TOKENIZER_MODE = os.environ.get("RAG_CHUNK_TOKENIZER", "model")
+
+TokenCounter = Callable[[List[str]], List[int]]
 
 
 @dataclass
@@ -12,83 +47,562 @@ class Chunk:
     score: float = 0.0  # ★ 重要度スコア（0.0〜1.0）
 
 
+# =====================
+# scoring
+# =====================
+# data/chunk_scoring.yaml が無いときの既定（旧 score_chunk と同じ配点）
+DEFAULT_SCORING = {
+    "length": {
+        "base": 0.1,
+        "tiers": [{"over": 400, "score": 0.3}, {"over": 200, "score": 0.2}],
+    },
+    "groups": {
+        "tech": {
+            "weight": 0.4,
+            "keywords": [
+                "i2c", "spi", "api", "register", "仕様",
+                "parameter", "return", "example", "構成",
+                "設計", "command", "interface",
+            ],
+        },
+        "list": {"weight": 0.1, "keywords": ["\n-", "\n*", "\n•"]},
+        "ng": {"weight": -0.2, "keywords": ["todo", "未検証", "仮", "draft", "メモ"]},
+    },
+}
+
+
+class ChunkScorer:
+    """
+    ルールベースの重要度スコア（0.0〜1.0）
+
+    キーワードはグループごとに小文字化したタプルにまとめておき、
+    チャンクは 1 回だけ小文字化して、グループ内で最初に当たった時点で次のグループに進む。
+    長さの段と weight の合計は numpy でまとめて計算する。
+    """
+
+    def __init__(self, config: dict):
+        length = config.get("length") or {}
+        self.base = float(length.get("base", 0.0))
+        tiers = sorted(length.get("tiers") or [], key=lambda t: -t["over"])
+        self.tier_over = [int(t["over"]) for t in tiers]
+        self.tier_score = [float(t["score"]) for t in tiers]
+
+        groups = [
+            (name, g) for name, g in (config.get("groups") or {}).items()
+            if isinstance(g, dict) and g.get("keywords")
+        ]
+        self.group_names = [name for name, _ in groups]
+        self.weights = np.array([float(g.get("weight", 0.0)) for _, g in groups])
+        # 短いキーワードほど先に当たりやすいので前に並べる
+        self._keywords = [
+            tuple(sorted({str(k).lower() for k in g["keywords"]}, key=len)) for _, g in groups
+        ]
+
+    def group_mask(self, text: str) -> int:
+        """
+        text に出現したグループのビットマスク（bit j = グループ j）
+        """
+        t = text.lower()
+        mask = 0
+        for j, keywords in enumerate(self._keywords):
+            for k in keywords:
+                if k in t:
+                    mask |= 1 << j
+                    break
+        return mask
+
+    def hits(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        (n, グループ数) の 0/1 配列: texts[i] にグループ j のキーワードが出現したか
+        """
+        masks = np.fromiter(map(self.group_mask, texts), dtype=np.int64, count=len(texts))
+        return (masks[:, None] >> np.arange(len(self._keywords))) & 1
+
+    def score(self, texts: Sequence[str]) -> np.ndarray:
+        n = len(texts)
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        scores = np.full(n, self.base)
+        # 長い段から順に当たるので、短い段から上書きしていく
+        for over, score in zip(reversed(self.tier_over), reversed(self.tier_score)):
+            scores[lengths > over] = score
+
+        if self._keywords and n:
+            scores += self.hits(texts) @ self.weights
+
+        return np.clip(scores, 0.0, 1.0, out=scores)
+
+
+_scorers: Dict[Path, Tuple[Tuple[int, int], ChunkScorer]] = {}
+_scorers_lock = threading.Lock()
+
+
+def get_scorer(path: Optional[Path] = None) -> ChunkScorer:
+    """
+    chunk_scoring.yaml の (mtime, size) が変わっていれば作り直した scorer を返す
+    """
+    path = Path(path or SCORING_PATH)
+    try:
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = (0, 0)
+
+    cached = _scorers.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with _scorers_lock:
+        cached = _scorers.get(path)
+        if cached is None or cached[0] != stamp:
+            config = DEFAULT_SCORING
+            if stamp != (0, 0):
+                with path.open(encoding="utf-8-sig") as f:
+                    config = yaml.safe_load(f) or {}
+            cached = (stamp, ChunkScorer(config))
+            _scorers[path] = cached
+    return cached[1]
+
+
+def score_chunks(texts: Sequence[str], path: Optional[Path] = None) -> np.ndarray:
+    """
+    texts の重要度スコアをまとめて計算する → float64 の (n,) 配列
+    """
+    return get_scorer(path).score(texts)
+
+
 def score_chunk(text: str) -> float:
     """
-    ルールベースの重要度スコア算出
-    """
-    t = text.lower()
-    score = 0.0
-
-    # -----------------
-    # 情報量（長さ）
-    # -----------------
-    length = len(text)
-    if length > 400:
-        score += 0.3
-    elif length > 200:
-        score += 0.2
-    else:
-        score += 0.1
-
-    # -----------------
-    # 技術キーワード
-    # -----------------
-    keywords = [
-        "i2c", "spi", "api", "register", "仕様",
-        "parameter", "return", "example", "構成",
-        "設計", "command", "interface"
-    ]
-    if any(k in t for k in keywords):
-        score += 0.4
-
-    # -----------------
-    # 構造（箇条書き等）
-    # -----------------
-    if "\n-" in text or "\n*" in text or "\n•" in text:
-        score += 0.1
-
-    # -----------------
-    # NG・弱情報
-    # -----------------
-    ng_words = ["todo", "未検証", "仮", "draft", "メモ"]
-    if any(w in t for w in ng_words):
-        score -= 0.2
-
-    # 0.0〜1.0 に正規化
-    return max(0.0, min(score, 1.0))
+    ルールベースの重要度スコア算出（1 件版）
+    """
+    return float(score_chunks([text])[0])
 
+# =====================
+# token counter
+# =====================
+# tokenizer が無いときの近似（多めに見積もる）:
+#   ASCII の連続（単語・記号列）は 1 + 3 文字ごとに 1（WordPiece で分割される分）
+#   非 ASCII（日本語など）は 1 文字 1 トークン（UTF-8 で 3 バイト → 余剰 2 バイトで 1 文字）
+_ASCII_RUN_RE = re.compile(r"[!-~]+")
+# これ以上の件数なら numpy でまとめて数える
+_APPROX_NUMPY_MIN = 16
 
-def split_text(
-    text: str,
-    source: str,
-    chunk_size: int = 500,
-    overlap: int = 100
-) -> List[Chunk]:
+_counters: Dict[str, TokenCounter] = {}
+_counter_lock = threading.Lock()
+
+
+def approx_token_counts(texts: List[str]) -> List[int]:
     """
-    テキストを chunk に分割し、重要度スコア付きで返す
+    texts をまとめて UTF-8 にし、バイト列の上で numpy で数える
+    （ASCII 印字文字 0x21-0x7e は UTF-8 の他の文字のバイトと重ならない）
+    """
+    if len(texts) < _APPROX_NUMPY_MIN:
+        # 少量なら numpy の呼び出しコストの方が大きい
+        findall = _ASCII_RUN_RE.findall
+        out = []
+        for t in texts:
+            runs = findall(t)
+            out.append(len(runs) + sum(map(len, runs)) // 3 + (len(t.encode("utf-8")) - len(t)) // 2)
+        return out
+
+    encoded = [t.encode("utf-8") for t in texts]
+    nbytes = np.fromiter(map(len, encoded), dtype=np.int64, count=len(texts))
+    nchars = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    ends = np.cumsum(nbytes)
+    starts = ends - nbytes
+
+    b = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    ascii_ = (b >= 0x21) & (b <= 0x7E)
+    # ASCII の連続の先頭（テキストの先頭では前のテキストとつながない）
+    run_start = ascii_.copy()
+    run_start[1:] &= ~ascii_[:-1]
+    nonempty = nbytes > 0
+    head = starts[nonempty]
+    run_start[head] = ascii_[head]
+
+    def per_text(mask: np.ndarray) -> np.ndarray:
+        out = np.zeros(len(texts), dtype=np.int64)
+        if len(head):
+            out[nonempty] = np.add.reduceat(mask, head, dtype=np.int64)
+        return out
+
+    runs = per_text(run_start)
+    chars = per_text(ascii_)
+    return (runs + chars // 3 + (nbytes - nchars) // 2).tolist()
+
+
+def char_counts(texts: List[str]) -> List[int]:
+    return [len(t) for t in texts]
+
+
+def _load_tokenizer(model_name: str):
+    # embedding モデルがロード済みならその tokenizer を使う
+    from .embedding import _models
+
+    model = _models.get(model_name)
+    if model is not None and getattr(model, "tokenizer", None) is not None:
+        return model.tokenizer
+
+    from transformers import AutoTokenizer
+
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return AutoTokenizer.from_pretrained(repo)
+
+
+def get_token_counter(model_name: str = EMBED_MODEL_NAME) -> TokenCounter:
+    """
+    texts -> トークン数のリスト を返す関数（tokenizer へはバッチで渡す）
+    transformers が無い / モデルを取得できない場合は近似に落とす
+    """
+    counter = _counters.get(model_name)
+    if counter is not None:
+        return counter
+
+    with _counter_lock:
+        counter = _counters.get(model_name)
+        if counter is None:
+            counter = approx_token_counts
+            if TOKENIZER_MODE != "approx":
+                try:
+                    tokenizer = _load_tokenizer(model_name)
+                except (ImportError, OSError, ValueError):
+                    tokenizer = None
+                if tokenizer is not None:
+                    def counter(texts: List[str]) -> List[int]:
+                        ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+                        return [len(x) for x in ids]
+            _counters[model_name] = counter
+
+    return counter
+
+# =====================
+# blocks / units
+# =====================
+# 文末: 。！？ は直後で、. ! ? は後ろが空白のときだけ（3.3V や Wire.begin() では切らない）
+_SENT_END_RE = re.compile(r"(?:[。！？]+|[.!?]+(?=\s))[\s」』）)]*")
+
+# (kind, text, start)  kind: "heading" | "code" | "text"
+Unit = Tuple[str, str, int]
+
+
+# 見出し行 / フェンスの開始行（ここ以外は段落として一気に切り出す）
+# 行頭の判定は「\n の直後」で探す（^ + re.M より速い: 先頭のリテラルで飛ばせる）
+_SPECIAL_AT = re.compile(r"#{1,6}\s|[^\S\n]*(`{3,}|~{3,})")
+_SPECIAL_NL = re.compile(r"\n(?:#{1,6}\s|[^\S\n]*(`{3,}|~{3,}))")
+# 段落: 空でない行の並び + 閉じる空行 1 行（空行だけの段落もある）
+_PARA_RE = re.compile(r"(?:[^\S\n]*\S[^\n]*(?:\n|\Z))*(?P<blank>[^\S\n]*(?:\n|\Z))?")
+_fence_close: Dict[str, "re.Pattern"] = {}
+# ファイルオブジェクトから 1 回に読んでまとめて走査する文字数
+SCAN_CHARS = 1 << 16
+
+
+def _line_end(text: str, pos: int) -> int:
+    i = text.find("\n", pos)
+    return len(text) if i < 0 else i + 1
+
+
+def _find_special(text: str, pos: int) -> Tuple[int, Optional[str]]:
+    """
+    pos（行頭）以降で最初の見出し / フェンス行 → (位置, フェンス or None)。無ければ (-1, None)
+    """
+    m = _SPECIAL_AT.match(text, pos)
+    if m is not None:
+        return pos, m.group(1)
+    m = _SPECIAL_NL.search(text, pos)
+    if m is None:
+        return -1, None
+    return m.start() + 1, m.group(1)
+
+
+def _scan_blocks(text: str, base: int, final: bool):
+    """
+    text の先頭からブロックを返し、最後に「確定できた位置」を return する。
+    final でなければ、末尾で途切れているかもしれない段落 / フェンスは返さずに残す
+    """
+    pos = 0
+    n = len(text)
+    while pos < n:
+        special, fence = _find_special(text, pos)
+        stop = n if special < 0 else special
+
+        # 次の見出し / フェンスまでは段落だけ
+        while pos < stop:
+            p = _PARA_RE.match(text, pos, stop)
+            end = p.end()
+            if end == n and not final and p.end("blank") == p.start("blank"):
+                return pos
+            yield "text", text[pos:end], base + pos
+            pos = end
+
+        if special < 0:
+            break
+        line_end = _line_end(text, pos)
+        if fence is None:
+            if line_end == n and not final and not text.endswith("\n"):
+                return pos
+            yield "heading", text[pos:line_end], base + pos
+            pos = line_end
+            continue
+
+        close = _fence_close.get(fence)
+        if close is None:
+            close = _fence_close[fence] = re.compile(r"^[^\S\n]*" + re.escape(fence), re.M)
+        c = close.search(text, line_end)
+        if c is None:
+            if not final:
+                return pos
+            # 閉じていないフェンスは末尾までをコードとみなす
+            end = n
+        else:
+            end = _line_end(text, c.end())
+        yield "code", text[pos:end], base + pos
+        pos = end
+    return pos
+
+
+def iter_blocks(source: Union[str, Iterable[str]]) -> Iterator[Unit]:
+    """
+    見出し / コードフェンス / 段落 のブロックに分ける
+    （text はすべて元テキストの連続した部分文字列で、start はその開始位置）
+
+    行ごとではなく、見出し・フェンスの行を regex で探してその間の段落をまとめて切り出す。
+    行のイテレータ（ファイルオブジェクトなど）は SCAN_CHARS ずつ読んで同じように走査する。
+    """
+    if isinstance(source, str):
+        yield from _scan_blocks(source, 0, True)
+        return
+
+    lines = iter(source)
+    rest = ""
+    base = 0
+    final = False
+    while not final:
+        # 途切れたブロックが大きいときは読む量を増やす（走査し直しを O(n) に抑える）
+        want = max(SCAN_CHARS, 2 * len(rest))
+        parts = [rest]
+        size = len(rest)
+        final = True
+        for line in lines:
+            parts.append(line)
+            size += len(line)
+            if size >= want:
+                final = False
+                break
+        text = "".join(parts)
+        done = yield from _scan_blocks(text, base, final)
+        rest = text[done:]
+        base += done
+
+
+def split_sentences(text: str) -> List[str]:
+    out = []
+    prev = 0
+    for m in _SENT_END_RE.finditer(text):
+        out.append(text[prev:m.end()])
+        prev = m.end()
+    if prev < len(text):
+        out.append(text[prev:])
+    return out
+
+
+# =====================
+# engine
+# =====================
+# (doc, kind, text, start, tokens)  doc は iter_chunks_many での文書番号
+Counted = Tuple[int, str, str, int, int]
+
+
+def _pieces(kind: str, text: str, n: int, max_tokens: int) -> List[str]:
+    """
+    予算を超えるブロックを 1 段だけ細かくする。
+    段落は文 → 行 → 文字数、コードブロックは行 → 文字数 の順
+    """
+    pieces = split_sentences(text) if kind == "text" else []
+    if len(pieces) <= 1:
+        pieces = text.splitlines(keepends=True)
+    if len(pieces) <= 1:
+        width = max(1, len(text) * max_tokens // max(n, 1))
+        pieces = [text[i:i + width] for i in range(0, len(text), width)]
+    return pieces
+
+
+def _split_oversize(
+    doc: int, kind: str, text: str, start: int, n: int, max_tokens: int, count_tokens: TokenCounter
+) -> Iterator[Counted]:
+    pieces = _pieces(kind, text, n, max_tokens)
+    for piece, c in zip(pieces, count_tokens(pieces)):
+        if c > max_tokens and len(pieces) > 1:
+            yield from _split_oversize(doc, kind, piece, start, c, max_tokens, count_tokens)
+        else:
+            yield doc, kind, piece, start, c
+        start += len(piece)
+
+
+def _counted(
+    blocks: Iterator[Tuple[int, str, str, int]],
+    count_tokens: TokenCounter,
+    batch: int,
+    max_tokens: int,
+) -> Iterator[Counted]:
+    """
+    ブロックを batch 件ずつ（文書をまたいで）まとめて数え、予算を超えるブロックは
+    そのバッチ内の分をまとめて文に分けて 1 回で数える
     """
-    chunks: List[Chunk] = []
+    while True:
+        block = list(islice(blocks, batch))
+        if not block:
+            return
+        counts = count_tokens([b[2] for b in block])
 
-    start = 0
-    idx = 0
-    length = len(text)
+        over = [i for i, n in enumerate(counts) if n > max_tokens]
+        split: Dict[int, List[Tuple[str, int]]] = {}
+        if over:
+            parts = [_pieces(block[i][1], block[i][2], counts[i], max_tokens) for i in over]
+            flat = count_tokens([p for ps in parts for p in ps])
+            k = 0
+            for i, ps in zip(over, parts):
+                split[i] = list(zip(ps, flat[k:k + len(ps)]))
+                k += len(ps)
 
-    while start < length:
-        end = min(start + chunk_size, length)
-        chunk_text = text[start:end]
+        for i, ((doc, kind, text, start), n) in enumerate(zip(block, counts)):
+            pieces = split.get(i)
+            if pieces is None:
+                yield doc, kind, text, start, n
+                continue
+            for piece, c in pieces:
+                if c > max_tokens and len(pieces) > 1:
+                    yield from _split_oversize(doc, kind, piece, start, c, max_tokens, count_tokens)
+                else:
+                    yield doc, kind, piece, start, c
+                start += len(piece)
 
-        chunk = Chunk(
-            text=chunk_text,
-            index=idx,
-            start=start,
-            end=end,
-            source=source,
-            score=score_chunk(chunk_text),  # ★ ここで自動付与
-        )
 
-        chunks.append(chunk)
+def _make_chunk(buf, index: int, source: str) -> Chunk:
+    raw = "".join(u[2] for u in buf)
+    text = raw.strip()
+    start = buf[0][3] + (len(raw) - len(raw.lstrip()))
+    return Chunk(
+        text=text,
+        index=index,
+        start=start,
+        end=start + len(text),
+        source=source,
+    )
 
-        idx += 1
-        start += chunk_size - overlap
 
-    return chunks
+def _pack(
+    units: Iterable[Counted], source: str, max_tokens: int, overlap_tokens: int
+) -> Iterator[Chunk]:
+    """
+    1 文書分の数え済み単位を max_tokens 以内のチャンクに詰める
+    """
+    buf: List[Counted] = []
+    total = 0
+    has_body = False
+    index = 0
+
+    for unit in units:
+        kind, text, n = unit[1], unit[2], unit[4]
+
+        if kind == "heading" and has_body:
+            yield _make_chunk(buf, index, source)
+            index += 1
+            buf, total, has_body = [], 0, False
+
+        elif has_body and total + n > max_tokens:
+            yield _make_chunk(buf, index, source)
+            index += 1
+            # 末尾の段落 / 文を overlap として持ち越す（見出しは持ち越さない）
+            carry: List[Counted] = []
+            kept = 0
+            for u in reversed(buf):
+                if u[1] == "heading" or kept + u[4] > overlap_tokens or kept + u[4] + n > max_tokens:
+                    break
+                carry.append(u)
+                kept += u[4]
+            buf = carry[::-1]
+            total = kept
+            has_body = bool(buf)
+
+        buf.append(unit)
+        total += n
+        if kind != "heading" and not text.isspace():
+            has_body = True
+
+    if buf and "".join(u[2] for u in buf).strip():
+        yield _make_chunk(buf, index, source)
+
+
+def _scored(chunks: Iterator[Tuple[int, Chunk]]) -> Iterator[Tuple[int, Chunk]]:
+    scorer = get_scorer()
+    while True:
+        batch = list(islice(chunks, SCORE_BATCH))
+        if not batch:
+            return
+        for (doc, c), score in zip(batch, scorer.score([c.text for _, c in batch]).tolist()):
+            c.score = score
+            yield doc, c
+
+
+def iter_chunks_many(
+    docs: Iterable[Tuple[Union[str, Iterable[str]], str]],
+    max_tokens: int = MAX_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+    count_tokens: Optional[TokenCounter] = None,
+) -> Iterator[Tuple[int, Chunk]]:
+    """
+    (テキスト, source) の並びを順に分割して (文書番号, Chunk) を返す。
+    トークン数・スコアは文書をまたいで COUNT_BATCH / SCORE_BATCH 件ずつまとめて計算する
+    （小さい文書が多いときも tokenizer / score_chunks をまとめて呼べる）。
+    chunk.index は文書ごとに 0 から。
+    """
+    count_tokens = count_tokens or get_token_counter()
+    sources: List[str] = []
+
+    def blocks():
+        for doc, (text, source) in enumerate(docs):
+            sources.append(source)
+            for kind, block, start in iter_blocks(text):
+                yield doc, kind, block, start
+
+    units = _counted(blocks(), count_tokens, COUNT_BATCH, max_tokens)
+
+    def packed():
+        for doc, group in groupby(units, key=itemgetter(0)):
+            for c in _pack(group, sources[doc], max_tokens, overlap_tokens):
+                yield doc, c
+
+    return _scored(packed())
+
+
+def iter_chunks(
+    source_text: Union[str, Iterable[str]],
+    source: str = "",
+    max_tokens: int = MAX_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+    count_tokens: Optional[TokenCounter] = None,
+) -> Iterator[Chunk]:
+    """
+    テキスト（または行のイテレータ）を max_tokens 以内のチャンクに分けて順に返す
+
+    - 見出しの前では必ず区切る（セクションをまたぐ overlap はしない）
+    - 段落・コードブロックは丸ごと詰め、入らなければ直前でチャンクを閉じる。
+      末尾 overlap_tokens 分の単位は次のチャンクに持ち越す
+    - 単独で予算を超える段落は文で、コードブロックは行で分ける
+    - score は SCORE_BATCH 件ごとに score_chunks でまとめて付ける
+    """
+    for _, c in iter_chunks_many(
+        ((source_text, source),), max_tokens, overlap_tokens, count_tokens
+    ):
+        yield c
+
+
+def split_text(
+    text: str,
+    source: str,
+    max_tokens: int = MAX_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> List[Chunk]:
+    """
+    テキストを chunk に分割し、重要度スコア付きで返す
+    """
+    return list(iter_chunks(text, source, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
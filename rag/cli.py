@@ -1,17 +1,36 @@
 import sys
+import os
+import glob
 import json
+import codecs
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-from rag.validate import VALIDATE_MAP, validate_common
+from rag.validate import VALIDATE_MAP, evaluate
 from rag.core import ValidationResult
+from rag.stream_validate import StreamValidator
+
+# ディレクトリ指定時に検証対象とする拡張子
+BATCH_SUFFIXES = {".txt", ".md", ".ino", ".cpp", ".c", ".h", ".hpp"}
+# これ未満のファイル数ならプロセスプールを使わない（起動コストの方が大きい）
+POOL_MIN_FILES = 32
+POOL_CHUNKSIZE = 16
+# --stdin --stream の 1 回の読み込みサイズ
+STDIN_READ_SIZE = 4096
+
+I2C_KEYWORDS = ("i2c", "wire", "sda", "scl")
+SPI_KEYWORDS = ("spi", "miso", "mosi", "sck")
 
 
 def detect_rule_key(text: str) -> str:
     t = text.lower()
 
-    has_i2c = any(k in t for k in ("i2c", "wire", "sda", "scl"))
-    has_spi = any(k in t for k in ("spi", "miso", "mosi", "sck"))
+    has_i2c = any(k in t for k in I2C_KEYWORDS)
+    has_spi = any(k in t for k in SPI_KEYWORDS)
+    return _rule_key_for(has_i2c, has_spi)
+
 
+def _rule_key_for(has_i2c: bool, has_spi: bool) -> str:
     if has_i2c and has_spi:
         return "i2c_spi"
     if has_i2c:
@@ -21,75 +40,292 @@ def detect_rule_key(text: str) -> str:
     return "default"
 
 
-def resolve_validators(rule_key: str):
-    validators = [validate_common]
+def resolve_rule_keys(rule_key: str):
+    # common は常に評価（rule 側にも含まれるが evaluate が 1 回にまとめる）
+    return ["common", rule_key]
+
+
+def validate_text(text: str, rule_key=None):
+    if rule_key is None:
+        rule_key = detect_rule_key(text)
+
+    results: list[ValidationResult] = evaluate(text, resolve_rule_keys(rule_key))
+    errors = [r for r in results if r.severity == "error"]
+    return rule_key, errors
+
+# =====================
+# batch mode
+# =====================
+def expand_paths(args):
+    """
+    ファイル / ディレクトリ / glob を検証対象ファイルのリストに展開する（重複除去・順序維持）
+    """
+    files = []
+    seen = set()
+
+    def add(p: Path):
+        if p not in seen:
+            seen.add(p)
+            files.append(p)
+
+    for arg in args:
+        p = Path(arg)
+        if p.is_dir():
+            for f in sorted(p.rglob("*")):
+                if f.is_file() and f.suffix.lower() in BATCH_SUFFIXES:
+                    add(f)
+        elif p.exists():
+            add(p)
+        elif glob.has_magic(arg):
+            for m in sorted(glob.glob(arg, recursive=True)):
+                if Path(m).is_file():
+                    add(Path(m))
+        else:
+            # 存在しないパスはそのまま渡し、結果側で error として報告する
+            add(p)
+
+    return files
+
+
+def validate_file(path, rule_key=None) -> dict:
+    """
+    1 ファイル分の結果（--jsonl の 1 行）。プロセスプールから呼ばれる。
+    """
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+        rule_key, errors = validate_text(text, rule_key)
+        return {
+            "path": str(path),
+            "status": "ng" if errors else "ok",
+            "rule": rule_key,
+            "errors": [r.message for r in errors],
+        }
+    except Exception as e:
+        return {
+            "path": str(path),
+            "status": "error",
+            "rule": "unknown",
+            "errors": [str(e)],
+        }
+
+
+def _validate_chunk(paths, rule_key):
+    return [validate_file(p, rule_key) for p in paths]
+
+
+def iter_batch_results(files, rule_key=None, workers=None):
+    """
+    入力順に結果を yield する（プール使用時も 1 件ずつストリーミング）
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(files) < POOL_MIN_FILES:
+        for f in files:
+            yield validate_file(f, rule_key)
+        return
+
+    chunks = [
+        [str(f) for f in files[i:i + POOL_CHUNKSIZE]]
+        for i in range(0, len(files), POOL_CHUNKSIZE)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for results in ex.map(_validate_chunk, chunks, [rule_key] * len(chunks)):
+            yield from results
+
+
+def run_batch(args, rule_key, use_jsonl, verbose, quiet, workers):
+    files = expand_paths(args)
+    if not files:
+        sys.stderr.write("no files matched\n")
+        sys.exit(2)
+
+    summary = {"files": 0, "ok": 0, "ng": 0, "error": 0}
+
+    for rec in iter_batch_results(files, rule_key, workers):
+        summary["files"] += 1
+        summary[rec["status"]] += 1
+
+        if use_jsonl:
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        elif rec["status"] == "ok":
+            if verbose:
+                sys.stdout.write(f"[OK] {rec['path']} (rule: {rec['rule']})\n")
+        else:
+            for e in rec["errors"]:
+                sys.stdout.write(f"[NG] {rec['path']}: {e}\n")
+
+    if use_jsonl:
+        sys.stdout.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+    elif not quiet:
+        sys.stdout.write(
+            f"[SUMMARY] files: {summary['files']}  ok: {summary['ok']}  "
+            f"ng: {summary['ng']}  error: {summary['error']}\n"
+        )
+
+    sys.stdout.flush()
+    sys.exit(0 if summary["ok"] == summary["files"] else 1)
+
+
+# =====================
+# stdin / stream mode
+# =====================
+class _RuleKeyDetector:
+    """
+    detect_rule_key を全文なしで行う（キーワードは短いので末尾数文字だけ持てばよい）
+    """
+
+    def __init__(self):
+        self.has_i2c = False
+        self.has_spi = False
+        self._tail = ""
+
+    def feed(self, chunk: str):
+        t = self._tail + chunk.lower()
+        self.has_i2c = self.has_i2c or any(k in t for k in I2C_KEYWORDS)
+        self.has_spi = self.has_spi or any(k in t for k in SPI_KEYWORDS)
+        self._tail = t[-8:]
+
+    @property
+    def rule_key(self) -> str:
+        return _rule_key_for(self.has_i2c, self.has_spi)
+
+
+def _iter_stdin():
+    # 届いた分だけすぐ返す（read(n) のように n 文字たまるまで待たない）
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    fd = sys.stdin.fileno()
+    while True:
+        data = os.read(fd, STDIN_READ_SIZE)
+        if not data:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        text = decoder.decode(data)
+        if text:
+            yield text
+
 
-    v = VALIDATE_MAP.get(rule_key)
-    if callable(v):
-        validators.append(v)
+def run_stream(rule_key, use_json, verbose, quiet):
+    """
+    stdin を逐次検証し、確定した失敗を見つけた時点で報告して終了する
+    （パイプが閉じるので上流の生成も止められる）
+    """
+    detector = _RuleKeyDetector()
+    validator = StreamValidator(resolve_rule_keys(rule_key) if rule_key else ["common"])
 
-    return validators
+    for chunk in _iter_stdin():
+        detector.feed(chunk)
+        failures = validator.feed(chunk)
+        if not failures:
+            continue
+
+        if use_json:
+            payload = {
+                "status": "ng",
+                "rule": rule_key or detector.rule_key,
+                "errors": [r.message for r in failures],
+                "offset": validator.chars,
+            }
+            sys.stdout.write(json.dumps(payload, ensure_ascii=False))
+        else:
+            for e in failures:
+                sys.stdout.write(f"[NG] {e.message} (at {validator.chars} chars)\n")
+        sys.stdout.flush()
+        sys.exit(1)
+
+    rule_key = rule_key or detector.rule_key
+    results = validator.finalize(resolve_rule_keys(rule_key))
+    report(rule_key, [r for r in results if r.severity == "error"], use_json, verbose, quiet)
+
+
+def report(rule_key, errors, use_json, verbose, quiet):
+    """
+    単一入力の結果を出力して終了する（--json の出力形式は固定）
+    """
+    if use_json:
+        payload = {
+            "status": "ng" if errors else "ok",
+            "rule": rule_key,
+            "errors": [r.message for r in errors],
+        }
+        sys.stdout.write(json.dumps(payload, ensure_ascii=False))
+    else:
+        if verbose:
+            sys.stdout.write(f"[INFO] detected rule: {rule_key}\n")
+
+        if errors:
+            for e in errors:
+                sys.stdout.write(f"[NG] {e.message}\n")
+        else:
+            if not quiet:
+                sys.stdout.write("[OK] validation passed\n")
+
+    sys.stdout.flush()
+    sys.exit(1 if errors else 0)
+
+
+def _pop_option(argv, name):
+    # "--name value" を取り除いて value を返す（値がなければ None）
+    i = argv.index(name)
+    try:
+        value = argv[i + 1]
+    except IndexError:
+        return argv[:i], None
+    return argv[:i] + argv[i + 2:], value
+
+
+def _is_batch_target(arg: str) -> bool:
+    p = Path(arg)
+    return p.is_dir() or (not p.exists() and glob.has_magic(arg))
 
 
 def main(argv=None):
     argv = argv or sys.argv[1:]
 
     use_json = "--json" in argv
+    use_jsonl = "--jsonl" in argv
     verbose = "--verbose" in argv
     quiet = "--quiet" in argv
+    # --stdin はパイプ入力を 1 件として検証（--stream なら逐次）
+    use_stdin = "--stdin" in argv
 
     # --rule handling
     if "--rule" in argv:
-        i = argv.index("--rule")
-        try:
-            rule_key = argv[i + 1]
-        except IndexError:
-            sys.stderr.write("unknown rule\n")
-            sys.exit(2)
+        argv, rule_key = _pop_option(argv, "--rule")
 
-        if rule_key not in VALIDATE_MAP and rule_key != "default":
+        if rule_key is None or (rule_key not in VALIDATE_MAP and rule_key != "default"):
             sys.stderr.write("unknown rule\n")
             sys.exit(2)
-
-        argv = argv[:i] + argv[i + 2:]
     else:
         rule_key = None
 
-    try:
-        path = Path(argv[0])
-        text = path.read_text(encoding="utf-8")
-
-        if rule_key is None:
-            rule_key = detect_rule_key(text)
-
-        validators = resolve_validators(rule_key)
+    workers = None
+    if "--workers" in argv:
+        argv, value = _pop_option(argv, "--workers")
+        try:
+            workers = int(value)
+        except (TypeError, ValueError):
+            sys.stderr.write("invalid --workers\n")
+            sys.exit(2)
 
-        results: list[ValidationResult] = []
-        for v in validators:
-            results.extend(v(text))
+    paths = [a for a in argv if not a.startswith("--")]
 
-        errors = [r for r in results if r.severity == "error"]
+    # 複数パス / ディレクトリ / glob / --jsonl はバッチモード（単一ファイルは従来の出力形式）
+    batch = use_jsonl or len(paths) > 1 or (paths and _is_batch_target(paths[0]))
+    if batch and not use_stdin:
+        run_batch(paths, rule_key, use_jsonl, verbose, quiet, workers)
 
-        if use_json:
-            payload = {
-                "status": "ng" if errors else "ok",
-                "rule": rule_key,
-                "errors": [r.message for r in errors],
-            }
-            sys.stdout.write(json.dumps(payload, ensure_ascii=False))
+    try:
+        if use_stdin:
+            if "--stream" in argv:
+                run_stream(rule_key, use_json, verbose, quiet)
+            text = sys.stdin.read()
         else:
-            if verbose:
-                sys.stdout.write(f"[INFO] detected rule: {rule_key}\n")
+            text = Path(paths[0]).read_text(encoding="utf-8")
 
-            if errors:
-                for e in errors:
-                    sys.stdout.write(f"[NG] {e.message}\n")
-            else:
-                if not quiet:
-                    sys.stdout.write("[OK] validation passed\n")
-
-        sys.stdout.flush()
-        sys.exit(1 if errors else 0)
+        rule_key, errors = validate_text(text, rule_key)
+        report(rule_key, errors, use_json, verbose, quiet)
 
     except Exception as e:
         if use_json:
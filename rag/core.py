@@ -1,28 +1,104 @@
 from pathlib import Path
 from datetime import datetime
-import json
 import yaml
 import re
+import threading
+import time
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+from functools import cached_property, lru_cache
+from typing import Optional, List, Dict, Any, Iterable, Set, Tuple
+
+from .log_partitions import get_partitioned_writer
 
 # =====================
 # paths
 # =====================
 RULES_PATH = Path("data/rules/rules.yaml")
+# 日付パーティション（logs/validation_errors/YYYY-MM-DD.jsonl）
+LOG_DIR = Path("logs/validation_errors")
+# 旧形式の単一ファイル（scripts/migrate_log_partitions.py で LOG_DIR に移行する）
 LOG_PATH = Path("logs/validation_errors.jsonl")
-LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 # =====================
 # load rules
 # =====================
-def load_rules():
+# rules.yaml のトップレベルでルール定義ではないキー（rule_lifecycle が version を書く）
+META_KEY = "_meta"
+
+
+def split_meta(data: Optional[dict]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    rules.yaml の内容 → (ルール定義, _meta)。ルールとして読む側は必ずこれを通す
+    """
+    rules = dict(data or {})
+    meta = rules.pop(META_KEY, None) or {}
+    return rules, meta
+
+
+def _read_rules() -> Tuple[Dict[str, Any], Dict[str, Any]]:
     if not RULES_PATH.exists():
-        return {}
-    with RULES_PATH.open(encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+        return {}, {}
+    with RULES_PATH.open(encoding="utf-8-sig") as f:
+        return split_meta(yaml.safe_load(f))
 
-RULES = load_rules()
+
+def load_rules():
+    return _read_rules()[0]
+
+
+# rules.yaml の更新チェック間隔 [s]（rule_lifecycle の書き換えを再起動なしで反映する）
+RULES_RELOAD_INTERVAL_SEC = 1.0
+
+_rules: Optional[Dict[str, Any]] = None
+_rules_meta: Dict[str, Any] = {}
+_rules_stamp = None
+_rules_checked = 0.0
+_rules_lock = threading.Lock()
+
+
+def _rules_file_stamp():
+    try:
+        st = RULES_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_rules() -> Dict[str, Any]:
+    """
+    rules.yaml を初回参照時に読み込む（スレッドセーフ）。
+    以降は RULES_RELOAD_INTERVAL_SEC ごとに (mtime, size) を見て、変わっていれば読み直す。
+    書き換えは一時ファイル + rename（rag.rule_lifecycle）なので途中の状態は読まない。
+    """
+    global _rules, _rules_meta, _rules_stamp, _rules_checked
+
+    now = time.monotonic()
+    if _rules is not None and now - _rules_checked < RULES_RELOAD_INTERVAL_SEC:
+        return _rules
+
+    with _rules_lock:
+        if _rules is None or now - _rules_checked >= RULES_RELOAD_INTERVAL_SEC:
+            stamp = _rules_file_stamp()
+            if _rules is None or stamp != _rules_stamp:
+                _rules, _rules_meta = _read_rules()
+                _rules_stamp = stamp
+            _rules_checked = now
+    return _rules
+
+
+def rules_version() -> int:
+    """
+    現在読み込まれている rules.yaml の version（rule_lifecycle が書き込むたびに増える）
+    """
+    get_rules()
+    return int(_rules_meta.get("version", 0))
+
+
+def __getattr__(name: str):
+    # 旧 API 互換: rag.core.RULES は遅延ロードされる
+    if name == "RULES":
+        return get_rules()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # =====================
 # validation result
@@ -34,165 +110,303 @@ class ValidationResult:
     severity: str
     message: str
     fix_hint: Optional[str] = None
+    target: Optional[str] = None  # must_include / forbid の対象リテラル
 
 # =====================
 # logging
 # =====================
 def log_validation_error(result: ValidationResult):
+    """
+    ts の日付のパーティションに書く。書き込みはバックグラウンドスレッドでまとめて行う
+    （rag.log_partitions / rag.jsonl_writer）
+    """
     rec = {
         "ts": datetime.utcnow().isoformat(),
         "rule": result.rule,
         "severity": result.severity,
         "message": result.message,
     }
-    with LOG_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    if result.target is not None:
+        rec["target"] = result.target
+    get_partitioned_writer(LOG_DIR).write(rec)
 
 # =====================
 # helpers
 # =====================
+_CPP_BLOCK_RE = re.compile(r"```cpp([\s\S]*?)```", re.IGNORECASE)
+_CPP_COMMENT_RE = re.compile(r"//.*")
+_WIRE_BEGIN_RE = re.compile(r"\bwire\.begin\s*\(\s*\)", re.IGNORECASE)
+_SPI_BEGIN_RE = re.compile(r"\bspi\.begin\s*\(\s*\)", re.IGNORECASE)
+_CITATION_RE = re.compile(r"\[source:\s*([^\]]+)\]")
+
+
 def _has_cpp_block(text: str) -> bool:
-    return bool(re.search(r"```cpp[\s\S]*?```", text, re.IGNORECASE))
+    return _CPP_BLOCK_RE.search(text) is not None
 
 
 def _strip_cpp_comments(text: str) -> str:
-    return re.sub(r"//.*", "", text)
+    return _CPP_COMMENT_RE.sub("", text)
 
 
 def _has_wire_begin(text: str) -> bool:
-    text = _strip_cpp_comments(text)
-    return bool(re.search(r"\bwire\.begin\s*\(\s*\)", text, re.IGNORECASE))
+    return _WIRE_BEGIN_RE.search(_strip_cpp_comments(text)) is not None
 
 
 def _has_spi_begin(text: str) -> bool:
-    text = _strip_cpp_comments(text)
-    return bool(re.search(r"\bspi\.begin\s*\(\s*\)", text, re.IGNORECASE))
+    return _SPI_BEGIN_RE.search(_strip_cpp_comments(text)) is not None
 
 
 def _extract_citations(text: str) -> List[str]:
     """
     [source: xxx] 形式の citation を抽出
     """
-    return re.findall(r"\[source:\s*([^\]]+)\]", text)
+    return _CITATION_RE.findall(text)
 
 # =====================
-# common validator
+# text analysis（前処理は 1 テキストにつき 1 回）
 # =====================
-def validate_common(text: str, **context) -> List[ValidationResult]:
-    results = []
+class TextAnalysis:
+    """
+    検証対象テキストの前処理結果。
+    各項目は初回参照時に 1 回だけ計算し、全ルールで共有する。
+    """
 
-    if not _has_cpp_block(text):
-        results.append(
-            ValidationResult(
-                ok=False,
-                rule="common_cpp_block",
-                severity="error",
-                message="cppコードブロックのみ出力してください",
-                fix_hint="```cpp``` でコードを囲ってください",
-            )
-        )
+    def __init__(self, text: str):
+        self.text = text
+
+    @cached_property
+    def code_blocks(self) -> List[str]:
+        return _CPP_BLOCK_RE.findall(self.text)
+
+    @property
+    def has_cpp_block(self) -> bool:
+        return bool(self.code_blocks)
+
+    @cached_property
+    def stripped(self) -> str:
+        return _strip_cpp_comments(self.text)
+
+    @cached_property
+    def has_wire_begin(self) -> bool:
+        return _WIRE_BEGIN_RE.search(self.stripped) is not None
+
+    @cached_property
+    def has_spi_begin(self) -> bool:
+        return _SPI_BEGIN_RE.search(self.stripped) is not None
+
+    @cached_property
+    def citations(self) -> List[str]:
+        return _CITATION_RE.findall(self.text)
+
+    def rule_literals(self, matcher) -> Set[str]:
+        """
+        matcher（rule_engine.RuleMatcher）のリテラルのうち text に含まれるもの
+        """
+        cached = self.__dict__.get("_rule_literals")
+        if cached is None or cached[0] is not matcher:
+            cached = (matcher, matcher.scan(self.text))
+            self._rule_literals = cached
+        return cached[1]
 
-    return results
+
+@lru_cache(maxsize=64)
+def _analyze_cached(text: str) -> TextAnalysis:
+    return TextAnalysis(text)
+
+
+def analyze(text) -> TextAnalysis:
+    """
+    str → TextAnalysis（同じテキストの直近の解析結果は再利用する）
+    """
+    if isinstance(text, TextAnalysis):
+        return text
+    return _analyze_cached(text)
 
 # =====================
-# rule-specific validators
+# checks（TextAnalysis → ValidationResult）
 # =====================
-def validate_i2c(text: str, **context):
-    results = validate_common(text)
+def _check_common(a: TextAnalysis, **context) -> List[ValidationResult]:
+    if a.has_cpp_block:
+        return []
+    return [
+        ValidationResult(
+            ok=False,
+            rule="common_cpp_block",
+            severity="error",
+            message="cppコードブロックのみ出力してください",
+            fix_hint="```cpp``` でコードを囲ってください",
+        )
+    ]
+
+
+def _check_i2c(a: TextAnalysis, **context) -> List[ValidationResult]:
+    if a.has_wire_begin:
+        return []
+    return [
+        ValidationResult(
+            ok=False,
+            rule="i2c",
+            severity="error",
+            message="Wire.begin() がありません",
+            fix_hint="I2C 初期化コードを追加してください",
+        )
+    ]
+
+
+def _check_spi(a: TextAnalysis, **context) -> List[ValidationResult]:
+    if a.has_spi_begin:
+        return []
+    return [
+        ValidationResult(
+            ok=False,
+            rule="spi",
+            severity="error",
+            message="SPI.begin() がありません",
+            fix_hint="SPI 初期化コードを追加してください",
+        )
+    ]
 
-    if not _has_wire_begin(text):
+
+def _check_i2c_spi(a: TextAnalysis, **context) -> List[ValidationResult]:
+    results = []
+    if not a.has_wire_begin:
         results.append(
             ValidationResult(
                 ok=False,
                 rule="i2c",
                 severity="error",
                 message="Wire.begin() がありません",
-                fix_hint="I2C 初期化コードを追加してください",
             )
         )
-    return results
-
-
-def validate_spi(text: str, **context):
-    results = validate_common(text)
-
-    if not _has_spi_begin(text):
+    if not a.has_spi_begin:
         results.append(
             ValidationResult(
                 ok=False,
                 rule="spi",
                 severity="error",
                 message="SPI.begin() がありません",
-                fix_hint="SPI 初期化コードを追加してください",
             )
         )
     return results
 
 
-def validate_i2c_spi(text: str, **context):
-    results = validate_common(text)
-
-    if not _has_wire_begin(text):
-        results.append(
-            ValidationResult(
-                ok=False,
-                rule="i2c",
-                severity="error",
-                message="Wire.begin() がありません",
-            )
+def _check_require_citation(a: TextAnalysis, **context) -> List[ValidationResult]:
+    if a.citations:
+        return []
+    return [
+        ValidationResult(
+            ok=False,
+            rule="require_citation",
+            severity=get_rules().get("require_citation", {}).get("severity", "error"),
+            message="引用が含まれていません",
+            fix_hint="[source: ドキュメント名#chunk_id] を追加してください",
         )
-    if not _has_spi_begin(text):
-        results.append(
-            ValidationResult(
-                ok=False,
-                rule="spi",
-                severity="error",
-                message="SPI.begin() がありません",
-            )
+    ]
+
+
+def rag_confidence_threshold() -> float:
+    return get_rules().get("rag_confidence", {}).get("threshold", 0.25)
+
+
+def _check_rag_confidence(a: TextAnalysis, **context) -> List[ValidationResult]:
+    scores = context.get("rag_scores", [])
+    if scores and max(scores) >= rag_confidence_threshold():
+        return []
+    return [
+        ValidationResult(
+            ok=False,
+            rule="rag_confidence",
+            severity=get_rules().get("rag_confidence", {}).get("severity", "warning"),
+            message="RAG 類似度が低すぎます",
+            fix_hint="資料に基づかず、仕様不明として回答してください",
         )
+    ]
+
+
+# rule key → 実行する check（順序どおり、重複は evaluate で 1 回にまとめる）
+RULE_CHECKS = {
+    "common": (_check_common,),
+    "default": (_check_common,),
+    "i2c": (_check_common, _check_i2c),
+    "spi": (_check_common, _check_spi),
+    "i2c_spi": (_check_common, _check_i2c_spi),
+    "require_citation": (_check_require_citation,),
+    "rag_confidence": (_check_rag_confidence,),
+}
+
+# Python の check が判定するルール。rules.yaml の同名ルールの must_include / forbid は
+# evaluate では評価しない（check は大文字小文字・空白・// コメントを考慮して判定するが、
+# rules.yaml のリテラルは完全一致なので、同じ対象を別の基準で二重に判定しないため）。
+# rules.yaml の must_include / forbid が効くのはこれ以外のルール（uart / wifi / doc_* 等）
+CHECKED_RULES = frozenset({"i2c", "spi", "i2c_spi", "require_citation", "rag_confidence"})
+
+
+def evaluate(text, rule_keys: Iterable[str], matcher=None, **context) -> List[ValidationResult]:
+    """
+    text を 1 回だけ前処理し、rule_keys の check をまとめて評価する。
+    複数ルールに共通する check（validate_common 等）は 1 回しか実行しない。
+    最後に rules.yaml の must_include / forbid を 1 回の走査で評価する
+    （matcher を省略すると rule_engine.get_matcher()。CHECKED_RULES のルールは check だけで判定する）。
+    """
+    a = analyze(text)
+    keys = list(rule_keys)
+    results: List[ValidationResult] = []
+    done = set()
+
+    for key in keys:
+        for check in RULE_CHECKS.get(key, ()):
+            if check in done:
+                continue
+            done.add(check)
+            results.extend(check(a, **context))
+
+    if matcher is None:
+        # rule_engine は core を import するので、ここで読む
+        from .rule_engine import get_matcher
+
+        matcher = get_matcher()
+    yaml_keys = [k for k in keys if k not in CHECKED_RULES]
+    if yaml_keys:
+        results.extend(matcher.results(matcher.hits(a.rule_literals(matcher), yaml_keys)))
+
     return results
 
+# =====================
+# common validator
+# =====================
+def validate_common(text: str, **context) -> List[ValidationResult]:
+    return evaluate(text, ("common",), **context)
+
+# =====================
+# rule-specific validators
+# =====================
+def validate_i2c(text: str, **context):
+    return evaluate(text, ("i2c",), **context)
+
+
+def validate_spi(text: str, **context):
+    return evaluate(text, ("spi",), **context)
+
+
+def validate_i2c_spi(text: str, **context):
+    return evaluate(text, ("i2c_spi",), **context)
+
 
 def validate_default(text: str, **context):
-    return validate_common(text)
+    return evaluate(text, ("default",), **context)
 
 # =====================
 # RAG validators
 # =====================
 def validate_require_citation(text: str, **context):
-    results = []
-    citations = _extract_citations(text)
-
-    if not citations:
-        results.append(
-            ValidationResult(
-                ok=False,
-                rule="require_citation",
-                severity=RULES.get("require_citation", {}).get("severity", "error"),
-                message="引用が含まれていません",
-                fix_hint="[source: ドキュメント名#chunk_id] を追加してください",
-            )
-        )
-    return results
+    return evaluate(text, ("require_citation",), **context)
 
 
 def validate_rag_confidence(text: str, **context):
-    results = []
-
-    scores = context.get("rag_scores", [])
-    threshold = RULES.get("rag_confidence", {}).get("threshold", 0.25)
-
-    if not scores or max(scores) < threshold:
-        results.append(
-            ValidationResult(
-                ok=False,
-                rule="rag_confidence",
-                severity=RULES.get("rag_confidence", {}).get("severity", "warning"),
-                message="RAG 類似度が低すぎます",
-                fix_hint="資料に基づかず、仕様不明として回答してください",
-            )
-        )
-    return results
+    """
+    context["rag_scores"] = 検索結果の cosine 類似度のリスト
+    """
+    return evaluate(text, ("rag_confidence",), **context)
 
 # =====================
 # detect rule key
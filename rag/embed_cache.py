@@ -0,0 +1,232 @@
+# rag/embed_cache.py
+# Embedding の永続キャッシュ（SQLite）
+#
+# key   : sha256(model_name + 正規化テキスト)
+# value : float32 ベクトル（BLOB）
+#
+# app.py の rerun / scripts/ingest_docs.py の再実行 / rag.ingest.vectorize で
+# 同じテキストを何度も encode しないために rag.embedding.encode から透過的に使う。
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rag.embedding import EMBED_DIM
+
+CACHE_PATH = Path("data/vector/embed_cache.sqlite3")
+
+# これを超えたら last_used の古い順に削除する
+MAX_ENTRIES = 200_000
+
+# ヒット時の last_used 更新はメモリに溜め、この件数か put_many / close でまとめて書く
+TOUCH_FLUSH_EVERY = 1000
+
+
+def normalize_text(text: str) -> str:
+    """
+    改行コードと Unicode 表記揺れ（NFC）だけをそろえる
+    （空白はモデルの入力として意味を持ちうるので変えない）
+    """
+    text = unicodedata.normalize("NFC", text)
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def cache_key(model_name: str, text: str) -> str:
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    LRU 付きの永続 embedding キャッシュ
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # 未書き込みの LRU 更新 {key: last_used}
+        self._touched: Dict[str, float] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vec BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)"
+            )
+            self._conn = conn
+        return self._conn
+
+    # =====================
+    # get / put
+    # =====================
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        見つかった key だけを {key: vector} で返す
+        （LRU の last_used 更新は溜めておき、TOUCH_FLUSH_EVERY 件ごとにまとめて書く）
+        """
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+
+        with self._lock:
+            conn = self._connect()
+            # SQLite の変数上限（999）を超えないよう分割
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                rows = conn.execute(
+                    "SELECT key, vec FROM embeddings WHERE key IN (%s)"
+                    % ",".join("?" * len(part)),
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._touched.update((k, now) for k in found)
+                if len(self._touched) >= TOUCH_FLUSH_EVERY:
+                    self._flush_touches(conn)
+                    conn.commit()
+
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+
+        return found
+
+    def put_many(self, keys: Sequence[str], vecs: np.ndarray):
+        if not len(keys):
+            return
+
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+        now = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec, last_used) "
+                "VALUES (?, ?, ?)",
+                [(k, v.tobytes(), now) for k, v in zip(keys, vecs)],
+            )
+            for k in keys:
+                self._touched.pop(k, None)
+            # 追い出す順番を決める前に溜めていた LRU 更新を反映する
+            self._flush_touches(conn)
+            self._evict(conn)
+            conn.commit()
+
+    def _flush_touches(self, conn: sqlite3.Connection):
+        if self._touched:
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(t, k) for k, t in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self, conn: sqlite3.Connection):
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+
+    # =====================
+    # stats
+    # =====================
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connect().execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()
+        return count
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touches(self._conn)
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def cached_encode(
+    texts: List[str],
+    model_name: str,
+    encode_fn,
+    cache: Optional[EmbeddingCache] = None,
+    dim: int = EMBED_DIM,
+) -> np.ndarray:
+    """
+    キャッシュに無いテキストだけを encode_fn(list[str]) -> ndarray で計算する
+    （texts が空なら (0, dim) を返す）
+    """
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+
+    if cache is None:
+        cache = get_cache()
+    keys = [cache_key(model_name, t) for t in texts]
+    found = cache.get_many(keys)
+
+    # 未キャッシュ分（重複は 1 回だけ encode）
+    missing: Dict[str, str] = {}
+    for k, t in zip(keys, texts):
+        if k not in found and k not in missing:
+            missing[k] = t
+
+    if missing:
+        new_vecs = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+        cache.put_many(list(missing.keys()), new_vecs)
+        found.update(zip(missing.keys(), new_vecs))
+
+    return np.stack([found[k] for k in keys]).astype(np.float32, copy=False)
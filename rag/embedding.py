@@ -0,0 +1,79 @@
+# rag/embedding.py
+# Embedding モデルの遅延ロード
+#
+# SentenceTransformer（torch）の import とモデルロードには数秒かかるため、
+# import 時には何もせず、最初に encode が必要になった時点で 1 回だけロードする。
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, List
+
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_DIM = 384
+
+# RAG_EMBED_CACHE=0 で永続キャッシュを無効化
+USE_CACHE = os.environ.get("RAG_EMBED_CACHE", "1") != "0"
+
+_models: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def get_model(model_name: str = EMBED_MODEL_NAME):
+    """
+    SentenceTransformer をスレッドセーフに遅延ロードして返す
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name)
+            _models[model_name] = model
+
+    return model
+
+
+def embedding_dim(model_name: str = EMBED_MODEL_NAME) -> int:
+    """
+    ベクトルの次元（既定モデルならモデルをロードしない）
+    """
+    if model_name == EMBED_MODEL_NAME:
+        return EMBED_DIM
+    return get_model(model_name).get_sentence_embedding_dimension()
+
+
+def encode(
+    texts: List[str],
+    batch_size: int = 32,
+    model_name: str = EMBED_MODEL_NAME,
+    show_progress_bar: bool = False,
+    use_cache: bool = USE_CACHE,
+):
+    """
+    texts を float32 の (n, dim) 配列に変換する
+    use_cache=True ならキャッシュ済みのテキストは encode しない
+    """
+    def _encode(batch: List[str]):
+        return get_model(model_name).encode(
+            batch,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True,
+        ).astype("float32")
+
+    if not texts:
+        import numpy as np
+
+        return np.zeros((0, embedding_dim(model_name)), dtype="float32")
+
+    if not use_cache:
+        return _encode(texts)
+
+    from rag.embed_cache import cached_encode
+
+    return cached_encode(texts, model_name, _encode)
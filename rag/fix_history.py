@@ -1,7 +1,8 @@
 # rag/fix_history.py
 from pathlib import Path
 from datetime import datetime
-import json
+
+from rag.jsonl_writer import get_writer
 
 LOG_DIR = Path(__file__).resolve().parent.parent / "logs"
 LOG_FILE = LOG_DIR / "fix_history.jsonl"
@@ -17,8 +18,6 @@ def record_fix(
     fixed_text: str,
     errors_after: list[str],
 ):
-    LOG_DIR.mkdir(exist_ok=True)
-
     record = {
         "timestamp": datetime.now().isoformat(timespec="seconds"),
         "source": source,
@@ -30,5 +29,5 @@ def record_fix(
         "fixed_text": fixed_text,
     }
 
-    with LOG_FILE.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    # 書き込み・ローテーションはバックグラウンドスレッドで行う
+    get_writer(LOG_FILE).write(record)
@@ -0,0 +1,118 @@
+# rag/ingest/__main__.py
+# フォルダー配下の DOCX / PDF / TXT を Chroma に ingest する
+#
+# 使い方:
+#   python -m rag.ingest <base_dir> [--workers 4] [--batch 64] [--queue 64]
+#                        [--store-batch 1024] [--memory-mb 64]
+#                        [--chroma-path chroma_db] [--collection docs_collection]
+#                        [--dry-run] [--manifest <path>]
+#
+# 前回から追加・変更されたファイルだけを入れ直し、消えたファイルのチャンクは削除する
+# （マニフェストは既定で <chroma-path>/ingest_manifest.sqlite3）。
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from rag.chroma_config import CHROMA_COLLECTION, CHROMA_PATH
+from rag.ingest.loader import iter_documents
+from rag.ingest.manifest import MANIFEST_NAME, IngestManifest, run_incremental
+from rag.ingest.pipeline import (
+    EMBED_BATCH,
+    EXTRACT_WORKERS,
+    PROGRESS_INTERVAL_SEC,
+    QUEUE_SIZE,
+    STORE_BATCH,
+    format_metrics,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rag.ingest")
+    parser.add_argument("base", type=Path, help="ingest 対象のフォルダー")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS, help="抽出プロセス数（0 で単一プロセス）")
+    parser.add_argument("--batch", type=int, default=EMBED_BATCH, help="encode 1 回あたりのチャンク数")
+    parser.add_argument("--store-batch", type=int, default=STORE_BATCH, help="sink.write 1 回にまとめる最大チャンク数")
+    parser.add_argument("--memory-mb", type=float, default=None, help="upsert 1 回あたりのメモリ予算 [MB]")
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE, help="段の間のキューの上限")
+    parser.add_argument("--progress", type=float, default=PROGRESS_INTERVAL_SEC, help="進捗表示の間隔 [s]")
+    parser.add_argument("--chroma-path", default=None)
+    parser.add_argument("--collection", default=None)
+    parser.add_argument("--manifest", type=Path, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="差分を表示するだけで書き込まない")
+    parser.add_argument("--json", action="store_true", help="最後に段ごとの集計を JSON で出す")
+    args = parser.parse_args(argv)
+
+    if not args.base.exists():
+        sys.stderr.write(f"not found: {args.base}\n")
+        sys.exit(2)
+
+    # dry-run では書き込み先（vectorize / chromadb）を読み込まない
+    # （既定値は検索側と同じ rag.chroma_config）
+    chroma_path = args.chroma_path or CHROMA_PATH
+    manifest = IngestManifest(args.manifest or Path(chroma_path) / MANIFEST_NAME)
+
+    sink = None
+    if not args.dry_run:
+        from rag.ingest.vectorize import MEMORY_BUDGET_MB, ChromaSink
+
+        sink = ChromaSink(
+            chroma_path,
+            args.collection or CHROMA_COLLECTION,
+            memory_budget_mb=args.memory_mb or MEMORY_BUDGET_MB,
+        )
+
+    delta, result = run_incremental(
+        iter_documents(args.base),
+        args.base,
+        sink,
+        manifest,
+        dry_run=args.dry_run,
+        workers=args.workers,
+        queue_size=args.queue,
+        embed_batch=args.batch,
+        store_batch=args.store_batch,
+        progress=lambda m: sys.stderr.write(f"[ingest] {format_metrics(m)}\n"),
+        progress_interval=args.progress,
+    )
+
+    if result is not None:
+        for path, error in result.failures:
+            sys.stderr.write(f"[SKIP] {path}: {error}\n")
+
+    if args.json:
+        out = {"delta": delta.as_dict(), "dry_run": args.dry_run}
+        if args.dry_run:
+            out.update(added=delta.added, modified=delta.modified, deleted=delta.deleted)
+        else:
+            out["stages"] = {name: m.as_dict() for name, m in result.metrics.items()}
+            out["sink"] = sink.stats()
+            out["failures"] = [{"path": p, "error": e} for p, e in result.failures]
+        print(json.dumps(out, ensure_ascii=False))
+        return
+
+    d = delta.as_dict()
+    print(
+        f"added: {d['added']}  modified: {d['modified']}  deleted: {d['deleted']}  "
+        f"unchanged: {d['unchanged'] + d['touched']}"
+    )
+    if args.dry_run:
+        for label, paths in (("+", delta.added), ("~", delta.modified), ("-", delta.deleted)):
+            for p in paths:
+                print(f"  {label} {p}")
+        print("(dry run: nothing written)")
+        return
+
+    extract = result.metrics["extract"]
+    written = sink.stats()
+    print(
+        f"files: {extract.items_out} (failed {extract.errors})  "
+        f"rows: {result.rows}  elapsed: {result.metrics['store'].elapsed:.1f}s  "
+        f"upsert: {written['rows_per_sec']:.0f} rows/s ({written['batches']} batches)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,18 @@
 # rag/ingest/chunker.py
+# 分割は rag.chunk のエンジンに統一（見出し / コードフェンス / 文境界を考慮）
+from typing import Optional
 
-def chunk_text(text, max_chars=500):
-    """
-    文章を段落ごとに分割し、max_chars ごとにチャンク化
-    """
-    paragraphs = text.split("\n")
-    chunks = []
-    current_chunk = ""
-    chunk_id = 0
-
-    for p in paragraphs:
-        p = p.strip()
-        if not p:
-            continue
+from rag.chunk import MAX_TOKENS, char_counts, iter_chunks
 
-        if len(current_chunk) + len(p) + 1 > max_chars:
-            chunks.append({"text": current_chunk, "chunk_id": chunk_id})
-            chunk_id += 1
-            current_chunk = p
-        else:
-            if current_chunk:
-                current_chunk += "\n" + p
-            else:
-                current_chunk = p
 
-    if current_chunk:
-        chunks.append({"text": current_chunk, "chunk_id": chunk_id})
+def chunk_text(text, max_chars: Optional[int] = None, max_tokens: int = MAX_TOKENS):
+    """
+    文章をチャンク化して [{"text", "chunk_id"}] を返す
+    max_chars を指定した場合は文字数で、既定は embedding モデルのトークン数で詰める
+    """
+    if max_chars is not None:
+        chunks = iter_chunks(text, max_tokens=max_chars, overlap_tokens=0, count_tokens=char_counts)
+    else:
+        chunks = iter_chunks(text, max_tokens=max_tokens)
 
-    return chunks
+    return [{"text": c.text, "chunk_id": c.index} for c in chunks]
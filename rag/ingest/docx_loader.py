@@ -1,16 +1,117 @@
 # rag/ingest/docx_loader.py
-from docx import Document
+# DOCX → 本文テキスト
+#
+# python-docx でオブジェクトモデルを組み立てずに、zip 内の word/document.xml を
+# iterparse で先頭から読み、段落と表の行を文書の順に返す。
+# 読み終えた段落・表は body から外すので、大きなファイルでもメモリは一定。
+#
+#   段落 : 前後の空白を除いた 1 行（空の段落は出さない）
+#   表   : 1 行ごとに「セル | セル | ...」（セル内の段落は空白でつなぐ）
+from __future__ import annotations
 
-def load_docx_text(path):
+import zipfile
+from typing import Iterator, List
+from xml.etree.ElementTree import iterparse
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+_P = W + "p"
+_T = W + "t"
+_TAB = W + "tab"
+_BR = W + "br"
+_CR = W + "cr"
+_TC = W + "tc"
+_TR = W + "tr"
+_TBL = W + "tbl"
+_BODY = W + "body"
+# mc:AlternateContent は Choice / Fallback に同じテキストボックスを二重に持つ
+_FALLBACK = MC + "Fallback"
+
+DOCUMENT_XML = "word/document.xml"
+CELL_SEP = " | "
+
+
+def iter_docx_blocks(path) -> Iterator[str]:
     """
-    DOCX ファイルから本文テキストを抽出
+    段落と表の行を文書の順に 1 つずつ返す
     """
-    doc = Document(path)
-    lines = []
+    # 段落のテキスト（テキストボックスの段落は外側の段落に入れ子になる）
+    para_stack: List[List[str]] = []
+    # 表の入れ子ごとに、現在の行のセル / 現在のセルの段落
+    row_stack: List[List[str]] = []
+    cell_stack: List[List[str]] = []
+    skip = 0
+    body = None
+
+    with zipfile.ZipFile(path) as zf, zf.open(DOCUMENT_XML) as f:
+        for event, elem in iterparse(f, events=("start", "end")):
+            tag = elem.tag
 
-    for p in doc.paragraphs:
-        text = p.text.strip()
-        if text:
-            lines.append(text)
+            if tag == _FALLBACK:
+                skip += 1 if event == "start" else -1
+                if event == "end":
+                    elem.clear()
+                continue
+            if skip:
+                continue
 
-    return "\n".join(lines)
+            if event == "start":
+                if tag == _BODY:
+                    body = elem
+                elif tag == _P:
+                    para_stack.append([])
+                elif tag == _TR:
+                    row_stack.append([])
+                elif tag == _TC:
+                    cell_stack.append([])
+                continue
+
+            # ---- end ----
+            if tag == _T:
+                if para_stack and elem.text:
+                    para_stack[-1].append(elem.text)
+            elif tag == _TAB:
+                if para_stack:
+                    para_stack[-1].append("\t")
+            elif tag in (_BR, _CR):
+                if para_stack:
+                    para_stack[-1].append("\n")
+            elif tag == _P:
+                text = "".join(para_stack.pop()).strip()
+                if para_stack:
+                    if text:
+                        para_stack[-1].append(f"\n{text}\n")
+                elif cell_stack:
+                    if text:
+                        cell_stack[-1].append(text)
+                else:
+                    # body 直下の段落を読み終えた → 木から外す
+                    if body is not None:
+                        body.clear()
+                    if text:
+                        yield text
+            elif tag == _TC:
+                cell = " ".join(cell_stack.pop())
+                if row_stack:
+                    row_stack[-1].append(cell)
+            elif tag == _TR:
+                cells = row_stack.pop()
+                elem.clear()
+                if not any(cells):
+                    continue
+                row = CELL_SEP.join(cells)
+                # 表の中の表はセルの一部として外側の表に入れる
+                if cell_stack:
+                    cell_stack[-1].append(row)
+                else:
+                    yield row
+            elif tag == _TBL and not cell_stack and body is not None:
+                body.clear()
+
+
+def load_docx_text(path) -> str:
+    """
+    DOCX ファイルから本文テキスト（表を含む）を抽出
+    """
+    return "\n".join(iter_docx_blocks(path))
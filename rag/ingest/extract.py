@@ -0,0 +1,97 @@
+# rag/ingest/extract.py
+# ファイル → 本文テキスト
+#
+# pipeline の抽出段からプロセスプール経由で呼ばれるので、
+# pickle できるトップレベル関数だけで構成する。
+# DOCX は標準ライブラリだけで読む（docx_loader）。pypdf は使うときに import する
+# （無ければ PDF だけ抽出エラーになる）。
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from .manifest import file_hash
+from .text_cache import get_text_cache
+
+# .txt の文字コード候補（NAS 上の古いファイルは Shift_JIS が多い）
+TEXT_ENCODINGS = ("utf-8-sig", "cp932")
+
+
+def load_txt_text(path) -> str:
+    data = Path(path).read_bytes()
+    for enc in TEXT_ENCODINGS:
+        try:
+            return data.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+
+def load_docx_text(path) -> str:
+    from .docx_loader import load_docx_text as _load
+
+    return _load(path)
+
+
+def load_pdf_text(path) -> str:
+    from .pdf_loader import load_pdf_text as _load
+
+    return _load(path)
+
+
+EXTRACTORS = {
+    ".txt": load_txt_text,
+    ".docx": load_docx_text,
+    ".pdf": load_pdf_text,
+}
+
+
+def extract_text(path) -> str:
+    ext = Path(path).suffix.lower()
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        raise ValueError(f"unsupported file type: {path}")
+    return extractor(path)
+
+
+# =====================
+# ページ位置付きの抽出（パイプライン用）
+# =====================
+# パースが重いので抽出結果をファイルハッシュでキャッシュする形式
+CACHED_EXTS = (".pdf",)
+
+
+@dataclass
+class Extracted:
+    text: str
+    # pages[i] = i+1 ページ目が text の何文字目から始まるか（ページの無い形式は None）
+    pages: Optional[List[int]] = None
+
+
+def _extract_uncached(path, ext: str) -> Extracted:
+    if ext == ".pdf":
+        from .pdf_loader import load_pdf_pages
+
+        return Extracted(*load_pdf_pages(path))
+    return Extracted(extract_text(path))
+
+
+def extract_document(path, sha256: Optional[str] = None) -> Extracted:
+    """
+    extract_text + PDF のページ位置。
+    CACHED_EXTS は内容ハッシュ（sha256 を渡せば再計算しない）でキャッシュを引く。
+    """
+    ext = Path(path).suffix.lower()
+    if ext not in EXTRACTORS:
+        raise ValueError(f"unsupported file type: {path}")
+    if ext not in CACHED_EXTS:
+        return _extract_uncached(path, ext)
+
+    cache = get_text_cache()
+    key = cache.key(sha256 or file_hash(path), ext)
+    hit = cache.get(key)
+    if hit is not None:
+        return Extracted(*hit)
+
+    doc = _extract_uncached(path, ext)
+    cache.put(key, doc.text, doc.pages)
+    return doc
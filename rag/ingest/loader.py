@@ -7,16 +7,16 @@ SUPPORTED_EXTS = {".pdf", ".docx", ".txt"}
 # 明示的に除外
 SKIP_EXTS = {".exe", ".lnk", ".jpg", ".jpeg", ".png", ".mp4", ".avi"}
 
-def load_documents(base_path: Path):
+def iter_documents(base_path: Path):
     """
     契約書フォルダー配下を再帰的にスキャンし
-    ingest 対象ファイルだけを収集する
+    ingest 対象ファイルを見つけた順に返す（一覧をメモリに溜めない）
     """
+    # 相対 / 絶対どちらで渡しても同じ path になるよう解決しておく（manifest・chunk id の key）
+    base_path = Path(base_path).resolve()
     if not base_path.exists():
         raise FileNotFoundError(base_path)
 
-    docs = []
-
     for path in base_path.rglob("*"):
         if not path.is_file():
             continue
@@ -29,17 +29,22 @@ def load_documents(base_path: Path):
         if ext not in SUPPORTED_EXTS:
             continue
 
-        docs.append(
-            {
-                "path": path,
-                "ext": ext,
-                "meta": {
-                    "source": "nas",
-                    "category": "contract",
-                    "path": str(path),
-                    "name": path.name,
-                },
-            }
-        )
-
-    return docs
+        yield {
+            "path": path,
+            "ext": ext,
+            "meta": {
+                # 取り込み元（source は retriever / qa の引用に使うのでファイル名）
+                "origin": "nas",
+                "source": path.name,
+                "category": "contract",
+                "path": str(path),
+                "name": path.name,
+            },
+        }
+
+
+def load_documents(base_path: Path):
+    """
+    iter_documents の結果をリストで返す（件数の集計などに）
+    """
+    return list(iter_documents(base_path))
@@ -0,0 +1,256 @@
+# rag/ingest/manifest.py
+# インクリメンタル ingest 用のファイルマニフェスト（SQLite）
+#
+# path ごとに mtime / size / 内容ハッシュ / チャンク数を持ち、
+#   - mtime と size が前回と同じファイルは開かずにスキップ
+#   - mtime / size が変わっていてもハッシュが同じなら記録だけ更新してスキップ
+#   - 内容が変わったファイルは古いチャンクを消してから入れ直す
+#   - 前回あって今回のスキャンに無いファイルはストアから削除する
+# マニフェストへの記録はそのファイルの全チャンクを書き込み終えてから行うので、
+# 途中で止まっても次回に未完了分だけやり直される。
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set
+
+MANIFEST_NAME = "ingest_manifest.sqlite3"
+HASH_BLOCK = 1024 * 1024
+
+
+def file_hash(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@dataclass
+class FileEntry:
+    path: str
+    root: str
+    mtime_ns: int
+    size: int
+    sha256: str
+    chunks: int = 0
+
+
+@dataclass
+class IngestDelta:
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    touched: int = 0  # mtime / size だけ変わった（内容は同じ）
+    deleted: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "added": len(self.added),
+            "modified": len(self.modified),
+            "unchanged": self.unchanged,
+            "touched": self.touched,
+            "deleted": len(self.deleted),
+        }
+
+
+class IngestManifest:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path     TEXT PRIMARY KEY,
+                    root     TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size     INTEGER NOT NULL,
+                    sha256   TEXT NOT NULL,
+                    chunks   INTEGER NOT NULL,
+                    ingested_at TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_files_root ON files(root)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # =====================
+    # read
+    # =====================
+    def get(self, path: str) -> Optional[FileEntry]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT path, root, mtime_ns, size, sha256, chunks FROM files WHERE path = ?",
+                (path,),
+            ).fetchone()
+        return FileEntry(*row) if row else None
+
+    def paths(self, root: str) -> Set[str]:
+        with self._lock:
+            rows = self._connect().execute("SELECT path FROM files WHERE root = ?", (root,))
+            return {r[0] for r in rows}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    # =====================
+    # write
+    # =====================
+    def record(self, entry: FileEntry):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, root, mtime_ns, size, sha256, chunks, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.path, entry.root, entry.mtime_ns, entry.size, entry.sha256,
+                    entry.chunks, datetime.utcnow().isoformat(timespec="seconds"),
+                ),
+            )
+            conn.commit()
+
+    def remove(self, paths: Iterable[str]):
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+            conn.commit()
+
+    # =====================
+    # delta
+    # =====================
+    def scan(
+        self, docs: Iterable[dict], root, delta: IngestDelta, dry_run: bool = False
+    ) -> Iterator[dict]:
+        """
+        docs（loader.iter_documents の要素）のうち ingest が必要なものだけを返す。
+        返す doc には "entry"（書き込み完了後に record する FileEntry）と
+        "replace"（既存チャンクを先に消す）が付く。
+        走査し終えた時点で delta.deleted に消えたファイルが入る。
+        """
+        root = str(root)
+        seen: Set[str] = set()
+
+        for doc in docs:
+            path = doc["meta"].get("path", str(doc["path"]))
+            seen.add(path)
+
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            prev = self.get(path)
+
+            if prev is not None and prev.mtime_ns == st.st_mtime_ns and prev.size == st.st_size:
+                delta.unchanged += 1
+                continue
+
+            digest = file_hash(path)
+            entry = FileEntry(path, root, st.st_mtime_ns, st.st_size, digest)
+
+            if prev is not None and prev.sha256 == digest:
+                delta.touched += 1
+                if not dry_run:
+                    entry.chunks = prev.chunks
+                    self.record(entry)
+                continue
+
+            (delta.modified if prev is not None else delta.added).append(path)
+            # 新規でも消してから入れる（マニフェスト導入前 / 中断した回に書いた分を残さない）。
+            # マニフェスト導入前は path を相対パスのまま書いていたので、その書き方でも消す
+            replaced = {**doc, "entry": entry, "replace": True}
+            if prev is None:
+                replaced["replace_paths"] = legacy_paths(path)
+            yield replaced
+
+        delta.deleted = sorted(self.paths(root) - seen)
+
+def legacy_paths(path: str) -> List[str]:
+    """
+    解決前の書き方の path（カレントディレクトリからの相対パス）。
+    旧 ingest（scripts/ingest_docs.py の {stem}-{i} id、store_in_chroma の {path}_{chunk_id} id）は
+    どちらも metadata の path にこの形で書いているので、path で消せば id の形式によらず消える
+    """
+    try:
+        rel = os.path.relpath(path)
+    except ValueError:
+        # Windows で別ドライブ
+        return []
+    if rel == path or rel.startswith(os.pardir):
+        return []
+    return [rel]
+
+# =====================
+# incremental run
+# =====================
+def run_incremental(
+    docs: Iterable[dict],
+    root,
+    sink,
+    manifest: IngestManifest,
+    dry_run: bool = False,
+    **options,
+):
+    """
+    マニフェストと突き合わせて差分だけを ingest し、消えたファイルをストアから削除する
+    → (IngestDelta, IngestResult or None)
+
+    dry_run なら差分を数えるだけで、抽出・書き込み・マニフェスト更新はしない
+    （sink は None でよい）。
+    """
+    from .pipeline import IngestPipeline
+
+    # iter_documents と同じく解決した root で記録する
+    typed_root = str(root)
+    root = str(Path(root).resolve())
+
+    delta = IngestDelta()
+    todo = manifest.scan(docs, root, delta, dry_run=dry_run)
+
+    def drop_unresolved():
+        # 解決前の書き方の root で記録された分（以前の相対パスでの実行）は
+        # 解決後の path で入れ直すので、消えたファイルと同じく削除する
+        if typed_root != root:
+            delta.deleted = sorted(set(delta.deleted) | manifest.paths(typed_root))
+
+    if dry_run:
+        for _ in todo:
+            pass
+        drop_unresolved()
+        return delta, None
+
+    def on_file_done(doc: dict, chunks: int):
+        entry = doc["entry"]
+        entry.chunks = chunks
+        manifest.record(entry)
+
+    result = IngestPipeline(sink, on_file_done=on_file_done, **options).run(todo)
+    drop_unresolved()
+
+    # スキャンを最後まで終えてから（= 途中で失敗していなければ）削除する
+    if delta.deleted:
+        sink.delete_paths(delta.deleted)
+        manifest.remove(delta.deleted)
+
+    return delta, result
@@ -0,0 +1,94 @@
+# rag/ingest/pdf_loader.py
+# PDF → ページごとの本文テキスト
+#
+# ページは先頭から順に 1 ページずつ返す（全ページを一度に抱えない）。
+# ページ数の多い PDF はページ範囲に分けてプロセスプールで並列に抽出する。
+# ただし ingest パイプラインのワーカー（子プロセス）の中ではファイル単位で
+# 並列化済みなので、入れ子のプールは作らず順に処理する。
+# pypdf は使うときに import する。
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+# このページ数以上の PDF をページ並列で抽出する
+PARALLEL_MIN_PAGES = 40
+# ワーカー 1 回あたりのページ数
+PAGES_PER_TASK = 8
+PAGE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# ページ間の区切り（チャンク分割の段落境界になる）
+PAGE_SEP = "\n\n"
+
+
+def _open(path):
+    from pypdf import PdfReader
+
+    return PdfReader(str(path))
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[str]:
+    """
+    ワーカー側: pages[start:stop] の本文（ワーカーごとに PDF を開き直す）
+    """
+    reader = _open(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _default_workers() -> int:
+    # 子プロセスの中（= パイプラインの抽出ワーカー）では並列化しない
+    if multiprocessing.parent_process() is not None:
+        return 1
+    return PAGE_WORKERS
+
+
+def iter_pdf_pages(path, workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    (ページ番号（1 始まり）, 本文) をページ順に返す
+    """
+    if workers is None:
+        workers = _default_workers()
+
+    reader = _open(path)
+    n = len(reader.pages)
+
+    if workers <= 1 or n < PARALLEL_MIN_PAGES:
+        for i, page in enumerate(reader.pages):
+            yield i + 1, page.extract_text() or ""
+        return
+
+    ranges = [(i, min(i + PAGES_PER_TASK, n)) for i in range(0, n, PAGES_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        # map は投入順に結果を返すので、先頭の範囲から順に流せる
+        results = pool.map(
+            _extract_range,
+            [str(path)] * len(ranges),
+            [r[0] for r in ranges],
+            [r[1] for r in ranges],
+        )
+        for (start, _), texts in zip(ranges, results):
+            for offset, text in enumerate(texts):
+                yield start + offset + 1, text
+
+
+def load_pdf_pages(path, workers: Optional[int] = None) -> Tuple[str, List[int]]:
+    """
+    PDF 全体の本文と、各ページが本文の何文字目から始まるか（pages[i] = i+1 ページ目の先頭）
+    """
+    parts: List[str] = []
+    pages: List[int] = []
+    pos = 0
+    for _, text in iter_pdf_pages(path, workers=workers):
+        if parts:
+            parts.append(PAGE_SEP)
+            pos += len(PAGE_SEP)
+        pages.append(pos)
+        parts.append(text)
+        pos += len(text)
+    return "".join(parts), pages
+
+
+def load_pdf_text(path) -> str:
+    return load_pdf_pages(path)[0]
@@ -0,0 +1,480 @@
+# rag/ingest/pipeline.py
+# ストリーミング ingest パイプライン
+#
+#   scan → extract（プロセスプール）→ chunk → embed（バッチ）→ store（一括書き込み）
+#
+# 段の間は上限付きキューでつなぎ、下流が詰まると上流の put が待つ（backpressure）。
+# ファイル一覧・全文・全チャンクのどれも丸ごとメモリに載せない。
+# 各段の件数・処理時間を StageMetrics に集計し、progress コールバックで定期的に渡す。
+from __future__ import annotations
+
+import bisect
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from rag.chroma_config import chunk_id
+from rag.chunk import MAX_TOKENS, OVERLAP_TOKENS, iter_chunks_many
+
+from .extract import extract_document
+
+# 段の間のキューの上限（件数）
+QUEUE_SIZE = 64
+# 抽出ワーカー数（0 なら抽出段のスレッドで直接処理する）
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# ワーカーあたりの先行投入数（プールに積む未完了ジョブの上限 = workers * これ）
+EXTRACT_PREFETCH = 2
+# 1 回の encode にまとめるチャンク数
+EMBED_BATCH = 64
+# store 段で 1 回の sink.write にまとめる上限行数（キューに溜まっている分だけまとめる）
+STORE_BATCH = 1024
+PROGRESS_INTERVAL_SEC = 5.0
+
+STAGES = ("extract", "chunk", "embed", "store")
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    """
+    他の段が失敗したので止める
+    """
+
+
+@dataclass
+class _FileEvent:
+    """
+    チャンクと同じキューで store 段まで運ぶファイル単位の通知
+    kind: "replace"（このファイルの既存チャンクを消す）/ "done"（全チャンクを投入した）
+    """
+    kind: str
+    doc: dict
+    chunks: int = 0
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_sec: float = 0.0  # 処理に使った時間（キュー待ちを含まない）
+    started: float = 0.0
+    finished: float = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        if not self.started:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rate(self) -> float:
+        """
+        items_out / s（段の開始から）
+        """
+        elapsed = self.elapsed
+        return self.items_out / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "in": self.items_in,
+            "out": self.items_out,
+            "errors": self.errors,
+            "busy_sec": round(self.busy_sec, 3),
+            "elapsed_sec": round(self.elapsed, 3),
+            "rate": round(self.rate, 1),
+        }
+
+
+def format_metrics(metrics: Dict[str, StageMetrics]) -> str:
+    parts = []
+    for name in STAGES:
+        m = metrics[name]
+        s = f"{name} {m.items_out} ({m.rate:.1f}/s"
+        if m.errors:
+            s += f", {m.errors} err"
+        parts.append(s + ")")
+    return " | ".join(parts)
+
+
+@dataclass
+class IngestResult:
+    metrics: Dict[str, StageMetrics]
+    failures: List[Tuple[str, str]] = field(default_factory=list)  # (path, error)
+
+    @property
+    def rows(self) -> int:
+        return self.metrics["store"].items_out
+
+
+class IngestPipeline:
+    """
+    pipeline = IngestPipeline(sink)
+    result = pipeline.run(iter_documents(base))
+
+    sink は write(records, vecs) -> 書き込んだ件数 を持つオブジェクト。
+    records は {"id", "text", "meta"} のリスト、vecs は (len(records), dim) の float32 配列。
+
+    doc に "replace": True があれば、そのファイルのチャンクを書く前に
+    sink.delete_paths([path]) で既存分を消す（"replace_paths" があればその path の分も）。
+    on_file_done(doc, chunks) はファイルの全チャンクが sink に書かれた後に呼ばれる。
+    """
+
+    def __init__(
+        self,
+        sink,
+        *,
+        workers: int = EXTRACT_WORKERS,
+        queue_size: int = QUEUE_SIZE,
+        embed_batch: int = EMBED_BATCH,
+        store_batch: int = STORE_BATCH,
+        max_tokens: int = MAX_TOKENS,
+        overlap_tokens: int = OVERLAP_TOKENS,
+        encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+        progress: Optional[Callable[[Dict[str, StageMetrics]], None]] = None,
+        progress_interval: float = PROGRESS_INTERVAL_SEC,
+        on_file_done: Optional[Callable[[dict, int], None]] = None,
+    ):
+        self.sink = sink
+        self.workers = workers
+        self.queue_size = queue_size
+        self.embed_batch = embed_batch
+        self.store_batch = store_batch
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encode_fn = encode_fn
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.on_file_done = on_file_done
+
+        self.metrics: Dict[str, StageMetrics] = {}
+        self.failures: List[Tuple[str, str]] = []
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    # ---------- run ----------
+    def run(self, docs: Iterable[dict]) -> IngestResult:
+        """
+        docs（rag.ingest.loader.iter_documents の要素）を最後まで流して結果を返す。
+        いずれかの段で例外が出たら全段を止めてその例外を送出する
+        （抽出失敗はファイル単位で failures に記録して続行）。
+        """
+        self.metrics = {name: StageMetrics(name) for name in STAGES}
+        self.failures = []
+        self._abort.clear()
+        self._error = None
+
+        texts: "queue.Queue" = queue.Queue(self.queue_size)
+        chunks: "queue.Queue" = queue.Queue(self.queue_size * self.embed_batch)
+        batches: "queue.Queue" = queue.Queue(self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._guard, args=(self._extract_stage, docs, texts), name="ingest-extract"),
+            threading.Thread(target=self._guard, args=(self._chunk_stage, texts, chunks), name="ingest-chunk"),
+            threading.Thread(target=self._guard, args=(self._embed_stage, chunks, batches), name="ingest-embed"),
+            threading.Thread(target=self._guard, args=(self._store_stage, batches), name="ingest-store"),
+        ]
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        next_report = time.monotonic() + self.progress_interval
+        for t in threads:
+            while t.is_alive():
+                t.join(timeout=0.2)
+                if self.progress and time.monotonic() >= next_report:
+                    self.progress(self.metrics)
+                    next_report = time.monotonic() + self.progress_interval
+
+        if self._error is not None:
+            raise self._error
+        if self.progress:
+            self.progress(self.metrics)
+        return IngestResult(self.metrics, list(self.failures))
+
+    def _guard(self, stage, *args):
+        try:
+            stage(*args)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._abort.set()
+
+    # ---------- queue helpers（abort を見ながら待つ） ----------
+    def _put(self, q: "queue.Queue", item):
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: "queue.Queue"):
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    # ---------- stages ----------
+    @staticmethod
+    def _known_hash(doc: dict) -> Optional[str]:
+        # manifest.scan 済みの doc はハッシュ計算済み（抽出キャッシュの key に使う）
+        entry = doc.get("entry")
+        return getattr(entry, "sha256", None)
+
+    def _extract_stage(self, docs: Iterable[dict], out: "queue.Queue"):
+        m = self.metrics["extract"]
+        m.started = time.perf_counter()
+
+        def emit(doc, text, error):
+            if error is not None:
+                m.errors += 1
+                self.failures.append((str(doc["path"]), error))
+                return
+            m.items_out += 1
+            self._put(out, (doc, text))
+
+        if self.workers <= 0:
+            for doc in docs:
+                m.items_in += 1
+                t0 = time.perf_counter()
+                try:
+                    text, error = extract_document(doc["path"], self._known_hash(doc)), None
+                except Exception as e:
+                    text, error = None, f"{type(e).__name__}: {e}"
+                m.busy_sec += time.perf_counter() - t0
+                emit(doc, text, error)
+        else:
+            limit = self.workers * EXTRACT_PREFETCH
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                pending = {}
+
+                def drain(block: bool):
+                    done, _ = wait(
+                        pending, timeout=None if block else 0, return_when=FIRST_COMPLETED
+                    )
+                    for fut in done:
+                        doc, t0 = pending.pop(fut)
+                        m.busy_sec += time.perf_counter() - t0
+                        try:
+                            emit(doc, fut.result(), None)
+                        except _Aborted:
+                            raise
+                        except Exception as e:
+                            emit(doc, None, f"{type(e).__name__}: {e}")
+
+                try:
+                    for doc in docs:
+                        m.items_in += 1
+                        # 未完了ジョブが上限に達したら 1 件終わるまで待つ
+                        while len(pending) >= limit:
+                            drain(block=True)
+                        fut = pool.submit(extract_document, doc["path"], self._known_hash(doc))
+                        pending[fut] = (doc, time.perf_counter())
+                        drain(block=False)
+                    while pending:
+                        drain(block=True)
+                except _Aborted:
+                    for fut in pending:
+                        fut.cancel()
+                    raise
+
+        m.finished = time.perf_counter()
+        self._put(out, _DONE)
+
+    def _take_texts(self, inp: "queue.Queue") -> Tuple[List[tuple], bool]:
+        """
+        抽出済みの doc を 1 件待ち、続けてすでにキューにある分を待たずに取る
+        → (docs, 終端に達したか)
+        """
+        item = self._get(inp)
+        if item is _DONE:
+            return [], True
+        items = [item]
+        while len(items) < self.queue_size:
+            try:
+                item = inp.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _chunk_stage(self, inp: "queue.Queue", out: "queue.Queue"):
+        m = self.metrics["chunk"]
+        m.started = time.perf_counter()
+
+        finished = False
+        while not finished:
+            items, finished = self._take_texts(inp)
+            if not items:
+                continue
+            m.items_in += len(items)
+
+            # 溜まっている doc はまとめて分割する（トークン数・スコアを文書をまたいで一括計算）
+            t0 = time.perf_counter()
+            chunks = iter_chunks_many(
+                ((extracted.text, doc["meta"].get("name", "")) for doc, extracted in items),
+                max_tokens=self.max_tokens,
+                overlap_tokens=self.overlap_tokens,
+            )
+            # 次に開始する doc / 現在の doc のチャンク数
+            nxt = 0
+            n = 0
+
+            def start_until(k: int):
+                # k 番目の doc まで開始する（チャンクの無い doc は done まで進める）
+                nonlocal nxt, n
+                while nxt <= k:
+                    if nxt > 0:
+                        self._put(out, _FileEvent("done", items[nxt - 1][0], n))
+                    n = 0
+                    if items[nxt][0].get("replace"):
+                        self._put(out, _FileEvent("replace", items[nxt][0]))
+                    nxt += 1
+
+            for k, c in chunks:
+                m.busy_sec += time.perf_counter() - t0
+                start_until(k)
+                doc, extracted = items[k]
+                meta = doc["meta"]
+                path = meta.get("path", str(doc["path"]))
+                record = {
+                    # 既存の store_in_chroma / ChromaRetriever と同じ id（path + chunk_id）
+                    "id": chunk_id(path, c.index),
+                    "text": c.text,
+                    # source / chunk_index は retriever（_to_result）と qa.cite が読む
+                    "meta": {
+                        **meta,
+                        "source": meta.get("source") or meta.get("name", ""),
+                        "chunk_id": c.index,
+                        "chunk_index": c.index,
+                        "score": c.score,
+                    },
+                }
+                pages = extracted.pages
+                if pages:
+                    # 引用用のページ番号（1 始まり、チャンクがページをまたぐなら終わりも）
+                    record["meta"]["page"] = bisect.bisect_right(pages, c.start)
+                    record["meta"]["page_end"] = bisect.bisect_right(pages, max(c.start, c.end - 1))
+                m.items_out += 1
+                n += 1
+                self._put(out, record)
+                t0 = time.perf_counter()
+            m.busy_sec += time.perf_counter() - t0
+            start_until(len(items) - 1)
+            self._put(out, _FileEvent("done", items[-1][0], n))
+
+        m.finished = time.perf_counter()
+        self._put(out, _DONE)
+
+    def _embed_stage(self, inp: "queue.Queue", out: "queue.Queue"):
+        m = self.metrics["embed"]
+        m.started = time.perf_counter()
+
+        encode_fn = self.encode_fn
+        if encode_fn is None:
+            from rag.embedding import encode
+
+            def encode_fn(texts):
+                return encode(texts, batch_size=self.embed_batch)
+
+        def flush(batch, events):
+            vecs = None
+            if batch:
+                t0 = time.perf_counter()
+                vecs = encode_fn([r["text"] for r in batch])
+                m.busy_sec += time.perf_counter() - t0
+                m.items_out += len(batch)
+            self._put(out, (batch, vecs, events))
+
+        # ファイル通知はそれまでのチャンクと同じバッチに載せて順序を保つ
+        batch: List[dict] = []
+        events: List[_FileEvent] = []
+        while True:
+            item = self._get(inp)
+            if item is _DONE:
+                break
+            if isinstance(item, _FileEvent):
+                events.append(item)
+                continue
+            m.items_in += 1
+            batch.append(item)
+            if len(batch) >= self.embed_batch:
+                flush(batch, events)
+                batch, events = [], []
+        if batch or events:
+            flush(batch, events)
+
+        m.finished = time.perf_counter()
+        self._put(out, _DONE)
+
+    def _store_stage(self, inp: "queue.Queue"):
+        m = self.metrics["store"]
+        m.started = time.perf_counter()
+
+        done = False
+        while not done:
+            item = self._get(inp)
+            if item is _DONE:
+                break
+
+            # 既にキューに届いているバッチは待たずに 1 回の書き込みにまとめる
+            items = [item]
+            rows = len(item[0])
+            while rows < self.store_batch:
+                try:
+                    nxt = inp.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _DONE:
+                    done = True
+                    break
+                items.append(nxt)
+                rows += len(nxt[0])
+
+            records = [r for recs, _, _ in items for r in recs]
+            vecs = [v for recs, v, _ in items if recs]
+            events = [e for _, _, evs in items for e in evs]
+            m.items_in += len(records)
+            t0 = time.perf_counter()
+
+            # replace はこのバッチの書き込み前、done は書き込み後に処理する
+            # （replace されるファイルのチャンクは replace より後にしか来ないので、まとめても順序は崩れない）
+            replace = [
+                p
+                for e in events if e.kind == "replace"
+                for p in (e.doc["meta"].get("path", str(e.doc["path"])), *e.doc.get("replace_paths", ()))
+            ]
+            if replace:
+                self.sink.delete_paths(replace)
+            if records:
+                written = self.sink.write(records, vecs[0] if len(vecs) == 1 else np.concatenate(vecs))
+                m.items_out += len(records) if written is None else written
+            m.busy_sec += time.perf_counter() - t0
+
+            if self.on_file_done is not None:
+                for e in events:
+                    if e.kind == "done":
+                        self.on_file_done(e.doc, e.chunks)
+
+        m.finished = time.perf_counter()
+
+
+def run_pipeline(docs: Iterable[dict], sink, **options) -> IngestResult:
+    return IngestPipeline(sink, **options).run(docs)
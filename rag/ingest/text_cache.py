@@ -0,0 +1,125 @@
+# rag/ingest/text_cache.py
+# 抽出済みテキストの永続キャッシュ（SQLite）
+#
+# key   : ファイル内容の sha256 + 抽出器のバージョン
+# value : zlib 圧縮した本文 + ページ先頭位置（PDF のみ）
+#
+# 再 ingest（チャンク設定の変更・コレクションの作り直しなど）で
+# 同じ PDF / DOCX を何度もパースしないために extract.extract_document から使う。
+# 抽出ワーカー（別プロセス）からも開くので、接続はプロセスごとに持つ。
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+CACHE_PATH = Path("data/vector/text_cache.sqlite3")
+
+# 抽出処理を変えたら上げる（古いキャッシュを使わない）
+EXTRACT_VERSION = 1
+
+# これを超えたら last_used の古い順に削除する
+MAX_ENTRIES = 20_000
+
+
+class TextCache:
+    def __init__(self, path: Path = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # fork したワーカーに親の接続を使わせない
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS texts (
+                    key TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    pages TEXT,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_texts_last_used ON texts(last_used)")
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def key(sha256: str, ext: str) -> str:
+        return f"{sha256}:{ext.lower()}:v{EXTRACT_VERSION}"
+
+    # =====================
+    # get / put
+    # =====================
+    def get(self, key: str) -> Optional[Tuple[str, Optional[List[int]]]]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT body, pages FROM texts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE texts SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+
+        body, pages = row
+        return zlib.decompress(body).decode("utf-8"), json.loads(pages) if pages else None
+
+    def put(self, key: str, text: str, pages: Optional[List[int]] = None):
+        body = zlib.compress(text.encode("utf-8"), 6)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO texts (key, body, pages, last_used) VALUES (?, ?, ?, ?)",
+                (key, body, json.dumps(pages) if pages is not None else None, time.time()),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM texts").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM texts WHERE key IN ("
+                    "SELECT key FROM texts ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+            conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connect().execute("SELECT COUNT(*) FROM texts").fetchone()
+        return count
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[TextCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_text_cache() -> TextCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TextCache()
+    return _cache
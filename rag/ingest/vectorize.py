@@ -1,36 +1,170 @@
 # rag/ingest/vectorize.py
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+# chunk → embedding → Chroma
+#
+# 書き込みは ChromaSink に一本化する:
+#   - upsert（id は path + chunk_id）なので、途中で落ちて再実行しても重複しない
+#   - 保存先・collection・id は rag.chroma_config（検索側の ChromaRetriever と共通）
+#   - 1 回の upsert の行数はメモリ予算から決める（embedding + 本文 + metadata の見積り）
+#   - embedding は numpy 配列のまま渡す（古い chromadb で受け付けなければ tolist に切り替え、
+#     list の大きさで行数を決め直す）
+# chromadb は使うときに import する。
+from __future__ import annotations
 
-# Embedding モデル
-EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+import time
+
+import numpy as np
+
+from rag.chroma_config import CHROMA_COLLECTION, CHROMA_PATH, COLLECTION_METADATA, chunk_id
+from rag.embedding import EMBED_MODEL_NAME, encode
+
+# delete の where に 1 回で渡す path 数
+DELETE_BATCH = 500
+# 1 回の upsert に載せるデータ量の目安
+MEMORY_BUDGET_MB = 64
+# client から上限が取れないときの 1 回の upsert の最大行数（chromadb の SQLite 既定）
+MAX_BATCH_ROWS = 5461
+# tolist した embedding の 1 次元あたりのバイト数（list のポインタ + float オブジェクト）
+LIST_FLOAT_BYTES = 32
+# ndarray を受け付けない chromadb が出すエラー（これ以外の ValueError では切り替えない）
+NOT_LIST_ERROR = "Expected embeddings to be a list"
 
 def embed_chunks(chunks):
     """
     chunks = [{"text": ..., "meta": {...}}, ...]
+    encode 済みのテキストは embedding キャッシュから返る
     """
-    model = SentenceTransformer(EMBED_MODEL_NAME)
     texts = [c["text"] for c in chunks]
-    embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+    embeddings = encode(texts, model_name=EMBED_MODEL_NAME, show_progress_bar=True)
     return embeddings
 
-def store_in_chroma(chunks, embeddings, collection_name="contracts"):
-    client = chromadb.Client(Settings(chroma_db_impl="duckdb+parquet", persist_directory="./chroma_db"))
-    if collection_name in [c.name for c in client.list_collections()]:
-        collection = client.get_collection(name=collection_name)
-    else:
-        collection = client.create_collection(name=collection_name)
-
-    # ID は path + chunk_id
-    ids = [f"{c['meta']['path']}_{c['chunk_id']}" for c in chunks]
-
-    collection.add(
-        ids=ids,
-        documents=[c["text"] for c in chunks],
-        metadatas=[c["meta"] for c in chunks],
-        embeddings=embeddings.tolist()
-    )
-
-    # 永続化
-    client.persist()
+def store_in_chroma(chunks, embeddings, collection_name=CHROMA_COLLECTION):
+    """
+    chunks と embeddings をメモリ予算ごとのバッチで upsert する → 書き込んだ件数
+    """
+    sink = ChromaSink(CHROMA_PATH, collection_name)
+    records = [
+        {"id": chunk_id(c["meta"]["path"], c["chunk_id"]), "text": c["text"], "meta": c["meta"]}
+        for c in chunks
+    ]
+    return sink.write(records, embeddings)
+
+
+class ChromaSink:
+    """
+    ingest pipeline の store 段: 受け取った records をメモリ予算に収まるバッチに分けて upsert する
+    （id は path + chunk_id なので、再実行しても重複しない）
+
+    stats() で書き込み行数と rows/s を返す。
+    collection を渡せばそれに書く（client は作らない）。
+    """
+
+    def __init__(
+        self,
+        path=CHROMA_PATH,
+        collection_name=CHROMA_COLLECTION,
+        memory_budget_mb: float = MEMORY_BUDGET_MB,
+        collection=None,
+    ):
+        self.client = None
+        max_rows = MAX_BATCH_ROWS
+        if collection is None:
+            import chromadb
+
+            self.client = chromadb.PersistentClient(path=str(path))
+            collection = self.client.get_or_create_collection(
+                name=collection_name, metadata=COLLECTION_METADATA
+            )
+            # 0.4.10 以降は client が 1 回の書き込みの上限を持っている
+            get_max = getattr(self.client, "get_max_batch_size", None)
+            if get_max is not None:
+                max_rows = int(get_max())
+        self.collection = collection
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.max_rows = max_rows
+
+        # None: 未確認 / True: ndarray をそのまま渡せる / False: tolist が必要
+        self._numpy_ok = None
+        self.rows = 0
+        self.batches = 0
+        self.busy_sec = 0.0
+
+    # =====================
+    # batching
+    # =====================
+    def _row_bytes(self, records, embeddings: np.ndarray) -> int:
+        """
+        1 行あたりの見積りバイト数（本文・metadata は先頭数件の平均）
+        """
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        vec = dim * (embeddings.itemsize if self._numpy_ok is not False else LIST_FLOAT_BYTES)
+        sample = records[:32]
+        text = sum(len(r["text"].encode("utf-8")) for r in sample) // max(1, len(sample))
+        meta = sum(len(repr(r["meta"])) for r in sample) // max(1, len(sample))
+        return max(1, vec + text + meta)
+
+    def batch_rows(self, records, embeddings: np.ndarray) -> int:
+        rows = self.memory_budget // self._row_bytes(records, embeddings)
+        return int(min(self.max_rows, max(1, rows)))
+
+    def _upsert(self, records, embeddings: np.ndarray) -> bool:
+        """
+        1 バッチを upsert する。
+        ndarray を受け付けない版だと分かったときは書かずに False を返す
+        （list 前提の行数で呼び出し側がやり直す）
+        """
+        kwargs = dict(
+            ids=[r["id"] for r in records],
+            documents=[r["text"] for r in records],
+            metadatas=[r["meta"] for r in records],
+        )
+        if self._numpy_ok is not False:
+            try:
+                self.collection.upsert(embeddings=embeddings, **kwargs)
+            except ValueError as e:
+                if self._numpy_ok or NOT_LIST_ERROR not in str(e):
+                    raise
+                # 検証で弾かれただけなので何も書かれていない
+                self._numpy_ok = False
+                return False
+            self._numpy_ok = True
+            return True
+        self.collection.upsert(embeddings=embeddings.tolist(), **kwargs)
+        return True
+
+    # =====================
+    # sink
+    # =====================
+    def write(self, records, embeddings):
+        if not len(records):
+            return 0
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        t0 = time.perf_counter()
+
+        i = 0
+        while i < len(records):
+            n = self.batch_rows(records[i:i + 32], embeddings)
+            # スライスは view なので embedding はコピーしない
+            if not self._upsert(records[i:i + n], embeddings[i:i + n]):
+                continue
+            self.batches += 1
+            i += n
+
+        self.busy_sec += time.perf_counter() - t0
+        self.rows += len(records)
+        return len(records)
+
+    def delete_paths(self, paths):
+        """
+        metadata の path が paths のいずれかに一致するチャンクを削除する
+        """
+        paths = list(paths)
+        for i in range(0, len(paths), DELETE_BATCH):
+            self.collection.delete(where={"path": {"$in": paths[i:i + DELETE_BATCH]}})
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "sec": round(self.busy_sec, 3),
+            "rows_per_sec": round(self.rows / self.busy_sec, 1) if self.busy_sec > 0 else 0.0,
+        }
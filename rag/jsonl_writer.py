@@ -0,0 +1,284 @@
+# rag/jsonl_writer.py
+# バックグラウンドスレッドで JSONL を書き出すロガー（バッチ書き込み + ローテーション）
+#
+# 1 レコードごとに open / write / close すると高負荷時に syscall が集中し、
+# ファイルも無制限に大きくなる。呼び出し側はキューに積むだけで、
+# 書き込み・ローテーション・gzip 圧縮は専用スレッドがまとめて行う。
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+# 1 回の書き込みにまとめる最大レコード数
+BATCH_SIZE = 512
+# キューに何も来なくてもこの間隔でバッファを書き出す [s]
+FLUSH_INTERVAL_SEC = 1.0
+# セグメントのローテーション条件（サイズ / 経過時間）
+MAX_BYTES = 64 * 1024 * 1024
+ROTATE_INTERVAL_SEC = 24 * 3600.0
+# 書き込みが追いつかない場合に保持する最大件数（超えた分は破棄して dropped に数える）
+QUEUE_MAX = 100_000
+
+_STOP = object()
+
+
+class JsonlWriter:
+    """
+    スレッドセーフ・ノンブロッキングな JSONL writer
+
+    write() はキューに積むだけで、ファイル I/O は専用スレッドが BATCH_SIZE 件ずつ行う。
+    MAX_BYTES / ROTATE_INTERVAL_SEC を超えたセグメントは
+    <stem>.<YYYYmmdd-HHMMSS><suffix>.gz にリネーム・圧縮する。
+    経過時間の起点は <name>.start に残すので、プロセスを再起動しても引き継がれる。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL_SEC,
+        max_bytes: Optional[int] = MAX_BYTES,
+        rotate_interval: Optional[float] = ROTATE_INTERVAL_SEC,
+        compress: bool = True,
+        queue_max: int = QUEUE_MAX,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compress = compress
+
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_max)
+        self._file = None
+        self._opened_at = 0.0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- producer side ----------
+    def write(self, record: dict):
+        if self._closed:
+            raise RuntimeError(f"writer for {self.path} is closed")
+        self._ensure_thread()
+
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        ここまでに write() したレコードがファイルに書かれるまで待つ
+        """
+        if self._thread is None or self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """
+        残りを書き出してスレッドを止める（atexit からも呼ばれる）
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                t = threading.Thread(
+                    target=self._run, name=f"jsonl-writer:{self.path.name}", daemon=True
+                )
+                t.start()
+                self._thread = t
+
+    # ---------- writer thread ----------
+    def _run(self):
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                lines = []
+                events = []
+                stop = False
+
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        events.append(item)
+                    else:
+                        lines.append(item)
+
+                    if stop or len(lines) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if lines:
+                    try:
+                        self._write_lines(lines)
+                    except OSError as e:
+                        # ログ書き込みの失敗で本体を止めない（件数だけ残す）
+                        self.errors += 1
+                        self.dropped += len(lines)
+                        sys.stderr.write(f"[jsonl_writer] {self.path}: {e}\n")
+                for e in events:
+                    e.set()
+                if stop:
+                    return
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+        self._opened_at = self._segment_start()
+
+    def _start_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".start")
+
+    def _segment_start(self) -> float:
+        """
+        セグメントの開始時刻。時間ローテーションが有効なときはサイドカー <name>.start に残し、
+        既存セグメントに追記する場合はそこから数える
+        （st_ctime は Linux では追記のたびに動くので、いつまでもローテーションされない）
+        """
+        if self.rotate_interval is None:
+            return time.time()
+
+        side = self._start_path()
+        if self._file.tell():
+            try:
+                return float(side.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # サイドカーのない旧セグメント: 作成時刻（無ければ最終更新時刻）から数える
+                st = self.path.stat()
+                started = getattr(st, "st_birthtime", st.st_mtime)
+        else:
+            started = time.time()
+
+        side.write_text(repr(started), encoding="utf-8")
+        return started
+
+    def _should_rotate(self) -> bool:
+        size = self._file.tell()
+        if not size:
+            return False
+        if self.max_bytes is not None and size >= self.max_bytes:
+            return True
+        if self.rotate_interval is not None:
+            return time.time() - self._opened_at >= self.rotate_interval
+        return False
+
+    def _write_lines(self, lines):
+        if self._file is None:
+            self._open()
+        # 開き直した既存セグメントが古ければ、追記する前にローテーションする
+        if self._should_rotate():
+            self._rotate()
+
+        self._file.write("".join(lines))
+        self._file.flush()
+        self.written += len(lines)
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        seg = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        n = 1
+        while seg.exists() or seg.with_name(seg.name + ".gz").exists():
+            seg = self.path.with_name(f"{self.path.stem}.{stamp}-{n}{self.path.suffix}")
+            n += 1
+
+        self.path.replace(seg)
+        self.rotations += 1
+        if self.compress:
+            _gzip(seg)
+
+        self._open()
+
+
+def _gzip(path: Path):
+    gz = path.with_name(path.name + ".gz")
+    with path.open("rb") as src, gzip.open(gz, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    path.unlink()
+
+# =====================
+# 共有インスタンス（パスごとに 1 つ）
+# =====================
+_writers: Dict[Path, JsonlWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path: Path, **options) -> JsonlWriter:
+    """
+    path ごとの共有 writer（初回のみ options を使う）
+    """
+    key = Path(path).resolve()
+    w = _writers.get(key)
+    if w is not None and not w._closed:
+        return w
+
+    with _writers_lock:
+        w = _writers.get(key)
+        if w is None or w._closed:
+            w = JsonlWriter(path, **options)
+            _writers[key] = w
+    return w
+
+
+def flush_all(timeout: Optional[float] = None):
+    for w in list(_writers.values()):
+        w.flush(timeout)
+
+
+@atexit.register
+def close_all():
+    for w in list(_writers.values()):
+        w.close()
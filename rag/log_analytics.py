@@ -0,0 +1,349 @@
+# rag/log_analytics.py
+# validation_errors ログのインクリメンタル集計
+#
+# auto_promote / auto_demote / analyze_validation_errors が毎回ログ全体を
+# json.loads + fromisoformat し直していたのをやめ、
+# 処理済みバイト位置（checkpoint）と (rule, target) ごとの 1 時間バケットを
+# 小さな SQLite に持つ。各実行では追記分だけを読み、
+# 直近 N 時間の集計はバケット数に比例するコストで返す。
+# 日付パーティション（rag.log_partitions）のディレクトリを渡した場合は、
+# manifest の ts 範囲が since / until に重なるパーティションだけを読む。
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .core import LOG_DIR
+from .log_partitions import select_partitions
+
+# これより古い時間バケットは削除する（最長の window / cooldown より長くとる）
+RETENTION_HOURS = 24 * 30
+# ローテーション検出用にハッシュをとるファイル先頭のバイト数
+HEAD_BYTES = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    path   TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    head   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hourly (
+    hour     INTEGER NOT NULL,
+    rule     TEXT NOT NULL,
+    target   TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    count    INTEGER NOT NULL,
+    first_ts TEXT NOT NULL,
+    last_ts  TEXT NOT NULL,
+    PRIMARY KEY (hour, rule, target, severity)
+);
+CREATE TABLE IF NOT EXISTS last_seen (
+    rule   TEXT NOT NULL,
+    target TEXT NOT NULL,
+    ts     TEXT NOT NULL,
+    PRIMARY KEY (rule, target)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    rule    TEXT NOT NULL,
+    message TEXT NOT NULL,
+    count   INTEGER NOT NULL,
+    PRIMARY KEY (rule, message)
+);
+"""
+
+
+@dataclass
+class WindowStats:
+    count: int
+    first_seen: datetime
+    last_seen: datetime
+
+
+def parse_ts(ts: str) -> datetime:
+    return datetime.fromisoformat(ts)
+
+
+def iter_errors(rec: dict) -> Iterator[dict]:
+    """
+    1 レコード → エラー項目
+    {"errors": [{rule, target, severity, message}, ...]} 形式と
+    core.log_validation_error の 1 件 1 行形式の両方を扱う
+    """
+    errors = rec.get("errors")
+    if errors is None:
+        yield rec
+        return
+    for e in errors:
+        if isinstance(e, dict):
+            if "rule" not in e and "rule" in rec:
+                e = {**e, "rule": rec["rule"]}
+            yield e
+
+
+def _open_bytes(path: Path):
+    return gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+
+
+class LogAnalytics:
+    """
+    la = LogAnalytics()
+    la.update(since=now - timedelta(hours=24))  # 追記分だけ取り込む
+    la.window(24, severity="warning")           # {(rule, target): WindowStats}
+
+    log_path は パーティションのディレクトリ（既定）または単一の JSONL ファイル
+    """
+
+    def __init__(self, log_path: Path = LOG_DIR, db_path: Optional[Path] = None):
+        self.log_path = Path(log_path)
+        self.partitioned = self.log_path.is_dir() or not self.log_path.suffix
+
+        # 集計 DB は既定でディレクトリ内の agg.sqlite3 / ファイルの隣の <stem>.agg.sqlite3
+        if db_path is None:
+            db_path = (
+                self.log_path / "agg.sqlite3"
+                if self.partitioned
+                else self.log_path.with_name(self.log_path.stem + ".agg.sqlite3")
+            )
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(str(self.db_path), isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # "YYYY-MM-DDTHH" → hour（同じ時間帯の ts は 1 回だけ parse する）
+        self._hour_cache: Dict[str, int] = {}
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- ingest ----------
+    def update(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> int:
+        """
+        前回の checkpoint 以降に追記されたレコードを取り込み、件数を返す。
+        パーティション構成では [since, until] に重なるパーティションだけを対象にする
+        （それより前の window を問い合わせる場合は since を合わせて渡すこと）。
+        """
+        c = self._conn
+
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            if self.partitioned:
+                paths = (
+                    select_partitions(self.log_path, since, until)
+                    if self.log_path.exists() else []
+                )
+            else:
+                paths = [self.log_path]
+
+            n = sum(self._update_file(p) for p in paths)
+            self._prune()
+            c.execute("COMMIT")
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+
+        return n
+
+    def _update_file(self, path: Path) -> int:
+        c = self._conn
+        key = str(path)
+
+        row = c.execute(
+            "SELECT offset, head FROM checkpoint WHERE path = ?", (key,)
+        ).fetchone()
+        offset, head = row if row else (0, "")
+
+        n = 0
+        if offset and self._head(path, offset) != head:
+            # ローテーション / 切り詰め: 旧セグメントの未処理分を先に読む
+            seg = self._find_segment(path, offset, head)
+            if seg is not None:
+                n += self._ingest(seg, offset)[0]
+            offset = 0
+
+        if path.exists():
+            count, offset = self._ingest(path, offset)
+            n += count
+        else:
+            offset = 0
+        head = self._head(path, offset) if offset else ""
+
+        c.execute(
+            "INSERT OR REPLACE INTO checkpoint (path, offset, head) VALUES (?, ?, ?)",
+            (key, offset, head),
+        )
+        return n
+
+    def _head(self, path: Path, offset: int) -> str:
+        """
+        処理済み部分の先頭（最大 HEAD_BYTES）のハッシュ。追記では変わらないので
+        一致しなければローテーションまたは切り詰めと判断できる
+        """
+        n = min(offset, HEAD_BYTES)
+        try:
+            with _open_bytes(path) as f:
+                data = f.read(n)
+        except FileNotFoundError:
+            return ""
+        return hashlib.sha1(data).hexdigest() if len(data) == n else ""
+
+    def _find_segment(self, path: Path, offset: int, head: str) -> Optional[Path]:
+        pattern = f"{path.stem}.*{path.suffix}*"
+        for seg in sorted(path.parent.glob(pattern), reverse=True):
+            if seg != path and self._head(seg, offset) == head:
+                return seg
+        return None
+
+    def _ingest(self, path: Path, offset: int) -> Tuple[int, int]:
+        """
+        path の offset 以降の完結した行を取り込む → (件数, 新しい offset)
+        """
+        hourly: Dict[Tuple[int, str, str, str], list] = {}
+        last: Dict[Tuple[str, str], str] = {}
+        messages: Dict[Tuple[str, str], int] = {}
+        n = 0
+
+        with _open_bytes(path) as f:
+            f.seek(offset)
+            for line in f:
+                # 書きかけの最終行は次回に回す
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+
+                try:
+                    rec = json.loads(line)
+                    ts = rec["ts"]
+                    hour = self._hour(ts)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                n += 1
+
+                for e in iter_errors(rec):
+                    rule = e.get("rule")
+                    if not rule:
+                        continue
+                    target = e.get("target") or ""
+                    severity = e.get("severity") or ""
+
+                    b = hourly.setdefault((hour, rule, target, severity), [0, ts, ts])
+                    b[0] += 1
+                    b[1] = min(b[1], ts)
+                    b[2] = max(b[2], ts)
+
+                    if ts > last.get((rule, target), ""):
+                        last[(rule, target)] = ts
+
+                    msg = (e.get("message") or "").strip()
+                    if msg:
+                        messages[(rule, msg)] = messages.get((rule, msg), 0) + 1
+
+        self._conn.executemany(
+            """
+            INSERT INTO hourly (hour, rule, target, severity, count, first_ts, last_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (hour, rule, target, severity) DO UPDATE SET
+                count = count + excluded.count,
+                first_ts = min(first_ts, excluded.first_ts),
+                last_ts = max(last_ts, excluded.last_ts)
+            """,
+            [(*k, *v) for k, v in hourly.items()],
+        )
+        self._conn.executemany(
+            """
+            INSERT INTO last_seen (rule, target, ts) VALUES (?, ?, ?)
+            ON CONFLICT (rule, target) DO UPDATE SET ts = max(ts, excluded.ts)
+            """,
+            [(*k, v) for k, v in last.items()],
+        )
+        self._conn.executemany(
+            """
+            INSERT INTO messages (rule, message, count) VALUES (?, ?, ?)
+            ON CONFLICT (rule, message) DO UPDATE SET count = count + excluded.count
+            """,
+            [(*k, v) for k, v in messages.items()],
+        )
+
+        return n, offset
+
+    def _hour(self, ts: str) -> int:
+        prefix = ts[:13]
+        hour = self._hour_cache.get(prefix)
+        if hour is None:
+            dt = parse_ts(ts).replace(minute=0, second=0, microsecond=0)
+            hour = _hour_of(dt)
+            self._hour_cache[prefix] = hour
+        return hour
+
+    def _prune(self):
+        oldest = _hour_of(datetime.utcnow()) - RETENTION_HOURS
+        self._conn.execute("DELETE FROM hourly WHERE hour < ?", (oldest,))
+
+    # ---------- queries ----------
+    def window(
+        self,
+        hours: float,
+        now: Optional[datetime] = None,
+        severity: Optional[str] = None,
+    ) -> Dict[Tuple[str, Optional[str]], WindowStats]:
+        """
+        直近 hours 時間の (rule, target) ごとの件数
+        （時間バケット単位なので、境界の 1 時間分は丸ごと含まれる）
+        """
+        now = now or datetime.utcnow()
+        start = _hour_of(now - timedelta(hours=hours))
+
+        sql = """
+            SELECT rule, target, SUM(count), MIN(first_ts), MAX(last_ts)
+            FROM hourly WHERE hour >= ?
+        """
+        params: list = [start]
+        if severity is not None:
+            sql += " AND severity = ?"
+            params.append(severity)
+        sql += " GROUP BY rule, target"
+
+        return {
+            (rule, target or None): WindowStats(count, parse_ts(first), parse_ts(last))
+            for rule, target, count, first, last in self._conn.execute(sql, params)
+        }
+
+    def last_seen(self) -> Dict[str, Dict[Optional[str], datetime]]:
+        """
+        rule -> target -> last_seen(datetime)
+        """
+        out: Dict[str, Dict[Optional[str], datetime]] = {}
+        for rule, target, ts in self._conn.execute("SELECT rule, target, ts FROM last_seen"):
+            out.setdefault(rule, {})[target or None] = parse_ts(ts)
+        return out
+
+    def message_counts(self) -> List[Tuple[str, str, int]]:
+        """
+        [(rule, message, count)]（全期間）
+        """
+        return list(self._conn.execute(
+            "SELECT rule, message, count FROM messages ORDER BY count DESC"
+        ))
+
+
+def _hour_of(dt: datetime) -> int:
+    # ログの ts は naive UTC（datetime.utcnow）
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() // 3600)
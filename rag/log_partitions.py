@@ -0,0 +1,197 @@
+# rag/log_partitions.py
+# 日付パーティションに分けた JSONL ログ（logs/validation_errors/YYYY-MM-DD.jsonl）
+#
+# レコードは ts の日付（UTC）のファイルに書く。manifest.json に各パーティションの
+# min / max ts を持ち、window_hours / cooldown_hours の範囲に重なるファイルだけを開く。
+# manifest は読む側が更新する（変化したファイルの追記分だけを読み直す）ので、
+# 書き込み側のプロセス間で調整は要らない。
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .jsonl_writer import JsonlWriter, get_writer
+
+MANIFEST_NAME = "manifest.json"
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def partition_name(ts: str) -> str:
+    date = ts[:10]
+    if not _DATE_RE.fullmatch(date):
+        date = datetime.utcnow().strftime("%Y-%m-%d")
+    return f"{date}.jsonl"
+
+
+def partition_path(log_dir: Path, ts: str) -> Path:
+    return Path(log_dir) / partition_name(ts)
+
+# =====================
+# writer
+# =====================
+class PartitionedWriter:
+    """
+    ts の日付ごとのファイルに JsonlWriter で書く。
+    直近 OPEN_PARTITIONS 日分の writer は開いたままにして（日付の前後するレコードで
+    開き直さない）、それより古い writer は閉じる（スレッドを溜めない）。
+    """
+
+    OPEN_PARTITIONS = 2
+
+    def __init__(self, log_dir: Path):
+        self.log_dir = Path(log_dir)
+        # path → writer（最後に書いた順）
+        self._writers: "OrderedDict[Path, JsonlWriter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        path = partition_path(self.log_dir, record.get("ts", ""))
+
+        with self._lock:
+            writer = self._writers.get(path)
+            if writer is None:
+                # 日付パーティションなのでサイズ / 時間ローテーションは不要
+                writer = get_writer(path, max_bytes=None, rotate_interval=None)
+                self._writers[path] = writer
+                # 閉じるのも lock の中（get_writer が閉じかけの writer を返さないように）
+                while len(self._writers) > self.OPEN_PARTITIONS:
+                    self._writers.popitem(last=False)[1].close()
+            else:
+                self._writers.move_to_end(path)
+            # write はキューに積むだけなので lock の中で呼ぶ（他スレッドに閉じられない）
+            writer.write(record)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            writers = list(self._writers.values())
+        return all(w.flush(timeout) for w in writers)
+
+
+_partitioned: Dict[Path, PartitionedWriter] = {}
+_partitioned_lock = threading.Lock()
+
+
+def get_partitioned_writer(log_dir: Path) -> PartitionedWriter:
+    key = Path(log_dir).resolve()
+    w = _partitioned.get(key)
+    if w is None:
+        with _partitioned_lock:
+            w = _partitioned.get(key)
+            if w is None:
+                w = PartitionedWriter(log_dir)
+                _partitioned[key] = w
+    return w
+
+# =====================
+# manifest
+# =====================
+class PartitionManifest:
+    """
+    {"partitions": {"2026-10-18.jsonl": {
+        "offset": 走査済みバイト数, "mtime_ns": ..., "count": 件数,
+        "min_ts": "...", "max_ts": "..."}}}
+    """
+
+    def __init__(self, log_dir: Path):
+        self.log_dir = Path(log_dir)
+        self.path = self.log_dir / MANIFEST_NAME
+        self.partitions: Dict[str, dict] = {}
+
+        if self.path.exists():
+            try:
+                with self.path.open(encoding="utf-8") as f:
+                    self.partitions = json.load(f).get("partitions", {})
+            except (OSError, ValueError):
+                self.partitions = {}
+
+    def refresh(self) -> bool:
+        """
+        変化したパーティションだけ読み直す（追記なら追記分のみ）。更新があれば保存して True
+        """
+        changed = False
+        names = set()
+
+        for f in sorted(self.log_dir.glob("*.jsonl")):
+            names.add(f.name)
+            st = f.stat()
+            entry = self.partitions.get(f.name)
+
+            if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["offset"] <= st.st_size:
+                continue
+
+            if entry is None or st.st_size < entry["offset"]:
+                entry = {"offset": 0, "count": 0, "min_ts": None, "max_ts": None}
+
+            self.partitions[f.name] = self._scan(f, entry, st.st_mtime_ns)
+            changed = True
+
+        for name in set(self.partitions) - names:
+            del self.partitions[name]
+            changed = True
+
+        if changed:
+            self.save()
+        return changed
+
+    def _scan(self, path: Path, entry: dict, mtime_ns: int) -> dict:
+        offset = entry["offset"]
+        count = entry["count"]
+        lo, hi = entry["min_ts"], entry["max_ts"]
+
+        with path.open("rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    ts = json.loads(line)["ts"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                count += 1
+                lo = ts if lo is None or ts < lo else lo
+                hi = ts if hi is None or ts > hi else hi
+
+        return {"offset": offset, "mtime_ns": mtime_ns, "count": count, "min_ts": lo, "max_ts": hi}
+
+    def save(self):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"partitions": self.partitions}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def select(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[Path]:
+        """
+        [since, until] と ts 範囲が重なるパーティション（日付順）
+        """
+        lo = since.isoformat() if since else None
+        hi = until.isoformat() if until else None
+
+        out = []
+        for name in sorted(self.partitions):
+            e = self.partitions[name]
+            if not e["count"]:
+                continue
+            if lo is not None and e["max_ts"] < lo:
+                continue
+            if hi is not None and e["min_ts"] > hi:
+                continue
+            out.append(self.log_dir / name)
+        return out
+
+
+def select_partitions(
+    log_dir: Path, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> List[Path]:
+    m = PartitionManifest(log_dir)
+    m.refresh()
+    return m.select(since, until)
@@ -0,0 +1,150 @@
+# rag/meta_store.py
+# ベクトルのメタデータ（source / chunk_index / text）を SQLite で保持する
+#
+# - 行 id = FAISS の id（0 始まりの連番）
+# - search は返す k 行だけを読む
+# - 追加は INSERT のみ（ファイル全体の書き直しをしない）
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+# 旧形式（JSON 配列）からの移行時に使う
+BASE_KEYS = ("source", "chunk_index", "text")
+
+
+class MetaStore:
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        self.path = Path(path)
+        self.legacy_json = Path(legacy_json) if legacy_json else None
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT,
+                    chunk_index INTEGER,
+                    text TEXT NOT NULL,
+                    extra TEXT
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+            self._migrate_legacy()
+        return self._conn
+
+    def _migrate_legacy(self):
+        """
+        旧 meta.json が残っていて DB が空なら取り込む（1 回のみ）
+        """
+        if self.legacy_json is None or not self.legacy_json.exists():
+            return
+        if len(self):
+            return
+
+        records = json.loads(self.legacy_json.read_text(encoding="utf-8"))
+        self.insert(0, records)
+        self.commit()
+
+    # =====================
+    # write
+    # =====================
+    def insert(self, start_id: int, records: Iterable[dict]):
+        """
+        start_id から連番で records を追加する（commit は呼び出し側）
+        """
+        rows = []
+        for i, rec in enumerate(records):
+            extra = {k: v for k, v in rec.items() if k not in BASE_KEYS}
+            rows.append((
+                start_id + i,
+                rec.get("source"),
+                rec.get("chunk_index"),
+                rec["text"],
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+            ))
+
+        with self._lock:
+            self._connect().executemany(
+                "INSERT OR REPLACE INTO chunks "
+                "(id, source, chunk_index, text, extra) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def truncate(self, n: int):
+        """
+        id >= n の行を削除する（index と件数を揃える）
+        """
+        with self._lock:
+            self._connect().execute("DELETE FROM chunks WHERE id >= ?", (n,))
+            self.commit()
+
+    def commit(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+
+    # =====================
+    # read
+    # =====================
+    def get_many(self, ids: Sequence[int]) -> Dict[int, dict]:
+        ids = [int(i) for i in ids if i >= 0]
+        if not ids:
+            return {}
+
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, source, chunk_index, text, extra FROM chunks "
+                "WHERE id IN (%s)" % ",".join("?" * len(ids)),
+                ids,
+            ).fetchall()
+
+        out: Dict[int, dict] = {}
+        for id_, source, chunk_index, text, extra in rows:
+            rec = {"source": source, "chunk_index": chunk_index, "text": text}
+            if extra:
+                rec.update(json.loads(extra))
+            out[id_] = rec
+        return out
+
+    def iter_texts(self, batch_size: int = 1000) -> Iterator[Tuple[int, str]]:
+        """
+        (id, text) を id 順に batch_size 行ずつ読み出す
+        """
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT id, text FROM chunks WHERE id > ? ORDER BY id LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connect().execute(
+                "SELECT COUNT(*) FROM chunks"
+            ).fetchone()
+        return count
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
@@ -1,9 +1,27 @@
 # rag/qa.py
+from typing import Optional
+
+from rag.core import rag_confidence_threshold
+from rag.query_cache import answer_cache, prompt_key
+
+# 類似度が閾値未満のとき LLM を呼ばずに返す回答
+LOW_CONFIDENCE_ANSWER = "資料に記載がないため、仕様不明です。"
+
+
+def cite(c: dict) -> str:
+    """
+    source / chunk N（PDF 由来でページ番号があれば / p.N も付ける）
+    """
+    label = f"{c['source']} / chunk {c['chunk_index']}"
+    meta = c.get("meta") or {}
+    page, page_end = meta.get("page"), meta.get("page_end")
+    if page:
+        label += f" / p.{page}" if not page_end or page_end == page else f" / p.{page}-{page_end}"
+    return label
+
+
 def build_prompt(question: str, contexts: list[dict]) -> str:
-    context_text = "\n\n".join(
-        f"[{c['source']} / chunk {c['chunk_index']}]\n{c['text']}"
-        for c in contexts
-    )
+    context_text = "\n\n".join(f"[{cite(c)}]\n{c['text']}" for c in contexts)
 
     return f"""
 あなたは社内技術ナレッジAIです。
@@ -18,6 +36,50 @@ def build_prompt(question: str, contexts: list[dict]) -> str:
 ### 回答（根拠が分かるように簡潔に）
 """
 
-def answer_with_llm(question: str, contexts: list[dict], llm_call):
+def is_confident(contexts: list[dict], min_score: Optional[float] = None) -> bool:
+    """
+    検索結果の最大 score が閾値以上か
+    score を持たない contexts（旧形式）は判定できないため True
+    """
+    scores = [c["score"] for c in contexts if c.get("score") is not None]
+    if not scores:
+        return True
+
+    if min_score is None:
+        min_score = rag_confidence_threshold()
+    return max(scores) >= min_score
+
+def answer_with_llm(
+    question: str,
+    contexts: list[dict],
+    llm_call,
+    min_score: Optional[float] = None,
+    use_cache: bool = True,
+    llm_name: Optional[str] = None,
+):
+    """
+    llm_name は回答キャッシュの key に使う LLM の名前。
+    省略時は llm_call オブジェクト自体（id）で区別する
+    （lambda / functools.partial は __qualname__ だけでは衝突する）。
+    その場合はキャッシュが llm_call への参照を持つので、エントリがある間 id は再利用されない
+    """
+    # 根拠が弱い質問は最も高コストな LLM 呼び出しをスキップする
+    if not is_confident(contexts, min_score):
+        return LOW_CONFIDENCE_ANSWER
+
     prompt = build_prompt(question, contexts)
-    return llm_call(prompt)
+    if not use_cache:
+        return llm_call(prompt)
+
+    # 同じプロンプト（= 同じ質問 + 同じ根拠）なら前回の回答を再利用
+    owner = None
+    if llm_name is None:
+        owner = llm_call
+        llm_name = f"{type(llm_call).__qualname__}@{id(llm_call):x}"
+    key = prompt_key(prompt, llm_name)
+
+    entry = answer_cache.get(key)
+    if entry is None or entry[0] is not owner:
+        entry = (owner, llm_call(prompt))
+        answer_cache.set(key, entry)
+    return entry[1]
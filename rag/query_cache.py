@@ -0,0 +1,117 @@
+# rag/query_cache.py
+# 検索結果 / LLM 回答のキャッシュ（TTL + サイズ上限付き LRU）
+#
+# Streamlit は操作や 1 秒ごとの autorefresh のたびにスクリプト全体を再実行するため、
+# 入力欄に残った同じ質問で retrieve_chunks / answer_with_llm が繰り返し呼ばれる。
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+RETRIEVAL_CACHE_SIZE = 256
+RETRIEVAL_TTL_SEC = 300.0
+
+ANSWER_CACHE_SIZE = 256
+ANSWER_TTL_SEC = 3600.0
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    スレッドセーフな LRU キャッシュ（エントリごとに有効期限あり）
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < now:
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+
+def normalize_query(query: str) -> str:
+    """
+    表記揺れ（Unicode 正規化・前後/連続空白）だけをそろえる
+    """
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+def prompt_key(prompt: str, llm_name: Optional[str] = None) -> str:
+    h = hashlib.sha256()
+    h.update((llm_name or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+# =====================
+# 共有インスタンス
+# =====================
+retrieval_cache = TTLCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_TTL_SEC)
+answer_cache = TTLCache(ANSWER_CACHE_SIZE, ANSWER_TTL_SEC)
+
+_index_versions: dict = {}
+_versions_lock = threading.Lock()
+
+
+def observe_index_version(backend: str, version: Hashable):
+    """
+    backend の index が変わっていたら検索キャッシュを破棄する
+    （key にも version を含むので古い結果が返ることはない。ここではメモリを解放する）
+    """
+    with _versions_lock:
+        prev = _index_versions.get(backend, _MISSING)
+        _index_versions[backend] = version
+    if prev is not _MISSING and prev != version:
+        retrieval_cache.clear()
+
+
+def cache_stats() -> dict:
+    return {
+        "retrieval": retrieval_cache.stats(),
+        "answer": answer_cache.stats(),
+    }
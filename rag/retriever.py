@@ -1,20 +1,356 @@
 # rag/retriever.py
-from rag.vector_store import get_collection
+# 検索バックエンドの共通インターフェース
+#
+# backend は RAG_RETRIEVER（hybrid / faiss / chroma / numpy）で切り替える。
+# どの backend も rag.embedding.encode で同じモデル・同じキャッシュを使う。
+from __future__ import annotations
 
-def retrieve_chunks(query: str, top_k: int = 5):
-    collection = get_collection()
+import copy
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Protocol, Sequence
 
-    result = collection.query(
-        query_texts=[query],
-        n_results=top_k,
+import numpy as np
+
+from rag.chroma_config import CHROMA_COLLECTION, CHROMA_PATH, COLLECTION_METADATA, chunk_id
+from rag.embedding import EMBED_DIM, encode
+from rag.query_cache import normalize_query, observe_index_version, retrieval_cache
+
+RETRIEVER_BACKEND = os.environ.get("RAG_RETRIEVER", "hybrid")
+
+
+
+@dataclass
+class SearchResult:
+    text: str
+    source: Optional[str]
+    chunk_index: Optional[int]
+    score: Optional[float]  # cosine 類似度（-1.0〜1.0、大きいほど類似）
+    meta: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class Retriever(Protocol):
+    name: str
+
+    @property
+    def version(self):
+        """
+        index が変わるたびに変化する値（検索キャッシュの key に使う）
+        """
+        ...
+
+    def add(
+        self,
+        items: Sequence[dict],
+        embeddings: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        items = [{"text": ..., "source": ..., "chunk_index": ...}, ...]
+        embeddings を渡さなければ内部で encode する
+        """
+        ...
+
+    def search(self, query: str, k: int = 5) -> List[SearchResult]:
+        ...
+
+    def search_by_vector(self, vec: np.ndarray, k: int = 5) -> List[SearchResult]:
+        ...
+
+    def flush(self) -> None:
+        ...
+
+
+def _to_result(rec: dict, score: Optional[float]) -> SearchResult:
+    meta = {
+        k: v for k, v in rec.items()
+        if k not in ("text", "source", "chunk_index", "score")
+    }
+    return SearchResult(
+        text=rec.get("text", ""),
+        source=rec.get("source"),
+        chunk_index=rec.get("chunk_index"),
+        score=score,
+        meta=meta,
     )
 
-    chunks = []
-    for text, meta in zip(result["documents"][0], result["metadatas"][0]):
-        chunks.append({
-            "text": text,
-            "source": meta.get("source"),
-            "chunk_index": meta.get("chunk_index"),
-        })
 
-    return chunks
+class _EncodingRetriever:
+    """
+    search(query) を encode → search_by_vector に委譲する共通実装
+    """
+
+    def search(self, query: str, k: int = 5) -> List[SearchResult]:
+        return self.search_by_vector(encode([query])[0], k)
+
+    def _embed(self, items: Sequence[dict], embeddings) -> np.ndarray:
+        if embeddings is None:
+            embeddings = encode([it["text"] for it in items])
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+# =====================
+# FAISS（rag.vector_store）
+# =====================
+class FaissRetriever(_EncodingRetriever):
+    name = "faiss"
+
+    def __init__(self, store=None):
+        from rag.vector_store import get_store
+
+        self.store = store if store is not None else get_store()
+
+    @property
+    def version(self):
+        return self.store.version
+
+    def add(self, items, embeddings=None) -> int:
+        items = list(items)
+        if not items:
+            return 0
+        return self.store.add_embeddings(items, self._embed(items, embeddings))
+
+    def search_by_vector(self, vec, k: int = 5) -> List[SearchResult]:
+        return [
+            _to_result(rec, rec["score"])
+            for rec in self.store.search_by_vector(vec, k)
+        ]
+
+    def flush(self):
+        self.store.flush()
+
+
+class HybridRetriever(FaissRetriever):
+    """
+    FAISS のベクトル検索 + BM25 を RRF で統合（順位は meta["rrf_score"]）
+    """
+    name = "hybrid"
+
+    def search(self, query: str, k: int = 5) -> List[SearchResult]:
+        return [
+            _to_result(rec, rec["score"])
+            for rec in self.store.hybrid_search(query, k)
+        ]
+
+
+# =====================
+# Chroma
+# =====================
+# hnsw:space ごとの 距離 → cosine 類似度（ベクトルは単位長とみなす。
+# all-MiniLM-L6-v2 の出力は正規化済みで、ChromaRetriever も単位ベクトルで書く）
+#   cosine : d = 1 - cos
+#   ip     : d = 1 - <a, b> = 1 - cos
+#   l2     : d = |a - b|^2 = 2 - 2cos（Chroma の l2 は二乗距離）
+_SPACE_TO_SIMILARITY = {
+    "cosine": lambda d: 1.0 - d,
+    "ip": lambda d: 1.0 - d,
+    "l2": lambda d: 1.0 - d / 2.0,
+}
+
+
+def chroma_space(collection) -> str:
+    """
+    collection の距離空間（metadata が無ければ Chroma 既定の l2）
+    """
+    space = ((getattr(collection, "metadata", None) or {}).get("hnsw:space") or "l2").lower()
+    if space not in _SPACE_TO_SIMILARITY:
+        raise ValueError(f"unsupported hnsw:space {space!r} for collection {collection.name!r}")
+    return space
+
+
+def distance_to_similarity(space: str, dist) -> float:
+    return float(_SPACE_TO_SIMILARITY[space](float(dist)))
+
+
+def _unit(vecs: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.where(norm > 0, norm, 1.0)
+
+
+class ChromaRetriever(_EncodingRetriever):
+    name = "chroma"
+
+    def __init__(
+        self,
+        path: str = CHROMA_PATH,
+        collection_name: str = CHROMA_COLLECTION,
+        collection=None,
+    ):
+        self.client = None
+        if collection is None:
+            import chromadb
+
+            self.client = chromadb.PersistentClient(path=str(path))
+            collection = self.client.get_or_create_collection(
+                name=collection_name,
+                metadata=COLLECTION_METADATA,
+            )
+        self.collection = collection
+        self.space = chroma_space(collection)
+        # 他プロセスからの書き込みは検知できないため TTL で補う
+        self._version = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def add(self, items, embeddings=None) -> int:
+        items = list(items)
+        if not items:
+            return 0
+
+        # l2 の collection でも距離から cosine 類似度に戻せるよう単位ベクトルで入れる
+        vecs = _unit(self._embed(items, embeddings))
+        # id は rag.ingest と同じ（path が無ければ source）
+        self.collection.upsert(
+            ids=[chunk_id(it.get("path") or it["source"], it["chunk_index"]) for it in items],
+            documents=[it["text"] for it in items],
+            embeddings=vecs,
+            metadatas=[
+                {k: v for k, v in it.items() if k != "text" and v is not None}
+                for it in items
+            ],
+        )
+        # 旧 id（{source}-{chunk_index}）で入っている同じチャンクを消す
+        self.collection.delete(
+            ids=[f"{it['source']}-{it['chunk_index']}" for it in items]
+        )
+        self._version += 1
+        return len(items)
+
+    def search_by_vector(self, vec, k: int = 5) -> List[SearchResult]:
+        res = self.collection.query(
+            query_embeddings=[_unit(np.asarray(vec, dtype=np.float32))],
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+
+        out = []
+        for text, meta, dist in zip(
+            res["documents"][0], res["metadatas"][0], res["distances"][0]
+        ):
+            out.append(_to_result(dict(meta or {}, text=text), distance_to_similarity(self.space, dist)))
+        return out
+
+    def flush(self):
+        # PersistentClient は書き込み時に永続化済み
+        pass
+
+
+# =====================
+# NumPy（インメモリ総当たり）
+# =====================
+class NumpyRetriever(_EncodingRetriever):
+    name = "numpy"
+
+    def __init__(self, dim: int = EMBED_DIM, capacity: int = 1024):
+        self._vecs = np.zeros((capacity, dim), dtype=np.float32)
+        self._items: List[dict] = []
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def add(self, items, embeddings=None) -> int:
+        items = list(items)
+        if not items:
+            return 0
+
+        vecs = self._embed(items, embeddings)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.maximum(norms, 1e-12)
+
+        with self._lock:
+            n = len(self._items)
+            need = n + len(items)
+            if need > len(self._vecs):
+                grown = np.zeros(
+                    (max(need, 2 * len(self._vecs)), self._vecs.shape[1]),
+                    dtype=np.float32,
+                )
+                grown[:n] = self._vecs[:n]
+                self._vecs = grown
+
+            self._vecs[n:need] = vecs
+            self._items.extend(items)
+            self._version += 1
+
+        return len(items)
+
+    def search_by_vector(self, vec, k: int = 5) -> List[SearchResult]:
+        q = np.asarray(vec, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+        with self._lock:
+            n = len(self._items)
+            if n == 0:
+                return []
+
+            sims = self._vecs[:n] @ q
+            k = min(k, n)
+            top = np.argpartition(-sims, k - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+
+            return [_to_result(self._items[i], float(sims[i])) for i in top]
+
+    def flush(self):
+        pass
+
+
+# =====================
+# factory
+# =====================
+BACKENDS = {
+    "hybrid": HybridRetriever,
+    "faiss": FaissRetriever,
+    "chroma": ChromaRetriever,
+    "numpy": NumpyRetriever,
+}
+
+_retrievers: Dict[str, Retriever] = {}
+_retrievers_lock = threading.Lock()
+
+
+def get_retriever(backend: Optional[str] = None) -> Retriever:
+    backend = backend or RETRIEVER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown retriever backend: {backend}")
+
+    with _retrievers_lock:
+        if backend not in _retrievers:
+            _retrievers[backend] = BACKENDS[backend]()
+        return _retrievers[backend]
+
+
+def retrieve_chunks(
+    query: str,
+    top_k: int = 5,
+    backend: Optional[str] = None,
+    use_cache: bool = True,
+):
+    """
+    [{"text", "source", "chunk_index", "score", "meta"}, ...] を返す
+    同じ質問・k・index バージョンなら検索キャッシュから返す
+    """
+    backend = backend or RETRIEVER_BACKEND
+    retriever = get_retriever(backend)
+
+    if not use_cache:
+        return [r.to_dict() for r in retriever.search(query, top_k)]
+
+    version = retriever.version
+    observe_index_version(backend, version)
+
+    key = (backend, normalize_query(query), top_k, version)
+    results = retrieval_cache.get(key)
+    if results is None:
+        results = [r.to_dict() for r in retriever.search(query, top_k)]
+        retrieval_cache.set(key, results)
+
+    # 呼び出し側での変更（meta の中身も）がキャッシュに及ばないようコピーを返す
+    return copy.deepcopy(results)
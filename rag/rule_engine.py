@@ -0,0 +1,211 @@
+# rag/rule_engine.py
+# rules.yaml の must_include / forbid をデータ駆動で評価する
+#
+# 全ルールのリテラルを 1 本の正規表現にまとめ、テキストは 1 回だけ走査する
+# （ルール数が増えても走査回数は増えない）。
+# rules.yaml が更新されたら次の呼び出しで自動的に再コンパイルする。
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import yaml
+
+from .core import RULES_PATH, ValidationResult, split_meta
+
+
+@dataclass
+class RuleHits:
+    rule: str
+    found: List[str] = field(default_factory=list)      # must_include のうち含まれていたもの
+    missing: List[str] = field(default_factory=list)    # must_include のうち欠落
+    forbidden: List[str] = field(default_factory=list)  # forbid のうち含まれていたもの
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.forbidden
+
+
+class RuleMatcher:
+    """
+    must_include / forbid の全リテラルを 1 つの automaton（combined regex）にコンパイルする
+    """
+
+    def __init__(self, rules: dict):
+        self.rules = rules
+        self._specs: Dict[str, Tuple[List[str], List[str]]] = {}
+
+        literals: Set[str] = set()
+        for name, d in rules.items():
+            if not isinstance(d, dict):
+                continue
+            must = [str(x) for x in d.get("must_include") or []]
+            forbid = [str(x) for x in d.get("forbid") or []]
+            if must or forbid:
+                self._specs[name] = (must, forbid)
+                literals.update(must)
+                literals.update(forbid)
+
+        # 同じ位置から始まるリテラルは長い方が優先してマッチするので、
+        # 各リテラルに「それ自身に含まれるリテラル」を対応づけておき、
+        # マッチしたらまとめて found に加える（ご確認のほど → ご確認 も found）
+        ordered = sorted(literals, key=len, reverse=True)
+        self._implied: Dict[str, FrozenSet[str]] = {
+            lit: frozenset(o for o in ordered if o in lit) for lit in ordered
+        }
+        # lookahead で全位置を調べるので、重なり合うマッチも取りこぼさない
+        # （先頭文字のクラスで先に絞ると、どのリテラルも始まらない位置を速く飛ばせる）
+        first = "".join(sorted({re.escape(x[0]) for x in ordered if x}))
+        prefix = f"(?=[{first}])" if first and all(ordered) else ""
+        self._pattern = (
+            re.compile(prefix + "(?=(" + "|".join(map(re.escape, ordered)) + "))")
+            if ordered else None
+        )
+
+    @property
+    def rule_keys(self) -> List[str]:
+        return list(self._specs)
+
+    @property
+    def max_literal_len(self) -> int:
+        return max((len(x) for x in self._implied), default=0)
+
+    def forbid_only(self, rule_keys: Optional[Iterable[str]] = None) -> "RuleMatcher":
+        """
+        forbid だけを持つ matcher（ストリーミング検証の早期打ち切り用）
+        """
+        keys = self._specs if rule_keys is None else rule_keys
+        return RuleMatcher({
+            name: {**self.rules[name], "must_include": []}
+            for name in keys
+            if name in self._specs and self._specs[name][1]
+        })
+
+    def scan(self, text: str) -> Set[str]:
+        """
+        text に含まれるリテラルの集合（1 パス）
+        """
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+
+        for m in self._pattern.finditer(text):
+            lit = m.group(1)
+            if lit not in found:
+                found |= self._implied[lit]
+        return found
+
+    def match(
+        self, text: str, rule_keys: Optional[Iterable[str]] = None
+    ) -> Dict[str, RuleHits]:
+        return self.hits(self.scan(text), rule_keys)
+
+    def hits(
+        self, found: Set[str], rule_keys: Optional[Iterable[str]] = None
+    ) -> Dict[str, RuleHits]:
+        """
+        scan() 済みのリテラル集合からルールごとの結果を作る
+        """
+        keys = self._specs if rule_keys is None else rule_keys
+
+        hits: Dict[str, RuleHits] = {}
+        for name in keys:
+            spec = self._specs.get(name)
+            if spec is None:
+                continue
+            must, forbid = spec
+            hits[name] = RuleHits(
+                rule=name,
+                found=[x for x in must if x in found],
+                missing=[x for x in must if x not in found],
+                forbidden=[x for x in forbid if x in found],
+            )
+        return hits
+
+    def _severity(self, rule: str, target: str) -> str:
+        d = self.rules.get(rule) or {}
+        return (d.get("target_severity") or {}).get(target) or d.get("severity", "warning")
+
+    def validate(
+        self, text: str, rule_keys: Optional[Iterable[str]] = None
+    ) -> List[ValidationResult]:
+        return self.results(self.match(text, rule_keys))
+
+    def results(self, hits: Dict[str, RuleHits]) -> List[ValidationResult]:
+        results: List[ValidationResult] = []
+
+        for name, h in hits.items():
+            for target in h.missing:
+                results.append(
+                    ValidationResult(
+                        ok=False,
+                        rule=name,
+                        severity=self._severity(name, target),
+                        message=f"{target} がありません",
+                        fix_hint=f"{target} を追加してください",
+                        target=target,
+                    )
+                )
+            for target in h.forbidden:
+                results.append(
+                    ValidationResult(
+                        ok=False,
+                        rule=name,
+                        severity=self._severity(name, target),
+                        message=f"{target} は使用禁止です",
+                        fix_hint=f"{target} を削除または言い換えてください",
+                        target=target,
+                    )
+                )
+
+        return results
+
+# =====================
+# hot-reload
+# =====================
+_matchers: Dict[Path, Tuple[Tuple[int, int], RuleMatcher]] = {}
+_matchers_lock = threading.Lock()
+
+
+def _load(path: Path) -> dict:
+    with path.open(encoding="utf-8-sig") as f:
+        return split_meta(yaml.safe_load(f))[0]
+
+
+def get_matcher(path: Optional[Path] = None) -> RuleMatcher:
+    """
+    rules.yaml の (mtime, size) が変わっていれば再コンパイルした matcher を返す
+    """
+    path = Path(path or RULES_PATH)
+    try:
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = (0, 0)
+
+    cached = _matchers.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with _matchers_lock:
+        cached = _matchers.get(path)
+        if cached is None or cached[0] != stamp:
+            rules = _load(path) if stamp != (0, 0) else {}
+            cached = (stamp, RuleMatcher(rules))
+            _matchers[path] = cached
+    return cached[1]
+
+
+def match_rules(
+    text: str, rule_keys: Optional[Iterable[str]] = None, path: Optional[Path] = None
+) -> Dict[str, RuleHits]:
+    return get_matcher(path).match(text, rule_keys)
+
+
+def validate_rules(
+    text: str, rule_keys: Optional[Iterable[str]] = None, path: Optional[Path] = None
+) -> List[ValidationResult]:
+    return get_matcher(path).validate(text, rule_keys)
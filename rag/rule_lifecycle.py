@@ -0,0 +1,307 @@
+# rag/rule_lifecycle.py
+# ルールの自動昇格 / 降格と rules.yaml の安全な更新
+#
+# - 昇格・降格の判定ロジック（scripts/auto_promote_rules.py / auto_demote_rules.py と共通）
+# - rules.yaml はロックファイル（OS のファイルロック）で排他し、一時ファイル + rename でアトミックに書き換える
+#   （書き込みのたびに _meta.version を 1 増やす）
+# - 読む側（rag.core.get_rules / rag.rule_engine）はファイルの変化を検知して再読み込みする
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from .core import META_KEY, RULES_PATH
+from .log_analytics import LogAnalytics, WindowStats
+
+# ロック取得を諦めるまでの時間 [s]
+LOCK_TIMEOUT_SEC = 10.0
+
+
+def load_rules(path: Path = RULES_PATH) -> dict:
+    """
+    書き換え用に _meta を含めたまま読む（ルールとして使う側は core.split_meta を通す）
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8-sig") as f:
+        return yaml.safe_load(f) or {}
+
+
+def rules_version(rules: dict) -> int:
+    return int((rules.get(META_KEY) or {}).get("version", 0))
+
+
+def iter_rule_defs(rules: dict) -> Iterator[Tuple[str, dict]]:
+    """
+    ルール定義だけを返す（_meta などのメタ情報は除く）
+    """
+    for name, d in rules.items():
+        if not name.startswith("_") and isinstance(d, dict):
+            yield name, d
+
+# =====================
+# atomic write
+# =====================
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _try_lock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """
+    <rules.yaml>.lock に OS のファイルロック（fcntl / msvcrt）を掛けてプロセス間で排他する。
+    ロックはプロセスが落ちれば外れるので、放置されたロックを判定して消す必要はない。
+
+    POSIX では解放時にロックファイルを消す。消される直前のファイルでロックを取った側は、
+    パスが同じファイルを指しているか確かめて取り直す（消えたファイルのロックは無効）。
+    """
+    lock = path.with_name(path.name + ".lock")
+    deadline = time.monotonic() + LOCK_TIMEOUT_SEC
+
+    while True:
+        fd = os.open(str(lock), os.O_CREAT | os.O_RDWR)
+        try:
+            _try_lock(fd)
+        except OSError:
+            os.close(fd)
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"could not lock {path}")
+            time.sleep(0.05)
+            continue
+
+        if os.name == "nt":
+            break
+        try:
+            same = os.fstat(fd).st_ino == os.stat(lock).st_ino
+        except FileNotFoundError:
+            same = False
+        if same:
+            break
+        _unlock(fd)
+        os.close(fd)
+
+    try:
+        yield
+    finally:
+        if os.name != "nt":
+            # ロックを持ったまま消す（待っている側は上の確認で取り直す）
+            try:
+                lock.unlink()
+            except FileNotFoundError:
+                pass
+        _unlock(fd)
+        os.close(fd)
+
+
+def _write_atomic(rules: dict, path: Path):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        yaml.safe_dump(rules, f, allow_unicode=True, sort_keys=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def update_rules(
+    mutate: Callable[[dict], bool], path: Path = RULES_PATH
+) -> Optional[int]:
+    """
+    ロック下で最新の rules.yaml を読み、mutate(rules) が True を返したら
+    version を上げてアトミックに書き戻す。新しい version（変更なしなら None）を返す。
+
+    並行して動く昇格 / 降格ジョブがお互いの更新を上書きしないよう、
+    判定は必ずロック内で読み直した rules に対して行う。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with _file_lock(path):
+        rules = load_rules(path)
+        if not mutate(rules):
+            return None
+
+        meta = dict(rules.pop(META_KEY, None) or {})
+        meta["version"] = int(meta.get("version", 0)) + 1
+        meta["updated_at"] = datetime.utcnow().isoformat(timespec="seconds")
+        # _meta は先頭に置く
+        rules = {META_KEY: meta, **rules}
+
+        _write_atomic(rules, path)
+        return meta["version"]
+
+# =====================
+# promote
+# =====================
+def promotion_windows(rules: dict) -> Dict[float, List[str]]:
+    """
+    window_hours -> 自動昇格が有効なルール名
+    """
+    windows: Dict[float, List[str]] = {}
+    for name, d in iter_rule_defs(rules):
+        ap = d.get("auto_promote") or {}
+        if ap.get("enabled"):
+            windows.setdefault(ap.get("window_hours", 24), []).append(name)
+    return windows
+
+
+def promotion_stats(
+    la: LogAnalytics, rules: dict, now: datetime
+) -> Dict[Tuple[str, Optional[str]], WindowStats]:
+    """
+    (rule, target) -> 各ルールの window 内の warning 件数
+    """
+    stats = {}
+    for window, names in promotion_windows(rules).items():
+        for (rule, target), s in la.window(window, now=now, severity="warning").items():
+            if rule in names:
+                stats[(rule, target)] = s
+    return stats
+
+
+def apply_promotions(
+    rules: dict, stats: Dict[Tuple[str, Optional[str]], WindowStats]
+) -> List[str]:
+    """
+    threshold を超えた (rule, target) を error に昇格する。変更内容のログ行を返す
+    """
+    changes = []
+
+    for (rule, target), s in stats.items():
+        # target の無い記録（Python の check の結果）は target_severity に書けない
+        if target is None:
+            continue
+        rule_def = rules.get(rule)
+        if not isinstance(rule_def, dict) or rule_def.get("promoted"):
+            continue
+
+        threshold = rule_def["auto_promote"].get("threshold", 999)
+        if s.count < threshold:
+            continue
+
+        # ---- 昇格 ----
+        rule_def["severity"] = "error"
+        rule_def["promoted"] = True
+        rule_def["promoted_at"] = s.last_seen.isoformat(timespec="seconds")
+
+        rule_def["promoted_reason"] = {
+            "threshold": threshold,
+            "count": s.count,
+            "window_hours": rule_def["auto_promote"].get("window_hours"),
+            "first_seen": s.first_seen.isoformat(timespec="seconds"),
+            "last_seen": s.last_seen.isoformat(timespec="seconds"),
+            "targets": [target],
+        }
+
+        # target_severity も確実に error に
+        rule_def.setdefault("target_severity", {})
+        rule_def["target_severity"][target] = "error"
+
+        changes.append(f"[PROMOTE] {rule}: {target} ({s.count}) → error")
+
+    return changes
+
+# =====================
+# demote
+# =====================
+def max_cooldown_hours(rules: dict) -> float:
+    return max(
+        ((d.get("auto_demote") or {}).get("cooldown_hours", 0) for _, d in iter_rule_defs(rules)),
+        default=0,
+    )
+
+
+def apply_demotions(
+    rules: dict, last_seen: Dict[str, Dict[Optional[str], datetime]], now: datetime
+) -> List[str]:
+    """
+    cooldown の間出現していない error target を warning に戻す。変更内容のログ行を返す
+    """
+    changes = []
+
+    for rule_name, rule_def in iter_rule_defs(rules):
+        auto_demote = rule_def.get("auto_demote") or {}
+        if not auto_demote.get("enabled"):
+            continue
+
+        cooldown = auto_demote.get("cooldown_hours", 0)
+        if cooldown <= 0:
+            continue
+
+        target_severity = rule_def.get("target_severity", {})
+        if not target_severity:
+            continue
+
+        for target, severity in list(target_severity.items()):
+            if severity != "error":
+                continue
+
+            last = last_seen.get(rule_name, {}).get(target)
+            if last and last >= now - timedelta(hours=cooldown):
+                continue  # 最近出ている → 降格しない
+
+            # 降格
+            target_severity[target] = "warning"
+            changes.append(f"[DEMOTE] {rule_name}: {target} → warning")
+
+    return changes
+
+# =====================
+# lifecycle (promote + demote)
+# =====================
+def run_once(
+    la: LogAnalytics,
+    path: Path = RULES_PATH,
+    now: Optional[datetime] = None,
+    promote: bool = True,
+    demote: bool = True,
+) -> Tuple[Optional[int], List[str]]:
+    """
+    ログの追記分を取り込み、昇格 → 降格を 1 回の rules.yaml 更新にまとめて反映する
+    → (新しい version or None, 変更内容)
+    """
+    now = now or datetime.utcnow()
+    rules = load_rules(path)
+
+    hours = 0.0
+    if promote:
+        hours = max(promotion_windows(rules), default=0)
+    if demote:
+        hours = max(hours, max_cooldown_hours(rules))
+    la.update(since=now - timedelta(hours=hours), until=now)
+
+    changes: List[str] = []
+
+    def mutate(current: dict) -> bool:
+        changes.clear()
+        if promote:
+            changes.extend(apply_promotions(current, promotion_stats(la, current, now)))
+        if demote:
+            changes.extend(apply_demotions(current, la.last_seen(), now))
+        return bool(changes)
+
+    version = update_rules(mutate, path)
+    return version, changes
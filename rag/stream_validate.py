@@ -0,0 +1,304 @@
+# rag/stream_validate.py
+# LLM のトークンストリームを逐次検証する（feed / finalize）
+#
+# 全文を保持せず、直近 WINDOW 文字と数個のフラグだけで rag.core のルールを評価する。
+# 途中で確定する失敗（禁止語の出現・cpp ブロックが始まらない）は feed() の時点で返すので、
+# 呼び出し側はその場で生成を打ち切れる。
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, Optional, Set
+
+from .core import (
+    CHECKED_RULES,
+    RULE_CHECKS,
+    TextAnalysis,
+    ValidationResult,
+    _CITATION_RE,
+    _SPI_BEGIN_RE,
+    _WIRE_BEGIN_RE,
+    _check_common,
+    evaluate,
+)
+from .rule_engine import RuleMatcher, get_matcher
+
+# 保持する末尾の文字数（パターンがチャンク境界をまたいでも検出できる長さ）
+WINDOW = 256
+# finalize() の citations として保持する最大件数
+MAX_CITATIONS = 32
+
+_CPP_OPEN_RE = re.compile(r"```cpp", re.IGNORECASE)
+_FENCE = "```"
+
+
+class _Window:
+    """
+    直近 size 文字だけを保持するスライディングウィンドウ（start は buf[0] の絶対位置）
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buf = ""
+        self.start = 0
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.buf)
+
+    @property
+    def truncated(self) -> bool:
+        return self.start > 0
+
+    def push(self, s: str):
+        self.buf += s
+
+    def trim(self):
+        drop = len(self.buf) - self.size
+        if drop > 0:
+            self.buf = self.buf[drop:]
+            self.start += drop
+
+
+class _StreamAnalysis(TextAnalysis):
+    """
+    StreamValidator の状態を TextAnalysis として見せる（RULE_CHECKS をそのまま使うため）
+    """
+
+    def __init__(self, v: "StreamValidator"):
+        super().__init__("")
+        self._v = v
+
+    @property
+    def has_cpp_block(self) -> bool:
+        return self._v._has_cpp_block
+
+    @property
+    def has_wire_begin(self) -> bool:
+        return self._v._has_wire_begin
+
+    @property
+    def has_spi_begin(self) -> bool:
+        return self._v._has_spi_begin
+
+    @property
+    def citations(self) -> List[str]:
+        return self._v._citations
+
+    def rule_literals(self, matcher) -> Set[str]:
+        # feed() で走査済み（matcher は StreamValidator のもの）
+        return self._v._found
+
+
+class StreamValidator:
+    """
+    v = StreamValidator(["common", "i2c"])
+    for chunk in stream:
+        if v.feed(chunk):      # 確定した error があれば生成を打ち切る
+            break
+    results = v.finalize(rag_scores=...)
+
+    finalize() は evaluate(全文, rule_keys) と同じ結果
+    （rules.yaml の must_include / forbid を含む）を返す。
+
+    cpp_open_within=N を渡すと、N 文字までに ```cpp が始まらない時点で
+    common ルール違反として打ち切る（推測なので既定では使わない。後から
+    ```cpp が来れば evaluate は通るため、既定では finalize() でだけ判定する）。
+    """
+
+    def __init__(
+        self,
+        rule_keys: Iterable[str] = ("common",),
+        *,
+        cpp_open_within: Optional[int] = None,
+        matcher: Optional[RuleMatcher] = None,
+    ):
+        self.rule_keys = list(rule_keys)
+        self.cpp_open_within = cpp_open_within
+        self.failures: List[ValidationResult] = []
+        self.finalized = False
+
+        # rules.yaml の全リテラルを逐次走査して覚えておく（finalize で must_include も判定する）。
+        # 途中で確定させるのは forbid だけ（must_include は全文を見ないと確定しない）
+        self._matcher = matcher or get_matcher()
+        self._forbid = self._matcher.forbid_only(
+            [k for k in self.rule_keys if k not in CHECKED_RULES]
+        )
+        self._found: Set[str] = set()
+
+        self._raw = _Window(max(WINDOW, self._matcher.max_literal_len * 2))
+        self._code = _Window(WINDOW)
+
+        # ```cpp ... ``` の状態（絶対位置）
+        self._in_block = False
+        self._scan_from = 0
+        self._has_cpp_block = False
+
+        # // コメント除去（行をまたいで状態を持つ）
+        self._in_comment = False
+        self._pending = ""
+
+        self._has_wire_begin = False
+        self._has_spi_begin = False
+        self._citations: List[str] = []
+        self._citation_from = 0
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.failures)
+
+    @property
+    def chars(self) -> int:
+        return self._raw.end
+
+    # ---------- feed ----------
+    def feed(self, chunk: str) -> List[ValidationResult]:
+        """
+        chunk を追加し、この時点で新たに確定した error を返す
+        """
+        if self.finalized:
+            raise RuntimeError("feed() after finalize()")
+        if not chunk:
+            return []
+
+        self._raw.push(chunk)
+        self._scan_cpp_block()
+        self._scan_citations()
+        self._found |= self._matcher.scan(self._raw.buf)
+        self._raw.trim()
+
+        self._feed_code(chunk)
+
+        return self._decisive()
+
+    def _scan_cpp_block(self):
+        w = self._raw
+        if self._has_cpp_block:
+            return
+
+        if not self._in_block:
+            m = _CPP_OPEN_RE.search(w.buf, max(0, self._scan_from - w.start))
+            if m is None:
+                # 末尾の途中までの "```cp" は次回もう一度見る
+                self._scan_from = max(self._scan_from, w.end - len("```cpp") + 1)
+                return
+            self._in_block = True
+            self._scan_from = w.start + m.end()
+
+        i = w.buf.find(_FENCE, max(0, self._scan_from - w.start))
+        if i < 0:
+            self._scan_from = max(self._scan_from, w.end - len(_FENCE) + 1)
+            return
+        self._has_cpp_block = True
+
+    def _scan_citations(self):
+        w = self._raw
+        if len(self._citations) >= MAX_CITATIONS:
+            return
+        for m in _CITATION_RE.finditer(w.buf, max(0, self._citation_from - w.start)):
+            self._citations.append(m.group(1))
+            self._citation_from = w.start + m.end()
+            if len(self._citations) >= MAX_CITATIONS:
+                break
+
+    def _feed_code(self, s: str):
+        """
+        // 以降を行末まで取り除いた文字列を _code ウィンドウに流す
+        （core._strip_cpp_comments と同じ結果を逐次に得る）
+        """
+        out = []
+        s = self._pending + s
+        self._pending = ""
+
+        while s:
+            if self._in_comment:
+                n = s.find("\n")
+                if n < 0:
+                    break
+                self._in_comment = False
+                s = s[n:]
+                continue
+
+            k = s.find("//")
+            n = s.find("\n")
+            if n >= 0 and (k < 0 or n < k):
+                out.append(s[:n + 1])
+                s = s[n + 1:]
+            elif k >= 0:
+                out.append(s[:k])
+                self._in_comment = True
+                s = s[k + 2:]
+            else:
+                # 末尾の "/" は次の chunk 次第で // になる
+                if s.endswith("/"):
+                    out.append(s[:-1])
+                    self._pending = "/"
+                else:
+                    out.append(s)
+                break
+
+        self._push_code("".join(out))
+
+    def _push_code(self, s: str):
+        if not s:
+            return
+        w = self._code
+        w.push(s)
+
+        for attr, pattern in (
+            ("_has_wire_begin", _WIRE_BEGIN_RE),
+            ("_has_spi_begin", _SPI_BEGIN_RE),
+        ):
+            if getattr(self, attr):
+                continue
+            for m in pattern.finditer(w.buf):
+                # 切り詰めたウィンドウ先頭の \b は本来の単語境界とは限らない
+                if m.start() == 0 and w.truncated:
+                    continue
+                setattr(self, attr, True)
+                break
+
+        w.trim()
+
+    def _decisive(self) -> List[ValidationResult]:
+        new: List[ValidationResult] = []
+        seen = {(r.rule, r.target, r.message) for r in self.failures}
+
+        candidates: List[ValidationResult] = []
+        if self._found:
+            candidates.extend(
+                self._forbid.results(self._forbid.hits(self._found, self.rule_keys))
+            )
+
+        if (
+            self.cpp_open_within is not None
+            and not self._in_block
+            and self.chars > self.cpp_open_within
+            and any(_check_common in RULE_CHECKS.get(k, ()) for k in self.rule_keys)
+        ):
+            candidates.extend(_check_common(_StreamAnalysis(self)))
+
+        for r in candidates:
+            key = (r.rule, r.target, r.message)
+            if r.severity != "error" or key in seen:
+                continue
+            seen.add(key)
+            self.failures.append(r)
+            new.append(r)
+
+        return new
+
+    # ---------- finalize ----------
+    def finalize(
+        self, rule_keys: Optional[Iterable[str]] = None, **context
+    ) -> List[ValidationResult]:
+        """
+        ストリーム終端。rule_keys を渡すと（ルール自動判定の結果などで）差し替えて評価する。
+        """
+        if not self.finalized:
+            self.finalized = True
+            if self._pending:
+                self._push_code(self._pending)
+                self._pending = ""
+
+        keys = self.rule_keys if rule_keys is None else list(rule_keys)
+        return evaluate(_StreamAnalysis(self), keys, matcher=self._matcher, **context)
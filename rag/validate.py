@@ -7,6 +7,7 @@
 # - 実装詳細（logging 等）には関与しない
 
 from pathlib import Path
+import threading
 import yaml
 
 # ★ 正解：同一パッケージ内の core を相対 import
@@ -14,6 +15,15 @@ from .core import (
     VALIDATE_MAP,
     validate_common,
     detect_rule_key,
+    evaluate,
+    analyze,
+    TextAnalysis,
+    split_meta,
+)
+from .rule_engine import (
+    RuleMatcher,
+    match_rules,
+    validate_rules,
 )
 
 # =====================
@@ -30,10 +40,23 @@ def load_rules():
     if not RULES_PATH.exists():
         return {}
     with RULES_PATH.open(encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+        return split_meta(yaml.safe_load(f))[0]
+
+
+_rules = None
+_rules_lock = threading.Lock()
 
 
-RULES = load_rules()
+def __getattr__(name: str):
+    # RULES は初回参照時に読み込む（import 時のファイル I/O を避ける）
+    global _rules
+    if name == "RULES":
+        if _rules is None:
+            with _rules_lock:
+                if _rules is None:
+                    _rules = load_rules()
+        return _rules
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # =====================
 # 公開API
@@ -43,4 +66,10 @@ __all__ = [
     "VALIDATE_MAP",
     "validate_common",
     "detect_rule_key",
+    "evaluate",
+    "analyze",
+    "TextAnalysis",
+    "RuleMatcher",
+    "match_rules",
+    "validate_rules",
 ]
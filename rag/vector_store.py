@@ -1,58 +1,502 @@
 from pathlib import Path
-import json
+import atexit
+import os
+import threading
+from typing import Iterable, List, Optional
+
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from rag.bm25 import BM25Index, rrf_fuse
+from rag.chunk import Chunk
+from rag.embedding import EMBED_DIM, encode
+from rag.meta_store import MetaStore
 
 VECTOR_DIR = Path("data/vector")
-VECTOR_DIR.mkdir(parents=True, exist_ok=True)
 
 INDEX_PATH = VECTOR_DIR / "faiss.index"
-META_PATH = VECTOR_DIR / "meta.json"
+META_PATH = VECTOR_DIR / "meta.sqlite3"
 
-_model = SentenceTransformer("all-MiniLM-L6-v2")
-_dim = 384
+# 旧形式のメタデータ（初回オープン時に META_PATH へ移行）
+LEGACY_META_PATH = VECTOR_DIR / "meta.json"
 
-def _load_index():
-    if INDEX_PATH.exists():
-        return faiss.read_index(str(INDEX_PATH))
-    return faiss.IndexFlatL2(_dim)
+# 未保存の追加件数がこの値に達したら自動で checkpoint する
+CHECKPOINT_EVERY = 1000
 
-def _load_meta():
-    if META_PATH.exists():
-        return json.loads(META_PATH.read_text(encoding="utf-8"))
-    return []
+# encode / index.add をまとめて行う件数
+DEFAULT_BATCH_SIZE = 64
 
-def _save(index, meta):
-    faiss.write_index(index, str(INDEX_PATH))
-    META_PATH.write_text(
-        json.dumps(meta, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+# hybrid 検索で各検索器から取る候補数（k の倍数）
+HYBRID_CANDIDATES = 4
+RRF_K = 60
 
-def add_chunk(text: str, source: str, chunk_index: int):
-    index = _load_index()
-    meta = _load_meta()
+# =====================
+# index factory
+# =====================
+# ベクトルは L2 正規化して内積 index に入れる（score = cosine 類似度）
+METRIC = faiss.METRIC_INNER_PRODUCT
+
+# flat     : 総当たり（正確・小規模向け）
+# ivf_flat : 転置ファイル + 生ベクトル（要学習）
+# ivf_pq   : 転置ファイル + 直積量子化（要学習・省メモリ・近似）
+# hnsw     : グラフ探索（学習不要・高速・メモリ多め）
+# auto     : ベクトル数から上記を選ぶ
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+INDEX_KIND = os.environ.get("RAG_INDEX_KIND", "auto")
+
+# auto モードの切り替え閾値（ベクトル数）
+AUTO_FLAT_MAX = 20_000
+AUTO_HNSW_MAX = 1_000_000
+
+# 検索パラメータ
+IVF_NPROBE = 16
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+PQ_M = 48          # EMBED_DIM(384) を割り切れる値
+PQ_NBITS = 8
+
+# 学習に使うサンプル数の上限
+TRAIN_SAMPLE_MAX = 100_000
+
+
+def choose_index_kind(n_vectors: int) -> str:
+    if n_vectors < AUTO_FLAT_MAX:
+        return "flat"
+    if n_vectors < AUTO_HNSW_MAX:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def _nlist_for(n_vectors: int) -> int:
+    # 目安: 4 * sqrt(N)、最低 16
+    return int(max(16, min(65536, 4 * np.sqrt(max(n_vectors, 1)))))
+
+
+def min_train_size(kind: str, n_vectors: int) -> int:
+    """
+    kind の学習に最低限必要なベクトル数（学習不要なら 0）
+    """
+    if kind == "ivf_flat":
+        return _nlist_for(n_vectors)
+    if kind == "ivf_pq":
+        return max(_nlist_for(n_vectors), 2 ** PQ_NBITS)
+    return 0
+
+
+def build_index(kind: str, n_vectors: int = 0, dim: int = EMBED_DIM):
+    """
+    kind に応じた空の index を作る（IVF 系は未学習）
+    """
+    if kind == "auto":
+        kind = choose_index_kind(n_vectors)
+
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "ivf_flat":
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(
+            quantizer, dim, _nlist_for(n_vectors), METRIC
+        )
+    elif kind == "ivf_pq":
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(
+            quantizer, dim, _nlist_for(n_vectors), PQ_M, PQ_NBITS, METRIC
+        )
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, METRIC)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    else:
+        raise ValueError(f"unknown index kind: {kind}")
+
+    _tune(index)
+    return index
+
+
+def index_kind_of(index) -> str:
+    if isinstance(index, faiss.IndexHNSWFlat):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "flat"
+
+
+def _tune(index):
+    kind = index_kind_of(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = IVF_NPROBE
+        # id → ベクトルを reconstruct できるように（hybrid_search の BM25 のみのヒットの score）
+        ivf.make_direct_map()
+    elif kind == "hnsw":
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+
+
+def extract_vectors(index) -> np.ndarray:
+    """
+    index に格納済みのベクトルを取り出す（ivf_pq は量子化後の近似値）
+    """
+    n = index.ntotal
+    if n == 0:
+        return np.zeros((0, index.d), dtype="float32")
+
+    if index_kind_of(index) in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).make_direct_map()
+
+    return index.reconstruct_n(0, n)
+
+
+def normalize(vecs: np.ndarray) -> np.ndarray:
+    """
+    (n, dim) を float32 の L2 正規化済みコピーにする
+    """
+    vecs = np.array(vecs, dtype="float32", ndmin=2, copy=True)
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+def convert_index(index, kind: str, batch_size: int = 65536):
+    """
+    既存 index の全ベクトルを正規化して kind の index に移し替える（id 順は維持）
+    """
+    vecs = normalize(extract_vectors(index))
+    n = len(vecs)
+
+    new_index = build_index(kind, n, index.d)
+
+    if not new_index.is_trained:
+        rng = np.random.default_rng(0)
+        take = min(n, TRAIN_SAMPLE_MAX)
+        sample = vecs[rng.choice(n, size=take, replace=False)]
+        new_index.train(sample)
+
+    for i in range(0, n, batch_size):
+        new_index.add(vecs[i:i + batch_size])
+
+    return new_index
+
+
+class VectorStore:
+    """
+    FAISS index とメタデータをメモリ上に常駐させるベクトルストア。
+
+    - 読み込みは初回アクセス時の 1 回のみ
+    - 追加はメモリ上で行い dirty フラグを立てる
+    - ディスクへの書き込みは flush() か checkpoint_every 件ごとの自動 checkpoint
+    """
+
+    def __init__(
+        self,
+        index_path: Path = INDEX_PATH,
+        meta_path: Path = META_PATH,
+        checkpoint_every: Optional[int] = CHECKPOINT_EVERY,
+        index_kind: str = INDEX_KIND,
+    ):
+        if index_kind != "auto" and index_kind not in INDEX_KINDS:
+            raise ValueError(f"unknown index kind: {index_kind}")
+
+        self.index_path = Path(index_path)
+        self.meta_path = Path(meta_path)
+        self.checkpoint_every = checkpoint_every
+        self.index_kind = index_kind
+
+        self._index = None
+        self._bm25: Optional[BM25Index] = None
+        self._meta = MetaStore(
+            self.meta_path,
+            legacy_json=self.meta_path.with_name(LEGACY_META_PATH.name),
+        )
+        self._loaded = False
+        self._dirty = False
+        self._pending = 0
+        # 検索結果が変わりうる変更のたびに進める（クエリキャッシュの無効化用）
+        self._version = 0
+        self._lock = threading.RLock()
+
+    # =====================
+    # load / persist
+    # =====================
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+
+        if self.index_path.exists():
+            self._index = faiss.read_index(str(self.index_path))
+            _tune(self._index)
+
+            # 旧形式（L2 距離・未正規化）の index は cosine 用に作り直す
+            if self._index.metric_type != METRIC:
+                self._index = convert_index(
+                    self._index, index_kind_of(self._index)
+                )
+                self._dirty = True
+        else:
+            # IVF 系は学習データが揃うまで flat で受け付ける
+            self._index = build_index("flat")
+
+        # flush 途中で落ちた場合、meta が index より先に進んでいることがある
+        if len(self._meta) > self._index.ntotal:
+            self._meta.truncate(self._index.ntotal)
+
+        self._loaded = True
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def flush(self):
+        """
+        未保存の変更があれば index / meta を書き出す（tmp → rename）
+        """
+        with self._lock:
+            if not self._dirty:
+                return
 
-    vec = _model.encode([text]).astype("float32")
-    index.add(vec)
+            self._maybe_convert()
 
-    meta.append({
+            # meta → index の順に確定させる（load 時に meta 側を切り詰めて整合）
+            self._meta.commit()
+
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+            faiss.write_index(self._index, str(tmp))
+            os.replace(tmp, self.index_path)
+
+            self._dirty = False
+            self._pending = 0
+
+    def _target_kind(self, n_vectors: int) -> str:
+        if self.index_kind == "auto":
+            return choose_index_kind(n_vectors)
+        if n_vectors < max(1, min_train_size(self.index_kind, n_vectors)):
+            return "flat"
+        return self.index_kind
+
+    def _maybe_convert(self):
+        """
+        ベクトル数に応じて index 種別を切り替える（flush 時に実施）
+        """
+        n = self._index.ntotal
+        target = self._target_kind(n)
+        if target != index_kind_of(self._index):
+            self._index = convert_index(self._index, target)
+            self._version += 1
+
+    def rebuild(self, kind: Optional[str] = None):
+        """
+        既存の全ベクトルから index を作り直す（種別変更・再学習）
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if kind is not None:
+                if kind != "auto" and kind not in INDEX_KINDS:
+                    raise ValueError(f"unknown index kind: {kind}")
+                self.index_kind = kind
+
+            target = self._target_kind(self._index.ntotal)
+            self._index = convert_index(self._index, target)
+            self._dirty = True
+            self._version += 1
+
+    def bm25(self) -> BM25Index:
+        """
+        BM25 インデックス（初回のみメタデータから構築し、以後は追加に追従）
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self._bm25 is None:
+                bm25 = BM25Index()
+                bm25.add_many(self._meta.iter_texts())
+                self._bm25 = bm25
+            return self._bm25
+
+    @property
+    def current_kind(self) -> str:
+        with self._lock:
+            self._ensure_loaded()
+            return index_kind_of(self._index)
+
+    def _maybe_checkpoint(self):
+        if self.checkpoint_every and self._pending >= self.checkpoint_every:
+            self.flush()
+
+    # =====================
+    # add / search
+    # =====================
+    def _add_batch(self, items: List[dict], batch_size: int) -> int:
+        vecs = encode([it["text"] for it in items], batch_size=batch_size)
+        return self.add_embeddings(items, vecs)
+
+    def add_embeddings(self, items: List[dict], vecs: np.ndarray) -> int:
+        """
+        encode 済みのベクトルを items と対応付けて追加する
+        """
+        vecs = normalize(vecs)
+
+        with self._lock:
+            self._ensure_loaded()
+            start = self._index.ntotal
+            self._index.add(vecs)
+            self._meta.insert(start, items)
+
+            if self._bm25 is not None:
+                self._bm25.add_many(
+                    (start + i, it["text"]) for i, it in enumerate(items)
+                )
+            self._dirty = True
+            self._version += 1
+            self._pending += len(items)
+            self._maybe_checkpoint()
+
+        return len(items)
+
+    def add_many(
+        self,
+        items: Iterable[dict],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> int:
+        """
+        items = [{"text": ..., "source": ..., "chunk_index": ...}, ...]
+        batch_size 件ずつ encode し、バッチごとに 1 回の index.add で追加する
+        """
+        total = 0
+        batch: List[dict] = []
+
+        for it in items:
+            batch.append(it)
+            if len(batch) >= batch_size:
+                total += self._add_batch(batch, batch_size)
+                batch = []
+
+        if batch:
+            total += self._add_batch(batch, batch_size)
+
+        return total
+
+    def add_chunks(
+        self,
+        chunks: Iterable[Chunk],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> int:
+        return self.add_many(
+            (
+                {"text": c.text, "source": c.source, "chunk_index": c.index}
+                for c in chunks
+            ),
+            batch_size=batch_size,
+        )
+
+    def search(self, query: str, k: int = 5) -> List[dict]:
+        return self.search_by_vector(encode([query])[0], k)
+
+    def search_by_vector(self, vec: np.ndarray, k: int = 5) -> List[dict]:
+        """
+        メタデータに score（cosine 類似度, -1.0〜1.0）を付けて返す
+        """
+        q = normalize(np.reshape(vec, (1, -1)))
+
+        with self._lock:
+            self._ensure_loaded()
+            if self._index.ntotal == 0:
+                return []
+
+            sims, ids = self._index.search(q, k)
+
+            hits = [(int(i), float(s)) for i, s in zip(ids[0], sims[0]) if i >= 0]
+            rows = self._meta.get_many([i for i, _ in hits])
+
+        return [dict(rows[i], score=s) for i, s in hits if i in rows]
+
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 5,
+        candidates: int = HYBRID_CANDIDATES,
+    ) -> List[dict]:
+        """
+        ベクトル検索と BM25 を RRF で統合する
+        score は cosine 類似度（BM25 のみでヒットした行も計算）、rrf_score は統合順位
+        """
+        n_cand = k * candidates
+        q = normalize(encode([query]))
+
+        with self._lock:
+            self._ensure_loaded()
+            if self._index.ntotal == 0:
+                return []
+
+            sims, ids = self._index.search(q, n_cand)
+            vec_ids = [int(i) for i in ids[0] if i >= 0]
+            cos = {i: float(s) for i, s in zip(ids[0], sims[0]) if i >= 0}
+
+            kw_ids = [i for i, _ in self.bm25().search(query, n_cand)]
+
+            fused = rrf_fuse([vec_ids, kw_ids], k=RRF_K)[:k]
+
+            missing = [i for i, _ in fused if i not in cos]
+            if missing:
+                cos.update(self._cosine(q[0], missing))
+
+            rows = self._meta.get_many([i for i, _ in fused])
+
+        return [
+            dict(rows[i], score=cos.get(i), rrf_score=r)
+            for i, r in fused
+            if i in rows
+        ]
+
+    def _cosine(self, q: np.ndarray, ids: List[int]) -> dict:
+        try:
+            vecs = np.vstack([self._index.reconstruct(i) for i in ids])
+        except RuntimeError:
+            # 再構成できない index（direct map 無しの IVF など）
+            return {}
+        return dict(zip(ids, (vecs @ q).tolist()))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return self._index.ntotal
+
+
+# =====================
+# module-level API（既存呼び出し互換）
+# =====================
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> VectorStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VectorStore()
+                atexit.register(_store.flush)
+    return _store
+
+
+def add_chunk(text: str, source: str, chunk_index: int):
+    get_store().add_many([{
+        "text": text,
         "source": source,
         "chunk_index": chunk_index,
-        "text": text,
-    })
+    }])
 
-    _save(index, meta)
 
-def search(query: str, k: int = 5):
-    if not INDEX_PATH.exists():
-        return []
+def add_chunks(chunks: Iterable[Chunk], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    return get_store().add_chunks(chunks, batch_size=batch_size)
 
-    index = _load_index()
-    meta = _load_meta()
 
-    q = _model.encode([query]).astype("float32")
-    _, ids = index.search(q, k)
+def search(query: str, k: int = 5):
+    return get_store().search(query, k)
+
 
-    return [meta[i] for i in ids[0] if i < len(meta)]
+def flush():
+    get_store().flush()
@@ -1,61 +1,43 @@
 ﻿from __future__ import annotations
 
-import json
 from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 
+from rag.log_analytics import LogAnalytics
+
 # =====================
 # config
 # =====================
 
-LOG_FILE = Path("logs/validation_errors.jsonl")
+# 日付パーティション（logs/validation_errors/YYYY-MM-DD.jsonl）
+LOG_DIR = Path("logs/validation_errors")
 
 THRESHOLD = 3        # 何回出たら昇格候補か
 WINDOW_HOURS = 24    # 直近何時間を見るか
 
-# =====================
-# helpers
-# =====================
-
-def parse_ts(ts: str) -> datetime:
-    return datetime.fromisoformat(ts)
-
 # =====================
 # main analyze
 # =====================
 
 def main():
-    if not LOG_FILE.exists():
-        print("[WARN] log file not found:", LOG_FILE)
+    if not LOG_DIR.exists():
+        print("[WARN] log dir not found:", LOG_DIR)
         print("No validation errors found.")
         return
 
     now = datetime.utcnow()
-    window_start = now - timedelta(hours=WINDOW_HOURS)
 
     # rule -> (target -> count)
     warning_counter: dict[str, Counter] = defaultdict(Counter)
 
-    with LOG_FILE.open("r", encoding="utf-8") as f:
-        for line in f:
-            record = json.loads(line)
-
-            ts = parse_ts(record["ts"])
-            if ts < window_start:
+    # 直近 WINDOW_HOURS に重なるパーティションの追記分だけを取り込み、時間バケットを合計する
+    with LogAnalytics(LOG_DIR) as la:
+        la.update(since=now - timedelta(hours=WINDOW_HOURS), until=now)
+        for (rule, target), s in la.window(WINDOW_HOURS, now=now, severity="warning").items():
+            if not rule or not target:
                 continue
-
-            for err in record.get("errors", []):
-                if err.get("severity") != "warning":
-                    continue
-
-                rule = err.get("rule")
-                target = err.get("target")
-
-                if not rule or not target:
-                    continue
-
-                warning_counter[rule][target] += 1
+            warning_counter[rule][target] += s.count
 
     # =====================
     # output
@@ -0,0 +1,77 @@
+# scripts/bench_ann_index.py
+# index 種別ごとの recall@k / 検索レイテンシを flat（正解）と比較する
+#
+# 使い方:
+#   python -m scripts.bench_ann_index [--n 200000] [--queries 500] [--k 5]
+#   python -m scripts.bench_ann_index --from-index data/vector/faiss.index
+from __future__ import annotations
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from rag.embedding import EMBED_DIM
+from rag.vector_store import INDEX_KINDS, build_index, convert_index, extract_vectors
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """
+    クラスタ構造を持つ擬似 embedding（正規化済み）
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(16, n // 500), dim)).astype("float32")
+    labels = rng.integers(0, len(centers), size=n)
+    x = centers[labels] + 0.3 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--from-index", default=None)
+    args = parser.parse_args()
+
+    if args.from_index:
+        base = extract_vectors(faiss.read_index(args.from_index))
+    else:
+        base = synthetic_vectors(args.n, EMBED_DIM)
+
+    rng = np.random.default_rng(1)
+    queries = base[rng.choice(len(base), size=args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+
+    flat = build_index("flat", len(base), base.shape[1])
+    flat.add(base)
+    _, truth = flat.search(queries, args.k)
+
+    print(f"vectors: {len(base)}  queries: {len(queries)}  k: {args.k}")
+    print(f"{'kind':>9}  {'build s':>8}  {'ms/query':>9}  {'recall@k':>9}")
+
+    for kind in INDEX_KINDS:
+        t0 = time.perf_counter()
+        index = flat if kind == "flat" else convert_index(flat, kind)
+        build_s = time.perf_counter() - t0
+
+        # 1 クエリずつ（対話的な検索と同じ条件）
+        t0 = time.perf_counter()
+        found = np.vstack([index.search(q[None, :], args.k)[1] for q in queries])
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+        print(
+            f"{kind:>9}  {build_s:>8.1f}  {ms:>9.3f}  "
+            f"{recall_at_k(truth, found):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
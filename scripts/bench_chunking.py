@@ -0,0 +1,129 @@
+# scripts/bench_chunking.py
+# チャンク分割のスループット比較（MB/s）
+#
+#   legacy split_text : 500 文字ごとに切る旧 rag.chunk.split_text（overlap 100）
+#   legacy chunk_text : 行を += で連結する旧 rag.ingest.chunker.chunk_text
+#   engine (approx)   : rag.chunk.iter_chunks（近似トークン数）
+#   engine (tokenizer): rag.chunk.iter_chunks（embedding モデルの tokenizer。使える場合のみ）
+#
+# 使い方:
+#   python -m scripts.bench_chunking [--mb 8] [--repeat 3]
+from __future__ import annotations
+
+import argparse
+import io
+import time
+from pathlib import Path
+
+from rag.chunk import approx_token_counts, get_token_counter, iter_chunks
+
+DATA_DIR = Path("data")
+
+
+# ---- 旧実装（比較用にそのまま残す） ----
+def legacy_score_chunk(text):
+    t = text.lower()
+    score = 0.3 if len(text) > 400 else 0.2 if len(text) > 200 else 0.1
+    keywords = [
+        "i2c", "spi", "api", "register", "仕様",
+        "parameter", "return", "example", "構成",
+        "設計", "command", "interface"
+    ]
+    if any(k in t for k in keywords):
+        score += 0.4
+    if "\n-" in text or "\n*" in text or "\n•" in text:
+        score += 0.1
+    if any(w in t for w in ["todo", "未検証", "仮", "draft", "メモ"]):
+        score -= 0.2
+    return max(0.0, min(score, 1.0))
+
+
+def legacy_split_text(text, source, chunk_size=500, overlap=100):
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        chunk_text = text[start:end]
+        chunks.append((chunk_text, start, end, source, legacy_score_chunk(chunk_text)))
+        start += chunk_size - overlap
+    return chunks
+
+
+def legacy_chunk_text(text, max_chars=500):
+    chunks = []
+    current_chunk = ""
+    chunk_id = 0
+    for p in text.split("\n"):
+        p = p.strip()
+        if not p:
+            continue
+        if len(current_chunk) + len(p) + 1 > max_chars:
+            chunks.append({"text": current_chunk, "chunk_id": chunk_id})
+            chunk_id += 1
+            current_chunk = p
+        else:
+            current_chunk = current_chunk + "\n" + p if current_chunk else p
+    if current_chunk:
+        chunks.append({"text": current_chunk, "chunk_id": chunk_id})
+    return chunks
+
+
+def load_corpus(mb: float) -> str:
+    texts = [
+        p.read_text(encoding="utf-8", errors="ignore")
+        for p in sorted(DATA_DIR.glob("**/*"))
+        if p.suffix in (".txt", ".md") and p.is_file()
+    ]
+    base = "\n\n".join(t for t in texts if t.strip())
+    if not base:
+        raise SystemExit(f"no .txt/.md under {DATA_DIR}")
+
+    target = int(mb * 1024 * 1024)
+    reps = max(1, target // len(base.encode("utf-8")) + 1)
+    return "\n\n".join([base] * reps)
+
+
+def bench(fn, text: str, repeat: int):
+    size = len(text.encode("utf-8")) / (1024 * 1024)
+    best = float("inf")
+    n = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return size / best, n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=8.0, help="コーパスのサイズ [MB]")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = load_corpus(args.mb)
+    print(f"corpus: {len(text.encode('utf-8')) / (1024 * 1024):.1f} MB ({DATA_DIR})")
+    print(f"{'impl':<22}{'MB/s':>10}{'chunks':>10}")
+
+    cases = [
+        ("legacy split_text", lambda t: len(legacy_split_text(t, "bench"))),
+        ("legacy chunk_text", lambda t: len(legacy_chunk_text(t))),
+        # 行イテレータで渡す（ファイルを開いて渡すのと同じ経路）
+        ("engine (approx)", lambda t: sum(
+            1 for _ in iter_chunks(io.StringIO(t), "bench", count_tokens=approx_token_counts)
+        )),
+    ]
+    counter = get_token_counter()
+    if counter is not approx_token_counts:
+        cases.append(("engine (tokenizer)", lambda t: sum(
+            1 for _ in iter_chunks(io.StringIO(t), "bench", count_tokens=counter)
+        )))
+    else:
+        print("(tokenizer unavailable: engine (tokenizer) skipped)")
+
+    for name, fn in cases:
+        mbps, n = bench(fn, text, args.repeat)
+        print(f"{name:<22}{mbps:>10.2f}{n:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# scripts/bench_docx.py
+# DOCX 抽出の速度・メモリ比較
+#
+#   python-docx (paragraphs) : 旧 docx_loader（Document(path).paragraphs だけ。表は読まない）
+#   python-docx (+tables)    : python-docx で body を順に辿り、表も読む
+#   streaming xml            : rag.ingest.docx_loader（iterparse）
+#
+# 段落と表を交互に並べた DOCX を python-docx で生成して計測する。
+# メモリは tracemalloc のピーク（Python のヒープ割り当て）。
+#
+# 使い方:
+#   python -m scripts.bench_docx [--paragraphs 20000] [--tables 500] [--repeat 3]
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from rag.ingest.docx_loader import load_docx_text
+
+
+# ---- 旧実装（比較用にそのまま残す） ----
+def legacy_load_docx_text(path):
+    from docx import Document
+
+    doc = Document(path)
+    lines = []
+    for p in doc.paragraphs:
+        text = p.text.strip()
+        if text:
+            lines.append(text)
+    return "\n".join(lines)
+
+
+def python_docx_with_tables(path):
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    doc = Document(path)
+    lines = []
+    for child in doc.element.body.iterchildren():
+        if child.tag.endswith("}p"):
+            text = Paragraph(child, doc).text.strip()
+            if text:
+                lines.append(text)
+        elif child.tag.endswith("}tbl"):
+            for row in Table(child, doc).rows:
+                cells = [c.text.strip() for c in row.cells]
+                if any(cells):
+                    lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def make_docx(path: Path, paragraphs: int, tables: int):
+    from docx import Document
+
+    doc = Document()
+    every = max(1, paragraphs // max(1, tables))
+    t = 0
+    for i in range(paragraphs):
+        doc.add_paragraph(f"第{i}項 ESP32 の GPIO{i % 40} は 3.3V 系で、入力電圧は {i % 5 + 1}.0V 以下とする。")
+        if t < tables and i % every == every - 1:
+            table = doc.add_table(rows=4, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"GPIO{r * 3 + c}" if c == 0 else f"{r}.{c}V"
+            t += 1
+    doc.save(str(path))
+
+
+def measure(fn, path, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        text = fn(path)
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", type=Path, default=None, help="生成せずにこの DOCX を使う")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = Path(tmp) / "bench.docx"
+            make_docx(path, args.paragraphs, args.tables)
+        size = path.stat().st_size / (1024 * 1024)
+        print(f"file: {path.name} ({size:.1f} MB)")
+        print(f"{'impl':<26}{'sec':>8}{'peak MB':>10}{'chars':>12}")
+
+        cases = [
+            ("python-docx (paragraphs)", legacy_load_docx_text),
+            ("python-docx (+tables)", python_docx_with_tables),
+            ("streaming xml", load_docx_text),
+        ]
+        for name, fn in cases:
+            sec, peak, text = measure(fn, path, args.repeat)
+            print(f"{name:<26}{sec:>8.3f}{peak / (1024 * 1024):>10.1f}{len(text):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# scripts/bench_embed_batch.py
+# VectorStore.add_chunks のバッチサイズ別スループット計測（CPU）
+#
+# 使い方:
+#   python -m scripts.bench_embed_batch [--n 2000] [--sizes 1,16,64,256]
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from rag.chunk import split_text
+from rag.vector_store import VectorStore
+
+CORPUS_DIR = Path("data/esp32")
+
+
+def load_corpus_chunks(n: int):
+    chunks = []
+    for path in sorted(CORPUS_DIR.rglob("*")):
+        if path.suffix.lower() not in {".md", ".txt"}:
+            continue
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        chunks.extend(split_text(text=text, source=path.name))
+
+    if not chunks:
+        raise SystemExit(f"no corpus found under {CORPUS_DIR}")
+
+    # コーパスが小さい場合は繰り返して n 件にそろえる
+    out = []
+    while len(out) < n:
+        out.extend(chunks)
+    return out[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--sizes", default="1,16,64,256")
+    args = parser.parse_args()
+
+    chunks = load_corpus_chunks(args.n)
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print(f"chunks: {len(chunks)}")
+    print(f"{'batch':>6}  {'sec':>8}  {'chunks/s':>10}")
+
+    for bs in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            store = VectorStore(
+                index_path=Path(d) / "faiss.index",
+                meta_path=Path(d) / "meta.sqlite3",
+                checkpoint_every=None,
+            )
+
+            t0 = time.perf_counter()
+            store.add_chunks(chunks, batch_size=bs)
+            store.flush()
+            elapsed = time.perf_counter() - t0
+
+        print(f"{bs:>6}  {elapsed:>8.2f}  {len(chunks) / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
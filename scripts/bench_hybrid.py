@@ -0,0 +1,106 @@
+# scripts/bench_hybrid.py
+# data/esp32 コーパスで vector / bm25 / hybrid(RRF) の hit@k とレイテンシを比較する
+#
+# クエリは コーパス中の識別子（ledc_channel_config, Wire.begin など）から作り、
+# 上位 k 件のどれかがその識別子を含めば hit とする。
+#
+# 使い方:
+#   python -m scripts.bench_hybrid [--queries 200] [--k 5]
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from rag.chunk import split_text
+from rag.vector_store import VectorStore
+
+CORPUS_DIR = Path("data/esp32")
+
+IDENT_RE = re.compile(
+    r"\b[a-z][a-z0-9]*_[a-z0-9_]+\b|\b[A-Z][A-Za-z0-9]*\.[a-z][A-Za-z0-9]+\b"
+)
+
+
+def load_chunks():
+    chunks = []
+    for path in sorted(CORPUS_DIR.rglob("*")):
+        if path.suffix.lower() not in {".md", ".txt"}:
+            continue
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        chunks.extend(split_text(text=text, source=path.name))
+    return chunks
+
+
+def make_queries(chunks, n: int, seed: int = 0):
+    # 多くの chunk に出てくる識別子は hit が自明になるので除外
+    df = Counter()
+    for c in chunks:
+        df.update(set(IDENT_RE.findall(c.text)))
+
+    idents = sorted(i for i, d in df.items() if d <= 5)
+    random.Random(seed).shuffle(idents)
+    return idents[:n]
+
+
+def measure(fn, queries, k):
+    hits = 0
+    lat = []
+    for ident in queries:
+        t0 = time.perf_counter()
+        texts = fn(f"{ident} の使い方を教えてください", k)
+        lat.append((time.perf_counter() - t0) * 1000)
+        hits += any(ident in t for t in texts)
+    return hits / len(queries), float(np.percentile(lat, 50)), float(np.percentile(lat, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = load_chunks()
+    queries = make_queries(chunks, args.queries)
+
+    with tempfile.TemporaryDirectory() as d:
+        store = VectorStore(
+            index_path=Path(d) / "faiss.index",
+            meta_path=Path(d) / "meta.sqlite3",
+            checkpoint_every=None,
+            index_kind="flat",
+        )
+        store.add_chunks(chunks)
+
+        t0 = time.perf_counter()
+        bm25 = store.bm25()
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        def bm25_texts(q, k):
+            ids = [i for i, _ in bm25.search(q, k)]
+            rows = store._meta.get_many(ids)
+            return [rows[i]["text"] for i in ids if i in rows]
+
+        modes = {
+            "vector": lambda q, k: [r["text"] for r in store.search(q, k)],
+            "bm25": bm25_texts,
+            "hybrid": lambda q, k: [r["text"] for r in store.hybrid_search(q, k)],
+        }
+
+        print(f"chunks: {len(chunks)}  queries: {len(queries)}  k: {args.k}")
+        print(f"bm25 build: {build_ms:.0f} ms")
+        print(f"{'mode':>7}  {'hit@k':>6}  {'p50 ms':>7}  {'p95 ms':>7}")
+
+        for name, fn in modes.items():
+            hit, p50, p95 = measure(fn, queries, args.k)
+            print(f"{name:>7}  {hit:>6.3f}  {p50:>7.2f}  {p95:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# scripts/bench_retrievers.py
+# 検索 backend（faiss / chroma / numpy）の比較ベンチマーク
+#
+# - ingest スループット（rows/s、embedding 済みベクトルの書き込みのみ）
+# - 検索レイテンシ p50 / p95（ms）
+# - メモリ増分（RSS, MB、backend ごとに別プロセスで計測）
+#
+# 使い方:
+#   python -m scripts.bench_retrievers [--n 20000] [--queries 200] [--fake]
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from rag.chunk import split_text
+from rag.embedding import EMBED_DIM, encode
+from rag.retriever import ChromaRetriever, FaissRetriever, NumpyRetriever
+
+CORPUS_DIR = Path("data/esp32")
+
+
+def make_retriever(backend: str, workdir: Path):
+    if backend == "faiss":
+        from rag.vector_store import VectorStore
+
+        return FaissRetriever(
+            store=VectorStore(
+                index_path=workdir / "faiss.index",
+                meta_path=workdir / "meta.sqlite3",
+                checkpoint_every=None,
+            )
+        )
+    if backend == "chroma":
+        return ChromaRetriever(path=str(workdir / "chroma"), collection_name="bench")
+    if backend == "numpy":
+        return NumpyRetriever()
+    raise ValueError(backend)
+
+
+def load_items(n: int):
+    items = []
+    for path in sorted(CORPUS_DIR.rglob("*")):
+        if path.suffix.lower() not in {".md", ".txt"}:
+            continue
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        for c in split_text(text=text, source=path.name):
+            items.append({"text": c.text, "source": c.source, "chunk_index": c.index})
+
+    out = []
+    rep = 0
+    while len(out) < n:
+        # 繰り返し分は chunk_index をずらして id を一意にする
+        out.extend(
+            dict(it, chunk_index=it["chunk_index"] + rep * 1_000_000)
+            for it in items
+        )
+        rep += 1
+    return out[:n]
+
+
+def rss_mb() -> float:
+    statm = Path("/proc/self/statm")
+    if statm.exists():
+        pages = int(statm.read_text().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    # /proc が無い環境はピーク値で代用（Linux 以外は単位が異なる場合あり）
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend, items, vecs, queries, k, batch_size, out):
+    with tempfile.TemporaryDirectory() as d:
+        base_mem = rss_mb()
+        r = make_retriever(backend, Path(d))
+
+        t0 = time.perf_counter()
+        for i in range(0, len(items), batch_size):
+            r.add(items[i:i + batch_size], embeddings=vecs[i:i + batch_size])
+        r.flush()
+        ingest_s = time.perf_counter() - t0
+
+        lat = []
+        for q in queries:
+            t0 = time.perf_counter()
+            r.search_by_vector(q, k)
+            lat.append((time.perf_counter() - t0) * 1000)
+
+        out.put({
+            "backend": backend,
+            "rows_per_s": len(items) / ingest_s,
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "mem_mb": rss_mb() - base_mem,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    # hybrid の search_by_vector は faiss と同一のため対象外
+    parser.add_argument("--backends", default="faiss,chroma,numpy")
+    parser.add_argument(
+        "--fake",
+        action="store_true",
+        help="embedding モデルを使わず乱数ベクトルで計測する",
+    )
+    args = parser.parse_args()
+
+    items = load_items(args.n)
+    if args.fake:
+        rng = np.random.default_rng(0)
+        vecs = rng.standard_normal((len(items), EMBED_DIM)).astype(np.float32)
+    else:
+        vecs = encode([it["text"] for it in items], batch_size=64)
+
+    rng = np.random.default_rng(1)
+    queries = vecs[rng.choice(len(vecs), size=args.queries, replace=False)]
+
+    print(f"rows: {len(items)}  queries: {len(queries)}  k: {args.k}")
+    print(f"{'backend':>8}  {'rows/s':>10}  {'p50 ms':>8}  {'p95 ms':>8}  {'mem MB':>8}")
+
+    ctx = mp.get_context("spawn")
+    for backend in args.backends.split(","):
+        out = ctx.Queue()
+        p = ctx.Process(
+            target=run_backend,
+            args=(backend, items, vecs, queries, args.k, args.batch_size, out),
+        )
+        p.start()
+        p.join()
+
+        if p.exitcode != 0:
+            print(f"{backend:>8}  (failed, exit code {p.exitcode})")
+            continue
+
+        r = out.get()
+        print(
+            f"{r['backend']:>8}  {r['rows_per_s']:>10.0f}  {r['p50_ms']:>8.3f}  "
+            f"{r['p95_ms']:>8.3f}  {r['mem_mb']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# scripts/bench_score_chunks.py
+# チャンク重要度スコアのスループット比較（chunks/s）
+#
+#   legacy : チャンクごとにキーワードリストを作り直して any() で判定する旧 score_chunk
+#            （scripts.bench_chunking.legacy_score_chunk）
+#   batch  : rag.chunk.score_chunks（data/chunk_scoring.yaml の設定をまとめて適用）
+#
+# 使い方:
+#   python -m scripts.bench_score_chunks [--mb 8] [--batch 64]
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from rag.chunk import get_scorer, score_chunks
+from scripts.bench_chunking import legacy_score_chunk, load_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=8.0, help="コーパスのサイズ [MB]")
+    parser.add_argument("--batch", type=int, default=64, help="score_chunks に渡す件数")
+    args = parser.parse_args()
+
+    text = load_corpus(args.mb)
+    # 旧 split_text 相当の 500 文字チャンク
+    texts = [text[i:i + 500] for i in range(0, len(text), 400)]
+    get_scorer()  # YAML の読み込みは計測に含めない
+
+    t0 = time.perf_counter()
+    legacy = [legacy_score_chunk(t) for t in texts]
+    legacy_sec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = np.concatenate([
+        score_chunks(texts[i:i + args.batch]) for i in range(0, len(texts), args.batch)
+    ])
+    batch_sec = time.perf_counter() - t0
+
+    diff = float(np.abs(np.asarray(legacy) - batch).max())
+    print(f"chunks: {len(texts)}  batch: {args.batch}  max |diff|: {diff:.2e}")
+    print(f"legacy : {len(texts) / legacy_sec:>12.0f} chunks/s")
+    print(f"batch  : {len(texts) / batch_sec:>12.0f} chunks/s  (x{legacy_sec / batch_sec:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# scripts/bench_validate.py
+# 検証エンジンのスループット比較（validations/s）
+#
+#   legacy : validator ごとに re をその都度コンパイル・前処理をやり直す旧実装
+#   engine checks : rag.core.evaluate（コンパイル済み regex + 前処理 1 回 + check の重複排除）
+#                   rules.yaml の評価は外して legacy と同じ check だけ
+#   engine + yaml : rag.core.evaluate（rules.yaml の must_include / forbid も評価する既定の動作）
+#
+# 使い方:
+#   python -m scripts.bench_validate [--n 2000] [--size 8000]
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+
+from rag.core import _analyze_cached, evaluate
+from rag.rule_engine import RuleMatcher
+
+RULE_KEYS = ["common", "i2c_spi", "require_citation", "rag_confidence"]
+
+
+# ---- 旧実装（比較用にそのまま残す） ----
+def _legacy_has_cpp_block(text):
+    return re.search(r"```cpp([\s\S]*?)```", text, re.IGNORECASE) is not None
+
+
+def _legacy_strip(text):
+    return re.sub(r"//.*", "", text)
+
+
+def _legacy_wire(text):
+    return re.search(r"\bwire\.begin\s*\(\s*\)", _legacy_strip(text), re.I) is not None
+
+
+def _legacy_spi(text):
+    return re.search(r"\bspi\.begin\s*\(\s*\)", _legacy_strip(text), re.I) is not None
+
+
+def _legacy_citations(text):
+    return re.findall(r"\[source:\s*([^\]]+)\]", text)
+
+
+def legacy_validate(text, rag_scores):
+    errors = []
+    # validate_common は cli / rule validator の両方から呼ばれていた
+    for _ in range(2):
+        if not _legacy_has_cpp_block(text):
+            errors.append("cpp")
+    if not _legacy_wire(text):
+        errors.append("i2c")
+    if not _legacy_spi(text):
+        errors.append("spi")
+    if not _legacy_citations(text):
+        errors.append("citation")
+    if not rag_scores or max(rag_scores) < 0.25:
+        errors.append("rag_confidence")
+    return errors
+
+
+def make_outputs(n: int, size: int, seed: int = 0):
+    rnd = random.Random(seed)
+    lines = [
+        "// I2C と SPI を初期化します",
+        "Wire.begin();",
+        "SPI.begin();",
+        "// Wire.begin(); は setup() で 1 回だけ",
+        "digitalWrite(LED_BUILTIN, HIGH);",
+        "delay(100);",
+        "ESP32 の GPIO21/22 は I2C のデフォルトピンです。",
+        "[source: esp32_i2c.md#3]",
+    ]
+    outputs = []
+    for i in range(n):
+        body = []
+        while sum(len(x) + 1 for x in body) < size:
+            body.append(rnd.choice(lines))
+        # 多様な LLM 出力になるよう毎回ユニークにする
+        outputs.append(f"回答 {i}\n```cpp\n" + "\n".join(body) + "\n```\n")
+    return outputs
+
+
+def bench(fn, outputs):
+    t0 = time.perf_counter()
+    for text in outputs:
+        fn(text)
+    return len(outputs) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=8000, help="1 出力あたりの文字数")
+    args = parser.parse_args()
+
+    outputs = make_outputs(args.n, args.size)
+    scores = [0.4, 0.2]
+
+    # 結果が一致することを先に確認
+    for text in outputs[:50]:
+        legacy = set(legacy_validate(text, scores))
+        engine = {r.rule for r in evaluate(text, RULE_KEYS, rag_scores=scores)}
+        assert ("i2c" in legacy) == ("i2c" in engine)
+        assert ("spi" in legacy) == ("spi" in engine)
+
+    _analyze_cached.cache_clear()
+    legacy = bench(lambda t: legacy_validate(t, scores), outputs)
+    # legacy と同じ check だけ（rules.yaml の must_include / forbid なし）
+    no_yaml = RuleMatcher({})
+    checks = bench(lambda t: evaluate(t, RULE_KEYS, matcher=no_yaml, rag_scores=scores), outputs)
+    _analyze_cached.cache_clear()
+    engine = bench(lambda t: evaluate(t, RULE_KEYS, rag_scores=scores), outputs)
+
+    print(f"outputs: {args.n}  size: {args.size} chars")
+    print(f"legacy        : {legacy:>10.0f} validations/s")
+    print(f"engine checks : {checks:>10.0f} validations/s  (x{checks / legacy:.2f})")
+    print(f"engine + yaml : {engine:>10.0f} validations/s  (x{engine / legacy:.2f})")
+
+
+if __name__ == "__main__":
+    main()
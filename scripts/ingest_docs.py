@@ -1,85 +1,77 @@
+import argparse
 from pathlib import Path
-from docx import Document
-import chromadb
-from sentence_transformers import SentenceTransformer
+
+from rag.chroma_config import CHROMA_COLLECTION, CHROMA_PATH
+from rag.embed_cache import get_cache
+from rag.ingest.loader import iter_documents
+from rag.ingest.manifest import MANIFEST_NAME, IngestManifest, run_incremental
 
 # =========================
 # 設定
 # =========================
 DOCS_DIR = Path("data/docs")
-CHROMA_PATH = "C:/ollama/rag/chroma"
-COLLECTION_NAME = "docs_collection"
-
-CHUNK_SIZE = 500
-OVERLAP = 100
+# Chroma の保存先・collection は検索側と共通（RAG_CHROMA_PATH / RAG_CHROMA_COLLECTION）
 
 # =========================
 # utils
 # =========================
-def load_docx(path: Path) -> str:
-    doc = Document(path)
-    lines = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-    return "\n".join(lines)
-
-def chunk_text(text: str):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + CHUNK_SIZE
-        chunks.append(text[start:end])
-        start = end - OVERLAP
-    return chunks
+def iter_docx(base: Path):
+    """
+    DOCS_DIR 配下の .docx（metadata は従来どおり source / path）
+    """
+    for doc in iter_documents(base):
+        if doc["ext"] != ".docx":
+            continue
+        path = doc["path"]
+        yield {**doc, "meta": {"source": path.name, "path": str(path)}}
 
 # =========================
 # main
 # =========================
 def main():
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
-
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    total_added = 0
-
-    for docx_path in DOCS_DIR.glob("**/*.docx"):
-        text = load_docx(docx_path)
-        if not text.strip():
-            continue
-
-        chunks = chunk_text(text)
-        embeddings = model.encode(chunks, show_progress_bar=False)
-
-        ids = [f"{docx_path.stem}-{i}" for i in range(len(chunks))]
-
-        # 既存ID除外（再実行安全）
-        existing = set(collection.get(ids=ids)["ids"])
-        new_items = [
-            (i, chunks[i], embeddings[i])
-            for i in range(len(ids))
-            if ids[i] not in existing
-        ]
-
-        if not new_items:
-            continue
-
-        collection.add(
-            documents=[x[1] for x in new_items],
-            embeddings=[x[2] for x in new_items],
-            ids=[ids[x[0]] for x in new_items],
-            metadatas=[
-                {
-                    "source": docx_path.name,
-                    "path": str(docx_path),
-                    "chunk_id": x[0],
-                }
-                for x in new_items
-            ],
-        )
-
-        total_added += len(new_items)
-        print(f"✔ {docx_path.name}: +{len(new_items)}")
-
-    print(f"\n=== DONE: added {total_added} chunks ===")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="差分を表示するだけで書き込まない")
+    args = parser.parse_args()
+
+    # 前回から変わっていないファイルは開かない / 消えたファイルのチャンクは削除する
+    manifest = IngestManifest(Path(CHROMA_PATH) / MANIFEST_NAME)
+
+    sink = None
+    if not args.dry_run:
+        from rag.ingest.vectorize import ChromaSink
+
+        sink = ChromaSink(CHROMA_PATH, CHROMA_COLLECTION)
+
+    delta, result = run_incremental(
+        iter_docx(DOCS_DIR), DOCS_DIR, sink, manifest, dry_run=args.dry_run
+    )
+
+    for label, paths in (("+", delta.added), ("~", delta.modified), ("-", delta.deleted)):
+        for p in paths:
+            print(f"{label} {Path(p).name}")
+
+    d = delta.as_dict()
+    print(
+        f"\n=== {'DRY RUN' if args.dry_run else 'DONE'}: "
+        f"added {d['added']} / modified {d['modified']} / deleted {d['deleted']} files, "
+        f"unchanged {d['unchanged'] + d['touched']} ==="
+    )
+    if result is None:
+        return
+
+    written = sink.stats()
+    print(
+        f"chunks written: {result.rows} "
+        f"({written['rows_per_sec']:.0f} rows/s, {written['batches']} upserts)"
+    )
+    for path, error in result.failures:
+        print(f"[SKIP] {path}: {error}")
+
+    stats = get_cache().stats()
+    print(
+        f"embedding cache: hits={stats['hits']} misses={stats['misses']} "
+        f"hit_rate={stats['hit_rate']:.1%} entries={stats['entries']}"
+    )
 
 if __name__ == "__main__":
     main()
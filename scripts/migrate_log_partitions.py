@@ -0,0 +1,112 @@
+# scripts/migrate_log_partitions.py
+# 旧形式の単一ログ（logs/validation_errors.jsonl と ローテーション済み .gz）を
+# 日付パーティション logs/validation_errors/YYYY-MM-DD.jsonl に振り分ける
+#
+# 使い方:
+#   python -m scripts.migrate_log_partitions [--dry-run] [--delete]
+#
+# 移行済みのファイルは <name>.migrated にリネームする（--delete なら削除）。
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+from collections import Counter
+from pathlib import Path
+
+from rag.core import LOG_DIR, LOG_PATH
+from rag.log_partitions import PartitionManifest, partition_name
+
+# 1 パーティションあたりこの行数たまったら書き出す
+FLUSH_LINES = 10_000
+
+
+def legacy_files(log_path: Path):
+    # ローテーション済みセグメント（古い順）→ 現行ファイル
+    segs = sorted(log_path.parent.glob(f"{log_path.stem}.*{log_path.suffix}*"))
+    segs = [s for s in segs if not s.name.endswith((".migrated", ".sqlite3"))]
+    return segs + ([log_path] if log_path.exists() else [])
+
+
+def open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open(encoding="utf-8")
+
+
+def migrate(files, log_dir: Path, dry_run: bool = False) -> Counter:
+    counts: Counter = Counter()
+    buffers = {}
+
+    def flush(name):
+        lines = buffers.pop(name, [])
+        if lines and not dry_run:
+            with (log_dir / name).open("a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    if not dry_run:
+        log_dir.mkdir(parents=True, exist_ok=True)
+
+    for path in files:
+        with open_text(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    ts = json.loads(line)["ts"]
+                except (ValueError, KeyError, TypeError):
+                    counts["(skipped)"] += 1
+                    continue
+
+                name = partition_name(ts)
+                if not line.endswith("\n"):
+                    line += "\n"
+                buffers.setdefault(name, []).append(line)
+                counts[name] += 1
+
+                if len(buffers[name]) >= FLUSH_LINES:
+                    flush(name)
+
+    for name in list(buffers):
+        flush(name)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", type=Path, default=LOG_PATH)
+    parser.add_argument("--dst", type=Path, default=LOG_DIR)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--delete", action="store_true", help="移行元を削除する")
+    args = parser.parse_args()
+
+    files = legacy_files(args.src)
+    if not files:
+        print(f"(nothing to migrate: {args.src})")
+        return
+
+    counts = migrate(files, args.dst, dry_run=args.dry_run)
+
+    for name, n in sorted(counts.items()):
+        if name != "(skipped)":
+            print(f"{name:>20}  {n:>8}")
+    skipped = counts.pop("(skipped)", 0)
+    print(f"files: {len(files)}  records: {sum(counts.values())}  skipped: {skipped}")
+
+    if args.dry_run:
+        print("(dry run: nothing written)")
+        return
+
+    m = PartitionManifest(args.dst)
+    m.refresh()
+    print(f"manifest: {m.path} ({len(m.partitions)} partitions)")
+
+    for f in files:
+        if args.delete:
+            f.unlink()
+        else:
+            f.rename(f.with_name(f.name + ".migrated"))
+
+
+if __name__ == "__main__":
+    main()
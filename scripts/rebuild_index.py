@@ -0,0 +1,41 @@
+# scripts/rebuild_index.py
+# 既存の data/vector/faiss.index を指定した index 種別へ作り直す
+#
+# 使い方:
+#   python -m scripts.rebuild_index --kind auto
+#   python -m scripts.rebuild_index --kind ivf_pq
+from __future__ import annotations
+
+import argparse
+import time
+
+from rag.vector_store import INDEX_KINDS, VectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--kind",
+        default="auto",
+        choices=("auto",) + INDEX_KINDS,
+    )
+    args = parser.parse_args()
+
+    store = VectorStore(index_kind=args.kind)
+    before = store.current_kind
+    n = len(store)
+
+    if n == 0:
+        print("(index is empty, nothing to rebuild)")
+        return
+
+    t0 = time.perf_counter()
+    store.rebuild()
+    store.flush()
+    elapsed = time.perf_counter() - t0
+
+    print(f"[REBUILD] {before} → {store.current_kind} ({n} vectors, {elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
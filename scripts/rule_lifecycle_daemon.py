@@ -0,0 +1,56 @@
+# scripts/rule_lifecycle_daemon.py
+# 自動昇格 / 降格を 1 プロセスで常駐実行する
+#
+# interval ごとにログの追記分だけを集計に取り込み、昇格 → 降格を判定して
+# rules.yaml をアトミックに書き換える（_meta.version が増える）。
+# 動作中の validator（rag.core.get_rules / rag.rule_engine）は再起動なしで新しいルールを読む。
+#
+# 使い方:
+#   python -m scripts.rule_lifecycle_daemon [--interval 60] [--once]
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime
+from pathlib import Path
+
+from rag.log_analytics import LogAnalytics
+from rag.rule_lifecycle import run_once
+
+# 日付パーティション（logs/validation_errors/YYYY-MM-DD.jsonl）
+LOG_DIR = Path("logs/validation_errors")
+RULE_FILE = Path("data/rules/rules.yaml")
+
+INTERVAL_SEC = 60.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=float, default=INTERVAL_SEC)
+    parser.add_argument("--once", action="store_true", help="1 回だけ実行して終了する")
+    args = parser.parse_args()
+
+    print(f"[lifecycle] watching {LOG_DIR} → {RULE_FILE} (every {args.interval:.0f}s)")
+
+    with LogAnalytics(LOG_DIR) as la:
+        while True:
+            started = time.monotonic()
+            try:
+                version, changes = run_once(la, RULE_FILE)
+            except TimeoutError as e:
+                # 他のジョブが rules.yaml をロック中 → 次の周期で再試行
+                print(f"[lifecycle] {e}")
+            else:
+                for line in changes:
+                    print(line)
+                if version is not None:
+                    stamp = datetime.now().isoformat(timespec="seconds")
+                    print(f"[lifecycle] {stamp} rules.yaml updated (version {version})", flush=True)
+
+            if args.once:
+                return
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ REM ===== auto demote rules =====
 cd /d C:\ollama\rag
 
 "C:\Users\prest\AppData\Local\Programs\Python\Python311\python.exe" ^
-  scripts\auto_demote_rules.py ^
+  -m scripts.auto_demote_rules ^
   >> logs\demote_task.log 2>&1
 
 exit /b %ERRORLEVEL%
@@ -0,0 +1,10 @@
+@echo off
+REM ===== rule lifecycle daemon (auto promote + demote) =====
+
+cd /d C:\ollama\rag
+
+"C:\Users\prest\AppData\Local\Programs\Python\Python311\python.exe" ^
+  -m scripts.rule_lifecycle_daemon ^
+  >> logs\lifecycle_daemon.log 2>&1
+
+exit /b %ERRORLEVEL%
@@ -0,0 +1,41 @@
+# tests/test_bm25.py
+from rag.bm25 import BM25Index, rrf_fuse, tokenize
+
+
+def test_tokenize_c_identifiers():
+    toks = tokenize("ledc_channel_config(&ch); Wire.begin(21, 22);")
+    assert "ledc_channel_config" in toks
+    assert "channel" in toks
+    assert "wire.begin" in toks
+    assert "begin" in toks
+    assert "21" in toks
+
+
+def test_tokenize_japanese_bigrams():
+    assert tokenize("割り込み") == ["割り", "り込", "込み"]
+
+
+def test_exact_identifier_ranks_first():
+    idx = BM25Index()
+    idx.add(0, "I2C の初期化には Wire.begin() を呼ぶ")
+    idx.add(1, "LEDC の設定は ledc_channel_config で行う")
+    idx.add(2, "GPIO 割り込みの設定例")
+
+    assert idx.search("ledc_channel_config の使い方", k=1)[0][0] == 1
+    assert idx.search("Wire.begin", k=1)[0][0] == 0
+
+
+def test_remove_and_readd():
+    idx = BM25Index()
+    idx.add("a", "spi.begin")
+    idx.add("b", "wire.begin")
+    idx.remove("a")
+
+    assert idx.search("spi") == []
+    assert [d for d, _ in idx.search("spi.begin")] == ["b"]
+    assert len(idx) == 1
+
+
+def test_rrf_fuse_prefers_items_in_both_lists():
+    fused = rrf_fuse([[1, 2, 3], [3, 4]])
+    assert fused[0][0] == 3
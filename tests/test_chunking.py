@@ -0,0 +1,146 @@
+# tests/test_chunking.py
+import io
+
+import numpy as np
+import pytest
+
+from rag import chunk as chunk_mod
+from rag.chunk import (
+    approx_token_counts,
+    char_counts,
+    iter_blocks,
+    iter_chunks,
+    iter_chunks_many,
+    score_chunk,
+    score_chunks,
+    split_sentences,
+    split_text,
+)
+from rag.ingest.chunker import chunk_text
+
+DOC = (
+    "# 概要\n"
+    "ESP32 は I2C を持つ。SPI もある。電圧は 3.3V です. Wire.begin() で初期化する.\n"
+    "\n"
+    "```cpp\n"
+    "#include <Wire.h>\n"
+    "\n"
+    "void setup() { Wire.begin(); }\n"
+    "```\n"
+    "\n"
+    "## 配線\n"
+    "GPIO21 が SDA、GPIO22 が SCL。\n"
+)
+
+
+def test_sentence_boundaries():
+    assert split_sentences("I2C を持つ。SPI もある。") == ["I2C を持つ。", "SPI もある。"]
+    # 小数やメソッド呼び出しの . では切らない
+    assert split_sentences("電圧は 3.3V です. Wire.begin() を呼ぶ.") == [
+        "電圧は 3.3V です. ",
+        "Wire.begin() を呼ぶ.",
+    ]
+
+
+def test_offsets_match_source():
+    chunks = split_text(DOC * 20, "doc.md", max_tokens=40, overlap_tokens=8)
+    assert len(chunks) > 1
+    for i, c in enumerate(chunks):
+        assert c.index == i
+        assert (DOC * 20)[c.start:c.end] == c.text
+
+
+def test_headings_and_fences_are_kept():
+    chunks = split_text(DOC, "doc.md", max_tokens=60, overlap_tokens=0)
+
+    # 見出しの前で必ず区切る
+    assert chunks[-1].text.startswith("## 配線")
+    # コードブロックは途中で切らない
+    fenced = [c.text for c in chunks if "```cpp" in c.text]
+    assert len(fenced) == 1
+    assert "void setup() { Wire.begin(); }\n```" in fenced[0]
+
+
+def test_budget_is_respected():
+    text = "長い段落です。" * 500 + "\n\n```cpp\n" + "delay(1);\n" * 300 + "```\n"
+    for c in iter_chunks(text, max_tokens=50, overlap_tokens=10, count_tokens=approx_token_counts):
+        assert approx_token_counts([c.text])[0] <= 50
+
+
+def test_overlap_carries_tail_sentences():
+    text = "".join(f"文{i:03d}です。" for i in range(40))
+    chunks = split_text(text, "x", max_tokens=30, overlap_tokens=10)
+    assert len(chunks) > 1
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur.start < prev.end
+
+
+def test_line_iterator_input_matches_string():
+    text = DOC * 5
+    a = [(c.start, c.text) for c in iter_chunks(text, max_tokens=40)]
+    b = [(c.start, c.text) for c in iter_chunks(io.StringIO(text), max_tokens=40)]
+    assert a == b
+
+
+def test_blocks_from_small_reads_match_string(monkeypatch):
+    # 読み込み単位の境目が見出し・フェンス・段落の途中に来ても同じブロックになる
+    text = DOC * 3 + "```\n閉じていない\n"
+    expected = list(iter_blocks(text))
+    assert [k for k, _, _ in expected[:5]] == ["heading", "text", "code", "text", "heading"]
+    for size in (1, 7, 64):
+        monkeypatch.setattr(chunk_mod, "SCAN_CHARS", size)
+        assert list(iter_blocks(io.StringIO(text))) == expected
+    assert "".join(b for _, b, _ in expected) == text
+
+
+def test_iter_chunks_many_matches_per_document():
+    docs = [(DOC * 3, "a.md"), ("", "empty.md"), ("短い。", "b.md"), (DOC, "c.md")]
+    got = list(iter_chunks_many(docs, max_tokens=40, overlap_tokens=8, count_tokens=approx_token_counts))
+    expected = [
+        (i, c)
+        for i, (text, source) in enumerate(docs)
+        for c in iter_chunks(text, source, max_tokens=40, overlap_tokens=8, count_tokens=approx_token_counts)
+    ]
+    assert got == expected
+    assert {i for i, _ in got} == {0, 2, 3}
+
+
+def test_approx_token_counts_batch_matches_single():
+    texts = ["", "abc def", "日本語です。", "GPIO21 は SDA", "x" * 100, "", "a\nb\tc", "Wire.begin();"] * 4
+    assert len(texts) >= chunk_mod._APPROX_NUMPY_MIN
+    assert approx_token_counts(texts) == [approx_token_counts([t])[0] for t in texts]
+
+
+def test_chunk_text_max_chars():
+    chunks = chunk_text(DOC * 10, max_chars=120)
+    assert [c["chunk_id"] for c in chunks] == list(range(len(chunks)))
+    assert all(len(c["text"]) <= 120 for c in chunks)
+    assert char_counts(["abc"]) == [3]
+
+
+def test_score_chunks_default_weights(tmp_path):
+    texts = [
+        "短いメモ",                            # 0.1 - 0.2 → 0.0
+        "I2C の仕様" + "。" * 250,             # 0.2 + 0.4
+        "手順\n- SPI を使う\n- TODO" + "x" * 400,  # 0.3 + 0.4 + 0.1 - 0.2
+        "",
+    ]
+    scores = score_chunks(texts, path=tmp_path / "missing.yaml")
+    assert isinstance(scores, np.ndarray)
+    assert scores.shape == (4,)
+    assert scores == pytest.approx([0.0, 0.6, 0.6, 0.1])
+    assert score_chunk(texts[1]) == pytest.approx(0.6)
+
+
+def test_score_chunks_yaml_config(tmp_path):
+    path = tmp_path / "scoring.yaml"
+    path.write_text(
+        "length:\n"
+        "  base: 0.0\n"
+        "groups:\n"
+        "  pins:\n"
+        "    weight: 0.5\n"
+        "    keywords: [GPIO, sda]\n",
+        encoding="utf-8",
+    )
+    assert score_chunks(["gpio21", "SDA", "I2C"], path=path).tolist() == [0.5, 0.5, 0.0]
@@ -80,3 +80,61 @@ def test_cli_unknown_rule():
     )
     assert result.returncode == 2
     assert "unknown rule" in result.stderr.lower()
+
+
+def test_cli_batch_jsonl_dir():
+    result = run_cli([str(DATA_DIR), "--jsonl"])
+    assert result.returncode == 1
+
+    lines = [json.loads(x) for x in result.stdout.splitlines()]
+    records, summary = lines[:-1], lines[-1]["summary"]
+
+    assert {Path(r["path"]).name for r in records} >= {
+        "valid_i2c_spi.txt",
+        "invalid_no_wire_begin.txt",
+    }
+    assert summary["files"] == len(records)
+    assert summary["ok"] + summary["ng"] + summary["error"] == summary["files"]
+
+
+def test_cli_batch_glob_all_ok():
+    result = run_cli([str(DATA_DIR / "valid_*.txt"), str(DATA_DIR / "valid_i2c_spi.txt")])
+    assert result.returncode == 0
+    assert "[SUMMARY] files: 1" in result.stdout
+
+
+def test_cli_batch_pool_matches_sequential(tmp_path):
+    from rag import cli
+
+    src = (DATA_DIR / "invalid_no_spi_begin.txt").read_text(encoding="utf-8")
+    files = []
+    for i in range(cli.POOL_MIN_FILES + 3):
+        p = tmp_path / f"{i:03d}.txt"
+        p.write_text(src, encoding="utf-8")
+        files.append(p)
+
+    seq = list(cli.iter_batch_results(files, workers=1))
+    par = list(cli.iter_batch_results(files, workers=2))
+    assert par == seq
+
+
+def test_cli_stdin_stream_json():
+    text = (DATA_DIR / "valid_i2c_spi.txt").read_text(encoding="utf-8")
+    result = subprocess.run(
+        BASE_CMD + ["--stdin", "--stream", "--json"],
+        input=text,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    assert json.loads(result.stdout)["status"] == "ok"
+
+
+def test_cli_i2c_follows_check_not_yaml_literals(tmp_path):
+    # wire.begin( ) は i2c の check を通る（rules.yaml の Wire.begin() / Serial.begin は要求しない）
+    path = tmp_path / "lower.txt"
+    path.write_text("```cpp\n#include <Wire.h>\nvoid setup() { wire.begin( ); }\n```\n", encoding="utf-8")
+
+    result = run_cli([str(path), "--rule", "i2c", "--json"])
+    assert result.returncode == 0
+    assert json.loads(result.stdout) == {"status": "ok", "rule": "i2c", "errors": []}
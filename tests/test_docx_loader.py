@@ -0,0 +1,61 @@
+# tests/test_docx_loader.py
+import zipfile
+
+import pytest
+
+from rag.ingest.docx_loader import iter_docx_blocks, load_docx_text
+
+docx = pytest.importorskip("docx")
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def test_paragraphs_and_tables_in_document_order(tmp_path):
+    doc = docx.Document()
+    doc.add_paragraph("  ピン配置  ")
+    doc.add_paragraph("")
+    table = doc.add_table(rows=2, cols=3)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = ["GPIO", "電圧", "判定"][c] if r == 0 else ["GPIO4", "3.3V", "OK"][c]
+    table.rows[1].cells[2].add_paragraph("(実測)")
+    doc.add_paragraph("以上。")
+    path = tmp_path / "pins.docx"
+    doc.save(str(path))
+
+    assert list(iter_docx_blocks(path)) == [
+        "ピン配置",
+        "GPIO | 電圧 | 判定",
+        "GPIO4 | 3.3V | OK (実測)",
+        "以上。",
+    ]
+
+
+def test_matches_python_docx_paragraphs(tmp_path):
+    doc = docx.Document()
+    for i in range(50):
+        doc.add_paragraph(f"第{i}条 本文。")
+    path = tmp_path / "plain.docx"
+    doc.save(str(path))
+
+    expected = "\n".join(p.text.strip() for p in docx.Document(str(path)).paragraphs if p.text.strip())
+    assert load_docx_text(path) == expected
+
+
+def test_tabs_breaks_and_alternate_content(tmp_path):
+    # テキストボックスは Choice と Fallback に二重に入っている → 1 回だけ読む
+    body = (
+        f'<w:document xmlns:w="{W_NS}" '
+        'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"><w:body>'
+        "<w:p><w:r><w:t>A</w:t><w:tab/><w:t>B</w:t><w:br/><w:t>C</w:t></w:r></w:p>"
+        "<w:p><w:r><mc:AlternateContent>"
+        "<mc:Choice><w:txbxContent><w:p><w:r><w:t>箱</w:t></w:r></w:p></w:txbxContent></mc:Choice>"
+        "<mc:Fallback><w:txbxContent><w:p><w:r><w:t>箱</w:t></w:r></w:p></w:txbxContent></mc:Fallback>"
+        "</mc:AlternateContent></w:r><w:r><w:t>外</w:t></w:r></w:p>"
+        "</w:body></w:document>"
+    )
+    path = tmp_path / "raw.docx"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("word/document.xml", body)
+
+    assert list(iter_docx_blocks(path)) == ["A\tB\nC", "箱\n外"]
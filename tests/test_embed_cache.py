@@ -0,0 +1,108 @@
+# tests/test_embed_cache.py
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from rag import embed_cache
+from rag.embed_cache import EmbeddingCache, cache_key, cached_encode
+
+MODEL = "test-model"
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_cache_key_normalizes_text():
+    assert cache_key(MODEL, "abc\r\ndef") == cache_key(MODEL, "abc\ndef")
+    # NFC（結合文字の「が」と合成済みの「が」）
+    assert cache_key(MODEL, "か\u3099") == cache_key(MODEL, "が")
+    assert cache_key(MODEL, "abc") != cache_key("other-model", "abc")
+
+
+def test_cache_key_keeps_whitespace():
+    # 空白は encode 結果を変えうるので別のキーにする
+    assert cache_key(MODEL, "abc \n") != cache_key(MODEL, "abc\n")
+    assert cache_key(MODEL, "  abc") != cache_key(MODEL, "abc")
+
+
+def test_cached_encode_empty_keeps_dim(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3")
+    enc = FakeEncoder()
+
+    assert cached_encode([], MODEL, enc, cache=cache, dim=2).shape == (0, 2)
+    assert cached_encode([], MODEL, enc, cache=cache).shape == (0, embed_cache.EMBED_DIM)
+    assert enc.calls == []
+
+
+def test_cached_encode_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3")
+    enc = FakeEncoder()
+
+    first = cached_encode(["a", "bb", "a"], MODEL, enc, cache=cache)
+    assert enc.calls == [["a", "bb"]]
+    assert first.shape == (3, 2)
+    assert cache.misses == 3
+
+    second = cached_encode(["bb", "a"], MODEL, enc, cache=cache)
+    assert len(enc.calls) == 1
+    assert cache.hits == 2
+    np.testing.assert_array_equal(second, first[[1, 0]])
+
+
+def test_cache_persists_and_evicts_lru(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path, max_entries=2)
+    enc = FakeEncoder()
+
+    cached_encode(["a"], MODEL, enc, cache=cache)
+    cached_encode(["b"], MODEL, enc, cache=cache)
+    cached_encode(["a"], MODEL, enc, cache=cache)  # a を最近使用に
+    cached_encode(["c"], MODEL, enc, cache=cache)  # b が追い出される
+    cache.close()
+
+    reopened = EmbeddingCache(path, max_entries=2)
+    keys = [cache_key(MODEL, t) for t in ("a", "b", "c")]
+    found = reopened.get_many(keys)
+    assert set(found) == {keys[0], keys[2]}
+
+
+def test_lru_touches_are_batched(tmp_path, monkeypatch):
+    monkeypatch.setattr(embed_cache, "TOUCH_FLUSH_EVERY", 3)
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3")
+    enc = FakeEncoder()
+    cached_encode(["a", "b", "c"], MODEL, enc, cache=cache)
+
+    commits = []
+    cache._connect().set_trace_callback(
+        lambda sql: commits.append(sql) if sql.startswith("COMMIT") else None
+    )
+
+    # ヒットのたびには書かない
+    cached_encode(["a"], MODEL, enc, cache=cache)
+    cached_encode(["b"], MODEL, enc, cache=cache)
+    assert commits == []
+
+    # TOUCH_FLUSH_EVERY 件たまったらまとめて 1 回
+    cached_encode(["c"], MODEL, enc, cache=cache)
+    assert len(commits) == 1
+
+
+def test_pending_touches_are_written_on_close(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path, max_entries=2)
+    enc = FakeEncoder()
+    cached_encode(["a"], MODEL, enc, cache=cache)
+    cached_encode(["b"], MODEL, enc, cache=cache)
+    cached_encode(["a"], MODEL, enc, cache=cache)  # a の LRU 更新はまだメモリ上
+    cache.close()
+
+    reopened = EmbeddingCache(path, max_entries=2)
+    cached_encode(["c"], MODEL, enc, cache=reopened)  # b が追い出される
+    keys = [cache_key(MODEL, t) for t in ("a", "b", "c")]
+    assert set(reopened.get_many(keys)) == {keys[0], keys[2]}
@@ -0,0 +1,177 @@
+# tests/test_ingest_manifest.py
+import os
+
+import numpy as np
+
+from rag.ingest.loader import iter_documents
+from rag.ingest.manifest import FileEntry, IngestManifest, run_incremental
+
+
+def fake_encode(texts):
+    return np.zeros((len(texts), 4), dtype="float32")
+
+
+class DictSink:
+    def __init__(self):
+        self.rows = {}
+
+    def write(self, records, vecs):
+        for r in records:
+            self.rows[r["id"]] = r
+        return len(records)
+
+    def delete_paths(self, paths):
+        paths = set(paths)
+        self.rows = {k: r for k, r in self.rows.items() if r["meta"]["path"] not in paths}
+
+    def paths(self):
+        return {r["meta"]["path"] for r in self.rows.values()}
+
+
+def run(base, sink, manifest, **kw):
+    return run_incremental(
+        iter_documents(base), base, sink, manifest,
+        workers=0, encode_fn=fake_encode, max_tokens=20, **kw,
+    )
+
+
+def test_incremental_skip_replace_delete(tmp_path):
+    base = tmp_path / "docs"
+    base.mkdir()
+    a, b, c = (base / "a.txt", base / "b.txt", base / "c.txt")
+    a.write_text("甲は乙に支払う。" * 10, encoding="utf-8")
+    b.write_text("契約期間は一年とする。", encoding="utf-8")
+    c.write_text("解約の通知。", encoding="utf-8")
+
+    sink = DictSink()
+    manifest = IngestManifest(tmp_path / "manifest.sqlite3")
+
+    delta, result = run(base, sink, manifest)
+    assert len(delta.added) == 3
+    assert sink.paths() == {str(a), str(b), str(c)}
+    assert len(manifest) == 3
+
+    # 変更なし → 抽出もしない
+    delta, result = run(base, sink, manifest)
+    assert delta.unchanged == 3
+    assert result.metrics["extract"].items_in == 0
+
+    # a を短くする（古いチャンクが残らない）、b は mtime だけ変える、c を消す
+    a.write_text("短い。", encoding="utf-8")
+    st = b.stat()
+    os.utime(b, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+    c.unlink()
+
+    delta, result = run(base, sink, manifest)
+    assert delta.modified == [str(a)]
+    assert delta.touched == 1
+    assert delta.deleted == [str(c)]
+    assert [r["text"] for r in sink.rows.values() if r["meta"]["path"] == str(a)] == ["短い。"]
+    assert sink.paths() == {str(a), str(b)}
+    assert len(manifest) == 2
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    base = tmp_path / "docs"
+    base.mkdir()
+    (base / "a.txt").write_text("本文。", encoding="utf-8")
+    manifest = IngestManifest(tmp_path / "manifest.sqlite3")
+
+    delta, result = run(base, None, manifest, dry_run=True)
+    assert result is None
+    assert delta.added == [str(base / "a.txt")]
+    assert len(manifest) == 0
+
+
+def test_failed_extraction_is_retried(tmp_path):
+    base = tmp_path / "docs"
+    base.mkdir()
+    (base / "broken.docx").write_bytes(b"not a zip")
+    sink = DictSink()
+    manifest = IngestManifest(tmp_path / "manifest.sqlite3")
+
+    run(base, sink, manifest)
+    assert len(manifest) == 0
+
+    delta, _ = run(base, sink, manifest)
+    assert delta.added == [str(base / "broken.docx")]
+
+
+def test_relative_and_absolute_base_share_entries(tmp_path, monkeypatch):
+    base = tmp_path / "docs"
+    base.mkdir()
+    (base / "a.txt").write_text("本文。", encoding="utf-8")
+    sink = DictSink()
+    manifest = IngestManifest(tmp_path / "manifest.sqlite3")
+    monkeypatch.chdir(tmp_path)
+
+    delta, _ = run("docs", sink, manifest)
+    assert delta.added == [str(base / "a.txt")]
+
+    # 絶対パスで実行し直しても同じファイル扱い（二重に入らない）
+    delta, _ = run(base, sink, manifest)
+    assert delta.unchanged == 1
+    assert (delta.added, delta.deleted) == ([], [])
+    assert sink.paths() == {str(base / "a.txt")}
+    assert len(manifest) == 1
+
+
+def test_entries_recorded_under_unresolved_root_are_replaced(tmp_path, monkeypatch):
+    base = tmp_path / "docs"
+    base.mkdir()
+    (base / "a.txt").write_text("本文。", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    # 以前は相対パスのまま記録していた
+    sink = DictSink()
+    sink.rows["docs/a.txt_0"] = {"id": "docs/a.txt_0", "text": "本文。", "meta": {"path": "docs/a.txt"}}
+    manifest = IngestManifest(tmp_path / "manifest.sqlite3")
+    manifest.record(FileEntry("docs/a.txt", "docs", 0, 0, "old"))
+
+    delta, _ = run("docs", sink, manifest)
+    assert delta.added == [str(base / "a.txt")]
+    assert delta.deleted == ["docs/a.txt"]
+    assert sink.paths() == {str(base / "a.txt")}
+    assert manifest.paths(str(base)) == {str(base / "a.txt")}
+    assert len(manifest) == 1
+
+
+class WhereCollection:
+    """
+    ChromaSink が使う upsert / delete(where={"path": {"$in": ...}}) だけを持つ偽 collection
+    """
+
+    def __init__(self, rows):
+        self.rows = dict(rows)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, d, m in zip(ids, documents, metadatas):
+            self.rows[i] = {"text": d, "meta": m}
+
+    def delete(self, where):
+        paths = set(where["path"]["$in"])
+        self.rows = {k: r for k, r in self.rows.items() if r["meta"]["path"] not in paths}
+
+
+def test_first_manifest_run_replaces_baseline_rows(tmp_path, monkeypatch):
+    from rag.ingest.vectorize import ChromaSink
+
+    base = tmp_path / "data" / "docs"
+    base.mkdir(parents=True)
+    (base / "X.txt").write_text("本文。", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    # マニフェスト導入前の行: 相対 path、id は scripts/ingest_docs.py の {stem}-{i}
+    # と store_in_chroma の {path}_{chunk_id}
+    col = WhereCollection({
+        "X-0": {"text": "旧", "meta": {"source": "X.txt", "path": "data/docs/X.txt", "chunk_id": 0}},
+        "X-1": {"text": "旧", "meta": {"source": "X.txt", "path": "data/docs/X.txt", "chunk_id": 1}},
+        "data/docs/X.txt_0": {"text": "旧", "meta": {"path": "data/docs/X.txt", "chunk_id": 0}},
+    })
+    manifest = IngestManifest(tmp_path / "manifest.sqlite3")
+
+    delta, _ = run("data/docs", ChromaSink(collection=col), manifest)
+
+    assert delta.added == [str(base / "X.txt")]
+    assert list(col.rows) == [f"{base / 'X.txt'}_0"]
+    assert col.rows[f"{base / 'X.txt'}_0"]["meta"]["path"] == str(base / "X.txt")
@@ -0,0 +1,134 @@
+# tests/test_ingest_pdf.py
+# pypdf の代わりに「\f 区切りのテキスト」を PDF として読む偽 reader を使う
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rag.ingest import extract, pdf_loader, text_cache
+from rag.ingest.loader import iter_documents
+from rag.ingest.pipeline import IngestPipeline
+from rag.qa import cite
+from rag.retriever import _to_result
+
+OPENED = []
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+
+class FakeReader:
+    def __init__(self, path):
+        OPENED.append(path)
+        self.pages = [FakePage(t) for t in Path(path).read_text(encoding="utf-8").split("\f")]
+
+
+@pytest.fixture(autouse=True)
+def fake_pdf(monkeypatch, tmp_path):
+    OPENED.clear()
+    monkeypatch.setattr(pdf_loader, "_open", FakeReader)
+    monkeypatch.setattr(text_cache, "_cache", text_cache.TextCache(tmp_path / "text_cache.sqlite3"))
+
+
+def write_pdf(path: Path, pages):
+    path.write_text("\f".join(pages), encoding="utf-8")
+    return path
+
+
+def test_load_pdf_pages_offsets(tmp_path):
+    pdf = write_pdf(tmp_path / "a.pdf", ["一頁目。", "二頁目の本文。", ""])
+    text, pages = pdf_loader.load_pdf_pages(pdf, workers=1)
+
+    assert text == "一頁目。\n\n二頁目の本文。\n\n"
+    assert pages == [0, 6, 15]
+    assert text[pages[1]:].startswith("二頁目")
+
+
+# 偽 reader は monkeypatch で差し替えているので、worker に引き継がれるのは fork のときだけ
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="worker processes do not inherit the patched reader without fork",
+)
+def test_parallel_pages_keep_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_loader, "PARALLEL_MIN_PAGES", 4)
+    monkeypatch.setattr(pdf_loader, "PAGES_PER_TASK", 3)
+    pages = [f"page {i}" for i in range(20)]
+    pdf = write_pdf(tmp_path / "big.pdf", pages)
+
+    out = list(pdf_loader.iter_pdf_pages(pdf, workers=3))
+
+    assert out == [(i + 1, t) for i, t in enumerate(pages)]
+    assert list(pdf_loader.iter_pdf_pages(pdf, workers=1)) == out
+
+
+def test_extract_document_caches_by_hash(tmp_path):
+    pdf = write_pdf(tmp_path / "a.pdf", ["本文一。", "本文二。"])
+
+    first = extract.extract_document(pdf)
+    second = extract.extract_document(pdf)
+    assert (second.text, second.pages) == (first.text, first.pages)
+    assert len(OPENED) == 1
+
+    # 同じ内容なら別のパスでもパースしない
+    copy = write_pdf(tmp_path / "copy.pdf", ["本文一。", "本文二。"])
+    extract.extract_document(copy)
+    assert len(OPENED) == 1
+
+    write_pdf(pdf, ["書き換えた本文。"])
+    assert extract.extract_document(pdf).text == "書き換えた本文。"
+    assert len(OPENED) == 2
+
+
+def run_pipeline(base: Path):
+    records = []
+
+    class Sink:
+        def write(self, recs, vecs):
+            records.extend(recs)
+            return len(recs)
+
+    IngestPipeline(
+        Sink(), workers=0, max_tokens=30, overlap_tokens=0,
+        encode_fn=lambda texts: np.zeros((len(texts), 4), dtype="float32"),
+    ).run(iter_documents(base))
+    return records
+
+
+def test_pipeline_records_page_numbers(tmp_path):
+    base = tmp_path / "docs"
+    base.mkdir()
+    write_pdf(base / "contract.pdf", [f"第{i}条 契約の内容を定める。" * 6 for i in range(1, 5)])
+    (base / "memo.txt").write_text("メモ。", encoding="utf-8")
+
+    records = run_pipeline(base)
+
+    pdf_records = [r for r in records if r["meta"]["path"].endswith(".pdf")]
+    assert {r["meta"]["page"] for r in pdf_records} == {1, 2, 3, 4}
+    for r in pdf_records:
+        assert f"第{r['meta']['page']}条" in r["text"]
+        assert r["meta"]["page"] <= r["meta"]["page_end"]
+
+    memo = [r for r in records if r["meta"]["path"].endswith(".txt")]
+    assert "page" not in memo[0]["meta"]
+
+
+def test_pipeline_record_is_citable(tmp_path):
+    # store 段に渡る record の meta が検索結果（_to_result）→ cite までそのまま通る
+    base = tmp_path / "docs"
+    base.mkdir()
+    write_pdf(base / "contract.pdf", ["第1条 本文。", "第2条 本文。"])
+
+    records = run_pipeline(base)
+    rec = records[0]
+    result = _to_result(dict(rec["meta"], text=rec["text"]), 0.8).to_dict()
+
+    assert result["source"] == "contract.pdf"
+    assert result["chunk_index"] == 0
+    assert result["score"] == 0.8
+    assert cite(result) == "contract.pdf / chunk 0 / p.1-2"
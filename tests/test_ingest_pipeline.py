@@ -0,0 +1,115 @@
+# tests/test_ingest_pipeline.py
+import time
+
+import numpy as np
+import pytest
+
+from rag.ingest.loader import iter_documents
+from rag.ingest.pipeline import IngestPipeline
+
+DIM = 8
+
+
+def fake_encode(texts):
+    return np.ones((len(texts), DIM), dtype="float32")
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+        self.batches = 0
+
+    def write(self, records, vecs):
+        assert vecs.shape == (len(records), DIM)
+        self.records.extend(records)
+        self.batches += 1
+        return len(records)
+
+
+def make_tree(tmp_path, n=6):
+    for i in range(n):
+        sub = tmp_path / f"d{i % 2}"
+        sub.mkdir(exist_ok=True)
+        body = "\n\n".join(f"第{j}条 契約の内容を定める。" * 5 for j in range(10))
+        (sub / f"doc{i}.txt").write_text(body, encoding="utf-8")
+    (tmp_path / "photo.jpg").write_bytes(b"\xff\xd8")
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_pipeline_streams_all_chunks(tmp_path, workers):
+    base = make_tree(tmp_path)
+    sink = ListSink()
+
+    result = IngestPipeline(
+        sink, workers=workers, queue_size=2, embed_batch=5, store_batch=1, max_tokens=60,
+        encode_fn=fake_encode,
+    ).run(iter_documents(base))
+
+    m = result.metrics
+    assert m["extract"].items_out == 6
+    assert m["chunk"].items_out == m["embed"].items_out == m["store"].items_out == len(sink.records)
+    assert result.rows == len(sink.records) > 6
+    # encode / 書き込みは embed_batch 件ずつ（store_batch=1 なのでまとめない）
+    assert sink.batches == -(-len(sink.records) // 5)
+
+    ids = [r["id"] for r in sink.records]
+    assert len(set(ids)) == len(ids)
+    r = sink.records[0]
+    assert r["id"] == f"{r['meta']['path']}_{r['meta']['chunk_id']}"
+    # retriever / qa と同じ schema（source はファイル名、chunk_index）
+    assert r["meta"]["source"] == r["meta"]["name"]
+    assert r["meta"]["chunk_index"] == r["meta"]["chunk_id"]
+
+
+def test_store_coalesces_queued_batches(tmp_path):
+    base = make_tree(tmp_path)
+
+    class SlowSink(ListSink):
+        def __init__(self):
+            super().__init__()
+            self.sizes = []
+
+        def write(self, records, vecs):
+            # 最初の書き込みが遅い間に embed 済みのバッチがキューに溜まる
+            if not self.sizes:
+                time.sleep(0.3)
+            self.sizes.append(len(records))
+            return super().write(records, vecs)
+
+    sink = SlowSink()
+    IngestPipeline(
+        sink, workers=0, queue_size=64, embed_batch=5, store_batch=20, max_tokens=60,
+        encode_fn=fake_encode,
+    ).run(iter_documents(base))
+
+    assert sum(sink.sizes) == len(sink.records)
+    assert sink.batches < -(-len(sink.records) // 5)
+    assert max(sink.sizes) <= 20 + 5 - 1
+    ids = [r["id"] for r in sink.records]
+    assert len(set(ids)) == len(ids)
+
+
+def test_extract_failures_are_recorded(tmp_path):
+    (tmp_path / "ok.txt").write_text("本文。", encoding="utf-8")
+    (tmp_path / "broken.docx").write_bytes(b"not a zip")
+    sink = ListSink()
+
+    result = IngestPipeline(sink, workers=0, encode_fn=fake_encode).run(iter_documents(tmp_path))
+
+    assert result.metrics["extract"].errors == 1
+    assert [p for p, _ in result.failures] == [str(tmp_path / "broken.docx")]
+    assert [r["text"] for r in sink.records] == ["本文。"]
+
+
+def test_stage_error_stops_pipeline(tmp_path):
+    base = make_tree(tmp_path)
+
+    class FailingSink:
+        def write(self, records, vecs):
+            raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        IngestPipeline(
+            FailingSink(), workers=0, queue_size=1, embed_batch=2, encode_fn=fake_encode
+        ).run(iter_documents(base))
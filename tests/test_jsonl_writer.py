@@ -0,0 +1,97 @@
+# tests/test_jsonl_writer.py
+import gzip
+import json
+import os
+import time
+
+import pytest
+
+from rag.jsonl_writer import JsonlWriter
+
+
+def read_jsonl(path):
+    return [json.loads(x) for x in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_batched_write_and_flush(tmp_path):
+    path = tmp_path / "logs" / "errors.jsonl"
+    w = JsonlWriter(path, batch_size=4)
+
+    for i in range(10):
+        w.write({"i": i, "msg": "Wire.begin() がありません"})
+    assert w.flush(timeout=5)
+
+    assert [r["i"] for r in read_jsonl(path)] == list(range(10))
+    w.close()
+
+
+def test_size_rotation_gzips_old_segments(tmp_path):
+    path = tmp_path / "errors.jsonl"
+    w = JsonlWriter(path, batch_size=1, max_bytes=50)
+
+    for i in range(6):
+        w.write({"i": i, "pad": "x" * 40})
+        w.flush(timeout=5)
+    w.close()
+
+    segments = sorted(tmp_path.glob("errors.*.jsonl.gz"))
+    assert segments and w.rotations == len(segments)
+
+    rows = []
+    for seg in segments:
+        with gzip.open(seg, "rt", encoding="utf-8") as f:
+            rows.extend(json.loads(x) for x in f)
+    rows.extend(read_jsonl(path))
+    assert sorted(r["i"] for r in rows) == list(range(6))
+
+
+def test_close_flushes_pending(tmp_path):
+    path = tmp_path / "errors.jsonl"
+    w = JsonlWriter(path, flush_interval=60)
+    for i in range(100):
+        w.write({"i": i})
+    w.close()
+
+    assert len(read_jsonl(path)) == 100
+
+
+def read_segments(tmp_path):
+    rows = []
+    for seg in sorted(tmp_path.glob("errors.*.jsonl.gz")):
+        with gzip.open(seg, "rt", encoding="utf-8") as f:
+            rows.extend(json.loads(x) for x in f)
+    return rows
+
+
+def test_reopened_old_segment_is_rotated(tmp_path):
+    path = tmp_path / "errors.jsonl"
+    w = JsonlWriter(path, rotate_interval=3600)
+    w.write({"i": 0})
+    w.close()
+    assert (tmp_path / "errors.jsonl.start").exists()
+
+    # 2 時間前に始まったセグメントとして開き直す（追記しても起点は動かない）
+    (tmp_path / "errors.jsonl.start").write_text(repr(time.time() - 7200), encoding="utf-8")
+    w = JsonlWriter(path, rotate_interval=3600)
+    w.write({"i": 1})
+    w.close()
+
+    assert w.rotations == 1
+    assert [r["i"] for r in read_segments(tmp_path)] == [0]
+    assert [r["i"] for r in read_jsonl(path)] == [1]
+
+
+def test_reopened_segment_without_sidecar_uses_file_times(tmp_path):
+    path = tmp_path / "errors.jsonl"
+    path.write_text(json.dumps({"i": 0}) + "\n", encoding="utf-8")
+    if hasattr(path.stat(), "st_birthtime"):
+        pytest.skip("st_birthtime がある環境では作成時刻から数える")
+    old = time.time() - 7200
+    os.utime(path, (old, old))
+
+    w = JsonlWriter(path, rotate_interval=3600)
+    w.write({"i": 1})
+    w.close()
+
+    assert w.rotations == 1
+    assert [r["i"] for r in read_jsonl(path)] == [1]
@@ -0,0 +1,61 @@
+# tests/test_log_analytics.py
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from rag.log_analytics import LogAnalytics
+
+NOW = datetime.utcnow()
+
+
+def rec(hours_ago, rule="spi", target="#include <SPI.h>", severity="warning"):
+    return {
+        "ts": (NOW - timedelta(hours=hours_ago)).isoformat(),
+        "errors": [
+            {"rule": rule, "target": target, "severity": severity, "message": "msg"}
+        ],
+    }
+
+
+def append(path, records, tail=""):
+    with path.open("a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        f.write(tail)
+
+
+def test_incremental_update_and_window(tmp_path):
+    log = tmp_path / "validation_errors.jsonl"
+    append(log, [rec(1), rec(2), rec(48)], tail='{"ts": "partial')
+
+    with LogAnalytics(log) as la:
+        assert la.update() == 3
+        assert la.update() == 0  # checkpoint 以降の追記なし / 書きかけ行は読まない
+
+        append(log, [], tail='"}\n')  # 書きかけ行が壊れた JSON で完結
+        append(log, [rec(0, severity="error")])
+        assert la.update() == 1
+
+        w = la.window(24, now=NOW, severity="warning")
+        assert w[("spi", "#include <SPI.h>")].count == 2
+        assert la.window(72, now=NOW)[("spi", "#include <SPI.h>")].count == 4
+        assert la.last_seen()["spi"]["#include <SPI.h>"] <= NOW
+
+
+def test_rotation_reads_rest_of_old_segment(tmp_path):
+    log = tmp_path / "validation_errors.jsonl"
+    append(log, [rec(i) for i in range(20)])
+
+    with LogAnalytics(log) as la:
+        assert la.update() == 20
+
+        # checkpoint 後に追記 → ローテーション（gzip）→ 新セグメントに追記
+        append(log, [rec(0, rule="late")])
+        seg = tmp_path / "validation_errors.20250101-000000.jsonl.gz"
+        with gzip.open(seg, "wb") as f:
+            f.write(log.read_bytes())
+        log.unlink()
+        append(log, [rec(0, rule="new")])
+
+        assert la.update() == 2
+        assert {"late", "new"} <= set(la.last_seen())
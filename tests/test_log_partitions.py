@@ -0,0 +1,81 @@
+# tests/test_log_partitions.py
+import json
+import threading
+from datetime import datetime, timedelta
+
+from rag.log_analytics import LogAnalytics
+from rag.log_partitions import PartitionedWriter, PartitionManifest, select_partitions
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+
+def rec(days_ago, rule="spi"):
+    return {
+        "ts": (NOW - timedelta(days=days_ago)).isoformat(),
+        "rule": rule,
+        "target": "#include <SPI.h>",
+        "severity": "warning",
+        "message": "msg",
+    }
+
+
+def test_writer_routes_records_by_date(tmp_path):
+    w = PartitionedWriter(tmp_path)
+    for days in (2, 0, 0):
+        w.write(rec(days))
+    w.flush(timeout=5)
+
+    lines = (tmp_path / "2026-10-18.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert (tmp_path / "2026-10-16.jsonl").exists()
+
+
+def test_concurrent_writes_across_day_boundary(tmp_path):
+    w = PartitionedWriter(tmp_path)
+    per_thread = 200
+
+    def worker(offset):
+        # 日付が前後するレコード（0 / 1 / 2 日前）を交互に書く
+        for i in range(per_thread):
+            w.write(rec((i + offset) % 3))
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for writer in list(w._writers.values()):
+        writer.close()
+
+    total = sum(
+        len(p.read_text(encoding="utf-8").splitlines()) for p in tmp_path.glob("*.jsonl")
+    )
+    assert total == 8 * per_thread
+    assert len(w._writers) <= PartitionedWriter.OPEN_PARTITIONS
+
+
+def test_manifest_prunes_partitions(tmp_path):
+    for days in (0, 3, 10):
+        path = tmp_path / f"{(NOW - timedelta(days=days)):%Y-%m-%d}.jsonl"
+        path.write_text(json.dumps(rec(days)) + "\n", encoding="utf-8")
+
+    selected = select_partitions(tmp_path, since=NOW - timedelta(hours=72))
+    assert [p.name for p in selected] == ["2026-10-15.jsonl", "2026-10-18.jsonl"]
+
+    # 追記分だけ読み直して max_ts を更新する
+    with (tmp_path / "2026-10-18.jsonl").open("a", encoding="utf-8") as f:
+        f.write(json.dumps({**rec(0), "ts": "2026-10-18T23:00:00"}) + "\n")
+    m = PartitionManifest(tmp_path)
+    assert m.refresh()
+    assert m.partitions["2026-10-18.jsonl"]["count"] == 2
+    assert m.partitions["2026-10-18.jsonl"]["max_ts"] == "2026-10-18T23:00:00"
+
+
+def test_analytics_reads_only_overlapping_partitions(tmp_path):
+    for days, rule in ((0, "new"), (10, "old")):
+        path = tmp_path / f"{(NOW - timedelta(days=days)):%Y-%m-%d}.jsonl"
+        path.write_text(json.dumps(rec(days, rule)) + "\n", encoding="utf-8")
+
+    with LogAnalytics(tmp_path) as la:
+        assert la.update(since=NOW - timedelta(hours=24)) == 1
+        assert set(la.last_seen()) == {"new"}
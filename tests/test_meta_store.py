@@ -0,0 +1,83 @@
+# tests/test_meta_store.py
+import json
+
+import numpy as np
+import pytest
+
+from rag.meta_store import MetaStore
+
+faiss = pytest.importorskip("faiss")
+
+from rag import vector_store
+from rag.vector_store import VectorStore
+
+DIM = vector_store.EMBED_DIM
+
+
+def rows(n):
+    return [{"source": "a.md", "chunk_index": i, "text": f"本文{i}", "page": i + 1} for i in range(n)]
+
+
+def test_insert_get_and_truncate(tmp_path):
+    meta = MetaStore(tmp_path / "meta.sqlite3")
+    meta.insert(0, rows(5))
+    meta.commit()
+
+    got = meta.get_many([4, 1, 99])
+    assert set(got) == {1, 4}
+    # BASE_KEYS 以外は extra に入って戻ってくる
+    assert got[4] == {"source": "a.md", "chunk_index": 4, "text": "本文4", "page": 5}
+
+    meta.truncate(2)
+    assert len(meta) == 2
+    assert list(meta.iter_texts(batch_size=1)) == [(0, "本文0"), (1, "本文1")]
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "meta.json"
+    legacy.write_text(json.dumps(rows(3), ensure_ascii=False), encoding="utf-8")
+
+    meta = MetaStore(tmp_path / "meta.sqlite3", legacy_json=legacy)
+    assert len(meta) == 3
+    assert meta.get_many([2])[2]["page"] == 3
+    meta.close()
+
+    # DB に行があれば JSON は読み直さない
+    legacy.write_text(json.dumps(rows(1)), encoding="utf-8")
+    assert len(MetaStore(tmp_path / "meta.sqlite3", legacy_json=legacy)) == 3
+
+
+def test_load_truncates_rows_beyond_index(tmp_path):
+    # flush 途中で落ちて meta だけ先に進んだ状態
+    index = faiss.IndexFlatIP(DIM)
+    index.add(vector_store.normalize(np.ones((2, DIM), dtype="float32")))
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    meta = MetaStore(tmp_path / "meta.sqlite3")
+    meta.insert(0, rows(4))
+    meta.close()
+
+    store = VectorStore(tmp_path / "faiss.index", tmp_path / "meta.sqlite3", checkpoint_every=None)
+    assert len(store) == 2
+    assert len(MetaStore(tmp_path / "meta.sqlite3")) == 2
+
+
+def test_legacy_l2_index_and_json_are_converted_on_load(tmp_path):
+    # 旧形式: 未正規化ベクトルの L2 index + meta.json
+    rng = np.random.default_rng(0)
+    vecs = (rng.standard_normal((3, DIM)) * 5).astype("float32")
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vecs)
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    (tmp_path / "meta.json").write_text(json.dumps(rows(3), ensure_ascii=False), encoding="utf-8")
+
+    store = VectorStore(tmp_path / "faiss.index", tmp_path / "meta.sqlite3", checkpoint_every=None)
+    hits = store.search_by_vector(vecs[1], k=3)
+
+    # 内積 index に正規化して移し替え → score は cosine 類似度
+    assert hits[0]["text"] == "本文1"
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert all(-1.0 - 1e-5 <= h["score"] <= 1.0 + 1e-5 for h in hits)
+    assert store.dirty
+
+    store.flush()
+    assert faiss.read_index(str(tmp_path / "faiss.index")).metric_type == faiss.METRIC_INNER_PRODUCT
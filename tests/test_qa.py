@@ -0,0 +1,81 @@
+# tests/test_qa.py
+import functools
+
+import pytest
+
+from rag.qa import LOW_CONFIDENCE_ANSWER, answer_with_llm, build_prompt, cite, is_confident
+from rag.query_cache import answer_cache
+
+
+def ctx(score):
+    return {"text": "Wire.begin();", "source": "doc.md", "chunk_index": 0, "score": score}
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return "answer"
+
+
+@pytest.fixture(autouse=True)
+def _clear_answer_cache():
+    answer_cache.clear()
+    yield
+    answer_cache.clear()
+
+
+def test_low_score_skips_llm():
+    llm = FakeLLM()
+    answer = answer_with_llm("I2C?", [ctx(0.1), ctx(0.2)], llm, min_score=0.3)
+
+    assert answer == LOW_CONFIDENCE_ANSWER
+    assert llm.prompts == []
+
+
+def test_high_score_calls_llm():
+    llm = FakeLLM()
+    answer = answer_with_llm("I2C?", [ctx(0.1), ctx(0.8)], llm, min_score=0.3)
+
+    assert answer == "answer"
+    assert len(llm.prompts) == 1
+
+
+def test_contexts_without_scores_are_not_blocked():
+    assert is_confident([{"text": "x", "source": "a", "chunk_index": 0}])
+
+
+def test_cite_includes_pdf_pages():
+    assert cite(ctx(0.5)) == "doc.md / chunk 0"
+    assert cite({**ctx(0.5), "meta": {"page": 3, "page_end": 3}}) == "doc.md / chunk 0 / p.3"
+    c = {**ctx(0.5), "meta": {"page": 3, "page_end": 4}}
+    assert "[doc.md / chunk 0 / p.3-4]" in build_prompt("I2C?", [c])
+
+
+def test_answer_cache_does_not_mix_lambdas_or_partials():
+    contexts = [ctx(0.8)]
+
+    assert answer_with_llm("I2C?", contexts, lambda p: "A", min_score=0.3) == "A"
+    assert answer_with_llm("I2C?", contexts, lambda p: "B", min_score=0.3) == "B"
+
+    def reply(text, prompt):
+        return text
+
+    assert answer_with_llm("I2C?", contexts, functools.partial(reply, "C"), min_score=0.3) == "C"
+    assert answer_with_llm("I2C?", contexts, functools.partial(reply, "D"), min_score=0.3) == "D"
+
+
+def test_answer_cache_is_shared_by_llm_name():
+    first, second = FakeLLM(), FakeLLM()
+    contexts = [ctx(0.8)]
+
+    answer_with_llm("I2C?", contexts, first, min_score=0.3, llm_name="ollama")
+    answer_with_llm("I2C?", contexts, second, min_score=0.3, llm_name="ollama")
+    assert (len(first.prompts), len(second.prompts)) == (1, 0)
+
+    # 同じオブジェクトなら名前なしでもキャッシュが効く
+    answer_with_llm("I2C?", contexts, first, min_score=0.3)
+    answer_with_llm("I2C?", contexts, first, min_score=0.3)
+    assert len(first.prompts) == 2
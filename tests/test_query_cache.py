@@ -0,0 +1,29 @@
+# tests/test_query_cache.py
+import time
+
+from rag.query_cache import TTLCache, normalize_query
+
+
+def test_lru_eviction_and_stats():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1      # a を最近使用に
+    c.set("c", 3)               # b が追い出される
+
+    assert c.get("b") is None
+    assert c.get("c") == 3
+    assert c.stats()["hits"] == 2
+    assert c.stats()["misses"] == 1
+
+
+def test_ttl_expiry():
+    c = TTLCache(maxsize=10, ttl=0.01)
+    c.set("a", 1)
+    time.sleep(0.02)
+    assert c.get("a") is None
+    assert len(c) == 0
+
+
+def test_normalize_query():
+    assert normalize_query("  I2C  の\t設定 ") == "I2C の 設定"
@@ -0,0 +1,145 @@
+# tests/test_retriever.py
+import inspect
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from rag import retriever as retriever_mod
+from rag.chroma_config import CHROMA_COLLECTION, CHROMA_PATH, chunk_id
+from rag.query_cache import retrieval_cache
+from rag.retriever import ChromaRetriever, NumpyRetriever, SearchResult, retrieve_chunks
+
+
+def items(n):
+    return [
+        {"text": f"chunk {i}", "source": "doc.md", "chunk_index": i}
+        for i in range(n)
+    ]
+
+
+def test_numpy_retriever_ranks_by_cosine():
+    r = NumpyRetriever(dim=3, capacity=1)  # capacity 超過で拡張される
+    vecs = np.array(
+        [[1, 0, 0], [0, 1, 0], [0.9, 0.1, 0], [0, 0, 1]],
+        dtype=np.float32,
+    )
+    assert r.add(items(4), embeddings=vecs) == 4
+
+    results = r.search_by_vector(np.array([1, 0, 0], dtype=np.float32), k=2)
+
+    assert all(isinstance(x, SearchResult) for x in results)
+    assert [x.chunk_index for x in results] == [0, 2]
+    assert results[0].score == pytest.approx(1.0)
+    assert results[0].score >= results[1].score
+
+
+def test_numpy_retriever_empty():
+    r = NumpyRetriever(dim=3)
+    assert r.search_by_vector(np.ones(3, dtype=np.float32)) == []
+
+
+class FakeChromaCollection:
+    """
+    query は保存済みベクトルとの距離を hnsw:space に従って返す
+    """
+
+    name = "fake"
+
+    def __init__(self, space=None):
+        self.metadata = {"hnsw:space": space} if space else None
+        self.data = {}
+
+    @property
+    def rows(self):
+        return list(self.data.values())
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        self.data.update(zip(ids, zip(documents, metadatas, np.asarray(embeddings))))
+
+    def delete(self, ids):
+        for i in ids:
+            self.data.pop(i, None)
+
+    def query(self, query_embeddings, n_results, include):
+        q = np.asarray(query_embeddings[0])
+        space = (self.metadata or {}).get("hnsw:space", "l2")
+        dists = []
+        rows = self.rows
+        for _, _, v in rows:
+            if space == "l2":
+                dists.append(float(((q - v) ** 2).sum()))
+            else:
+                dists.append(1.0 - float(q @ v))
+        order = np.argsort(dists)[:n_results]
+        return {
+            "documents": [[rows[i][0] for i in order]],
+            "metadatas": [[rows[i][1] for i in order]],
+            "distances": [[dists[i] for i in order]],
+        }
+
+
+@pytest.mark.parametrize("space", ["cosine", "l2", None])
+def test_chroma_scores_are_cosine_in_any_space(space):
+    r = ChromaRetriever(collection=FakeChromaCollection(space))
+    vecs = np.array([[2, 0, 0], [0, 3, 0], [1, 1, 0]], dtype=np.float32)
+    r.add(items(3), embeddings=vecs)
+
+    results = r.search_by_vector(np.array([1, 0, 0], dtype=np.float32), k=3)
+
+    assert [x.chunk_index for x in results] == [0, 2, 1]
+    assert [x.score for x in results] == pytest.approx([1.0, 2 ** -0.5, 0.0], abs=1e-6)
+
+
+def test_chroma_rejects_unknown_space():
+    with pytest.raises(ValueError):
+        ChromaRetriever(collection=FakeChromaCollection("manhattan"))
+
+
+def test_chroma_ids_match_ingest_and_replace_legacy_ids():
+    col = FakeChromaCollection("cosine")
+    # 旧 id（{source}-{chunk_index}）で入っている行
+    col.upsert(["doc.md-0"], ["old"], np.ones((1, 3)), [{"source": "doc.md", "chunk_index": 0}])
+
+    r = ChromaRetriever(collection=col)
+    r.add(items(2), embeddings=np.eye(3, dtype=np.float32)[:2])
+    r.add([{**items(1)[0], "path": "data/docs/doc.md"}], embeddings=np.eye(3, dtype=np.float32)[:1])
+
+    # rag.ingest（store_in_chroma / pipeline）と同じ {path}_{chunk_index}
+    assert sorted(col.data) == ["data/docs/doc.md_0", "doc.md_0", "doc.md_1"]
+    assert chunk_id("data/docs/doc.md", 0) == "data/docs/doc.md_0"
+
+
+def test_search_and_ingest_share_chroma_config():
+    vectorize = pytest.importorskip("rag.ingest.vectorize")
+    sink = inspect.signature(vectorize.ChromaSink).parameters
+    searcher = inspect.signature(ChromaRetriever).parameters
+    assert sink["path"].default == searcher["path"].default == CHROMA_PATH
+    assert sink["collection_name"].default == searcher["collection_name"].default == CHROMA_COLLECTION
+
+
+class FakeBackend:
+    name = "fake"
+    version = 0
+
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, query, k=5):
+        self.calls += 1
+        return [SearchResult("Wire.begin();", "doc.pdf", 0, 0.9, {"page": 3, "tags": ["i2c"]})]
+
+
+def test_retrieve_chunks_copies_meta_out_of_the_cache(monkeypatch):
+    monkeypatch.setitem(retriever_mod.BACKENDS, "fake", FakeBackend)
+    monkeypatch.setattr(retriever_mod, "_retrievers", {})
+    retrieval_cache.clear()
+
+    first = retrieve_chunks("I2C?", backend="fake")
+    first[0]["meta"]["page"] = 99
+    first[0]["meta"]["tags"].append("edited")
+
+    second = retrieve_chunks("I2C?", backend="fake")
+    assert retriever_mod._retrievers["fake"].calls == 1
+    assert second[0]["meta"] == {"page": 3, "tags": ["i2c"]}
+    retrieval_cache.clear()
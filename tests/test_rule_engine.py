@@ -0,0 +1,71 @@
+# tests/test_rule_engine.py
+import os
+
+from rag.core import evaluate
+from rag.rule_engine import RuleMatcher, get_matcher
+
+RULES = {
+    "closing": {
+        "severity": "warning",
+        "must_include": ["ご確認のほど", "以上"],
+    },
+    "inquiry": {
+        "severity": "warning",
+        "must_include": ["ご確認", "ご承認"],
+        "target_severity": {"ご承認": "error"},
+    },
+    "ambiguous": {
+        "forbid": ["適宜", "なるべく"],
+    },
+    "rag_confidence": {"threshold": 0.25},
+}
+
+
+def test_single_scan_reports_per_rule_hits():
+    m = RuleMatcher(RULES)
+    hits = m.match("ご確認のほどお願いします。適宜対応します。以上")
+
+    assert set(hits) == {"closing", "inquiry", "ambiguous"}
+    assert hits["closing"].ok
+    # ご確認のほど の中の ご確認 も検出される
+    assert hits["inquiry"].found == ["ご確認"]
+    assert hits["inquiry"].missing == ["ご承認"]
+    assert hits["ambiguous"].forbidden == ["適宜"]
+
+
+def test_validate_uses_target_severity():
+    results = RuleMatcher(RULES).validate("ご確認ください", ["inquiry"])
+
+    assert [(r.rule, r.target, r.severity) for r in results] == [
+        ("inquiry", "ご承認", "error"),
+    ]
+
+
+def test_hot_reload(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text("a:\n  must_include: [foo]\n", encoding="utf-8")
+    assert get_matcher(path).match("foo")["a"].ok
+
+    path.write_text("a:\n  must_include: [barbaz]\n", encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    assert get_matcher(path).match("foo")["a"].missing == ["barbaz"]
+
+
+def test_evaluate_enforces_rules_yaml():
+    m = RuleMatcher({
+        **RULES,
+        "wifi": {"severity": "warning", "must_include": ["#include <WiFi.h>"]},
+        "i2c": {"severity": "error", "must_include": ["#include <Wire.h>", "Wire.begin()"]},
+    })
+    text = "```cpp\nvoid setup() { wire.begin( ); }\n```\n適宜ご確認ください"
+    results = evaluate(text, ["i2c", "wifi", "inquiry", "ambiguous"], matcher=m)
+
+    # i2c は Python の check が判定する（wire.begin( ) も通る。rules.yaml のリテラルは見ない）
+    assert [(r.rule, r.target) for r in results] == [
+        ("wifi", "#include <WiFi.h>"),
+        ("inquiry", "ご承認"),
+        ("ambiguous", "適宜"),
+    ]
+    assert results[2].message == "適宜 は使用禁止です"
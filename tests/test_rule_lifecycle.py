@@ -0,0 +1,147 @@
+# tests/test_rule_lifecycle.py
+import json
+import multiprocessing
+from datetime import datetime, timedelta
+
+import yaml
+
+import rag.core as core
+import rag.validate as validate
+from rag.log_analytics import LogAnalytics
+from rag.rule_engine import get_matcher
+from rag.rule_lifecycle import load_rules, rules_version, run_once, update_rules
+
+NOW = datetime.utcnow()
+
+RULES = {
+    "spi": {
+        "severity": "warning",
+        "auto_promote": {"enabled": True, "threshold": 2, "window_hours": 24},
+        "auto_demote": {"enabled": True, "cooldown_hours": 72},
+        "target_severity": {"#include <SPI.h>": "warning"},
+    },
+    "wifi": {
+        "severity": "warning",
+        "auto_demote": {"enabled": True, "cooldown_hours": 72},
+        "target_severity": {"#include <WiFi.h>": "error"},
+    },
+}
+
+
+def write_rules(path, rules):
+    path.write_text(yaml.safe_dump(rules, allow_unicode=True), encoding="utf-8")
+
+
+def test_update_rules_bumps_version(tmp_path):
+    path = tmp_path / "rules.yaml"
+    write_rules(path, RULES)
+
+    assert update_rules(lambda r: False, path) is None
+    assert update_rules(lambda r: r["spi"].update(severity="error") or True, path) == 1
+    assert update_rules(lambda r: True, path) == 2
+
+    rules = load_rules(path)
+    assert rules_version(rules) == 2
+    assert rules["spi"]["severity"] == "error"
+    assert not list(tmp_path.glob("*.tmp")) and not list(tmp_path.glob("*.lock"))
+
+
+
+def _bump_many(path, n):
+    for _ in range(n):
+        update_rules(lambda r: True, path)
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    # 複数プロセスが同時に書いても、どの更新も上書きで消えない
+    path = tmp_path / "rules.yaml"
+    write_rules(path, RULES)
+
+    procs = [multiprocessing.Process(target=_bump_many, args=(path, 10)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+
+    assert rules_version(load_rules(path)) == 40
+    assert not list(tmp_path.glob("*.lock"))
+
+def test_run_once_promotes_and_demotes_in_one_write(tmp_path):
+    path = tmp_path / "rules.yaml"
+    write_rules(path, RULES)
+
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    with (log_dir / f"{NOW:%Y-%m-%d}.jsonl").open("w", encoding="utf-8") as f:
+        for h in (1, 2):
+            f.write(json.dumps({
+                "ts": (NOW - timedelta(minutes=h)).isoformat(),
+                "rule": "spi",
+                "target": "#include <SPI.h>",
+                "severity": "warning",
+                "message": "SPI.h がありません",
+            }) + "\n")
+
+    with LogAnalytics(log_dir) as la:
+        version, changes = run_once(la, path, now=NOW)
+        assert version == 1
+        assert run_once(la, path, now=NOW) == (None, [])
+
+    rules = load_rules(path)
+    assert rules["spi"]["target_severity"]["#include <SPI.h>"] == "error"
+    assert rules["wifi"]["target_severity"]["#include <WiFi.h>"] == "warning"
+    assert len(changes) == 2
+
+
+def test_get_rules_hot_reload(tmp_path, monkeypatch):
+    path = tmp_path / "rules.yaml"
+    write_rules(path, RULES)
+
+    monkeypatch.setattr(core, "RULES_PATH", path)
+    monkeypatch.setattr(core, "RULES_RELOAD_INTERVAL_SEC", 0.0)
+    monkeypatch.setattr(core, "_rules", None)
+
+    assert core.rules_version() == 0
+    update_rules(lambda r: r.update(rag_confidence={"threshold": 0.5}) or True, path)
+
+    assert core.rules_version() == 1
+    assert core.rag_confidence_threshold() == 0.5
+
+
+def test_meta_is_not_read_as_a_rule(tmp_path, monkeypatch):
+    path = tmp_path / "rules.yaml"
+    write_rules(path, RULES)
+    update_rules(lambda r: True, path)
+    assert "_meta" in load_rules(path)
+
+    monkeypatch.setattr(core, "RULES_PATH", path)
+    monkeypatch.setattr(core, "_rules", None)
+    monkeypatch.setattr(validate, "RULES_PATH", path)
+
+    assert set(core.get_rules()) == set(RULES)
+    assert core.rules_version() == 1
+    assert set(validate.load_rules()) == set(RULES)
+    assert set(get_matcher(path).rules) == set(RULES)
+
+
+def test_records_without_target_are_not_promoted(tmp_path):
+    path = tmp_path / "rules.yaml"
+    write_rules(path, RULES)
+
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    with (log_dir / f"{NOW:%Y-%m-%d}.jsonl").open("w", encoding="utf-8") as f:
+        for h in (1, 2, 3):
+            f.write(json.dumps({
+                "ts": (NOW - timedelta(minutes=h)).isoformat(),
+                "rule": "spi",
+                "severity": "warning",
+                "message": "SPI.begin() がありません",
+            }) + "\n")
+
+    with LogAnalytics(log_dir) as la:
+        version, changes = run_once(la, path, now=NOW, demote=False)
+
+    assert (version, changes) == (None, [])
+    assert None not in load_rules(path)["spi"]["target_severity"]
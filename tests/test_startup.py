@@ -0,0 +1,48 @@
+# tests/test_startup.py
+import subprocess
+import sys
+
+PYTHON = sys.executable
+
+# rag-validate（rag.cli）の import にかけてよい時間の上限 [us]
+IMPORT_BUDGET_US = 300_000
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "faiss", "chromadb")
+
+
+def import_time_us(module: str) -> int:
+    """
+    python -X importtime の出力から module の cumulative [us] を取り出す
+    """
+    result = subprocess.run(
+        [PYTHON, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    for line in result.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+def test_cli_import_within_budget():
+    assert import_time_us("rag.cli") < IMPORT_BUDGET_US
+
+
+def test_cli_import_is_side_effect_free():
+    code = (
+        "import sys, rag.cli, rag.core\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(heavy, rag.core._rules is None)\n"
+    )
+    result = subprocess.run(
+        [PYTHON, "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[] True"
@@ -0,0 +1,66 @@
+# tests/test_stream_validate.py
+import random
+from pathlib import Path
+
+import pytest
+
+from rag.core import evaluate
+from rag.rule_engine import RuleMatcher
+from rag.stream_validate import StreamValidator
+
+DATA_DIR = Path(__file__).parent / "data"
+KEYS = ["common", "i2c_spi", "require_citation", "wire_include", "no_delay"]
+# must_include / forbid もストリームと全文で同じになること
+MATCHER = RuleMatcher({
+    "wire_include": {"severity": "error", "must_include": ["#include <Wire.h>", "Serial.begin"]},
+    "require_citation": {"severity": "error", "must_include": ["[source:"]},
+    "no_delay": {"severity": "warning", "forbid": ["delay("]},
+})
+
+TEXTS = [p.read_text(encoding="utf-8") for p in sorted(DATA_DIR.glob("*.txt"))] + [
+    "x // Wire.begin()\n```cpp\nSPI.begin ( );\n// comment\n```\n[source: a#1]",
+]
+
+
+def feed_randomly(v, text, seed):
+    rnd = random.Random(seed)
+    i = 0
+    while i < len(text):
+        n = rnd.randint(1, 7)
+        v.feed(text[i:i + n])
+        i += n
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_finalize_matches_full_text(text):
+    for seed in range(20):
+        v = StreamValidator(KEYS, cpp_open_within=None, matcher=MATCHER)
+        feed_randomly(v, text, seed)
+        assert v.finalize() == evaluate(text, KEYS, matcher=MATCHER)
+
+
+def test_missing_cpp_block_fails_early():
+    v = StreamValidator(["common"], cpp_open_within=50, matcher=RuleMatcher({}))
+    assert v.feed("はい、以下が説明です。") == []
+
+    failures = v.feed("長い前置き" * 20)
+    assert [r.rule for r in failures] == ["common_cpp_block"]
+    assert v.feed("more") == []  # 同じ失敗は 1 回だけ返す
+
+
+def test_long_preamble_agrees_with_evaluate():
+    # 前置きが長くても ```cpp が来れば evaluate と同じく通る（既定では早期打ち切りしない）
+    text = "説明。" * 1000 + "\n```cpp\nvoid setup() {}\n```\n"
+    v = StreamValidator(["common"], matcher=RuleMatcher({}))
+    for i in range(0, len(text), 64):
+        assert v.feed(text[i:i + 64]) == []
+    assert v.finalize() == evaluate(text, ["common"], matcher=RuleMatcher({})) == []
+
+
+def test_forbidden_literal_across_chunks():
+    matcher = RuleMatcher({"no_delay": {"severity": "error", "forbid": ["delay(1000)"]}})
+    v = StreamValidator(["no_delay"], matcher=matcher)
+
+    assert v.feed("```cpp\nvoid loop() { del") == []
+    failures = v.feed("ay(1000); }")
+    assert [(r.rule, r.target) for r in failures] == [("no_delay", "delay(1000)")]
@@ -5,7 +5,9 @@ from rag.validate import (
     RULES,
     VALIDATE_MAP,
     validate_common,
+    evaluate,
 )
+from rag.rule_engine import RuleMatcher
 
 BASE = Path(__file__).parent / "data"
 
@@ -63,3 +65,37 @@ def test_rule_invalid_detects_missing(rule_key, invalid_file, expected_missing):
         expected_missing in e.message
         for e in errs
     )
+
+
+# =====================
+# evaluate (single-pass engine)
+# =====================
+
+def test_evaluate_runs_common_once():
+    errs = evaluate(load("invalid_no_code_block.txt"), ["common", "i2c"])
+    assert [e.rule for e in errs].count("common_cpp_block") == 1
+
+
+def test_evaluate_matches_validators():
+    for name in ("valid_i2c_spi.txt", "invalid_no_wire_begin.txt", "invalid_no_spi_begin.txt"):
+        text = load(name)
+        for key, v in VALIDATE_MAP.items():
+            assert evaluate(text, [key], rag_scores=[0.5]) == v(text, rag_scores=[0.5])
+
+
+@pytest.mark.parametrize("text", [
+    # check の regex は大文字小文字・空白を許す / // コメント内は数えない
+    "```cpp\n#include <SPI.h>\nvoid setup() { wire.begin( ); SPI.begin(); }\n```",
+    "```cpp\n// Wire.begin()\nvoid setup() { spi.begin(); }\n```",
+    "```cpp\nvoid setup() { Wire.begin(); }\n```\n[source: a.md#1]",
+])
+def test_validators_are_not_changed_by_rules_yaml(text):
+    # rules.yaml の i2c / spi / require_citation の must_include は check と二重に判定しない
+    no_yaml = RuleMatcher({})
+    for key, v in VALIDATE_MAP.items():
+        assert v(text, rag_scores=[0.5]) == evaluate(text, [key], matcher=no_yaml, rag_scores=[0.5])
+
+
+def test_rules_yaml_only_rules_are_enforced():
+    errs = evaluate("```cpp\nvoid setup() {}\n```", ["common", "wifi"])
+    assert [(e.rule, e.target) for e in errs] == [("wifi", "#include <WiFi.h>")]
@@ -0,0 +1,273 @@
+# tests/test_vector_store.py
+# embedding モデルは使わず、テキストから決まる偽のベクトルで VectorStore を動かす
+import zlib
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from rag import vector_store
+from rag.chunk import Chunk
+from rag.vector_store import VectorStore
+
+DIM = vector_store.EMBED_DIM
+
+
+def fake_encode(texts, batch_size=None, **kwargs):
+    return np.stack([
+        np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(DIM).astype("float32")
+        for t in texts
+    ])
+
+
+@pytest.fixture(autouse=True)
+def _fake_encode(monkeypatch):
+    monkeypatch.setattr(vector_store, "encode", fake_encode)
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault("checkpoint_every", None)
+    return VectorStore(tmp_path / "faiss.index", tmp_path / "meta.sqlite3", **kwargs)
+
+
+def items(n, start=0):
+    return [{"text": f"チャンク{i}", "source": "a.md", "chunk_index": i} for i in range(start, start + n)]
+
+
+def test_flush_and_reload(tmp_path):
+    store = make_store(tmp_path)
+    assert store.add_many(items(5), batch_size=2) == 5
+    store.flush()
+
+    reopened = make_store(tmp_path)
+    assert len(reopened) == 5
+    hit = reopened.search("チャンク3", k=1)[0]
+    assert (hit["text"], hit["source"], hit["chunk_index"]) == ("チャンク3", "a.md", 3)
+    assert hit["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_dirty_flag_and_noop_flush(tmp_path):
+    store = make_store(tmp_path)
+    assert not store.dirty
+
+    # 変更が無ければ何も書かない
+    store.flush()
+    assert not (tmp_path / "faiss.index").exists()
+
+    store.add_many(items(2))
+    assert store.dirty
+    # flush までディスクには出ない
+    assert not (tmp_path / "faiss.index").exists()
+
+    store.flush()
+    assert not store.dirty
+    mtime = (tmp_path / "faiss.index").stat().st_mtime_ns
+    store.flush()
+    assert (tmp_path / "faiss.index").stat().st_mtime_ns == mtime
+
+
+def test_checkpoint_every(tmp_path):
+    store = make_store(tmp_path, checkpoint_every=3)
+    store.add_many(items(4), batch_size=1)
+
+    # 3 件目で自動 checkpoint、4 件目は未保存
+    assert store.dirty
+    assert faiss.read_index(str(tmp_path / "faiss.index")).ntotal == 3
+
+    store.flush()
+    assert faiss.read_index(str(tmp_path / "faiss.index")).ntotal == 4
+
+
+def test_flush_writes_tmp_then_renames(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.add_many(items(2))
+    store.flush()
+
+    store.add_many(items(1, start=2))
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vector_store.os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        store.flush()
+
+    # 置き換えに失敗しても元の index は壊れない（書きかけは .tmp 側）
+    assert faiss.read_index(str(tmp_path / "faiss.index")).ntotal == 2
+    assert (tmp_path / "faiss.index.tmp").exists()
+    assert store.dirty
+
+    monkeypatch.undo()
+    monkeypatch.setattr(vector_store, "encode", fake_encode)
+    store.flush()
+    assert not (tmp_path / "faiss.index.tmp").exists()
+    assert len(make_store(tmp_path)) == 3
+
+
+class CountingIndex:
+    """
+    index.add の呼び出しごとの件数を記録する
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self.adds = []
+
+    def add(self, vecs):
+        self.adds.append(len(vecs))
+        self._index.add(vecs)
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+
+def test_add_chunks_encodes_and_adds_once_per_batch(tmp_path, monkeypatch):
+    encoded = []
+
+    def counting_encode(texts, batch_size=None, **kwargs):
+        encoded.append(len(texts))
+        return fake_encode(texts)
+
+    monkeypatch.setattr(vector_store, "encode", counting_encode)
+    store = make_store(tmp_path)
+    store._ensure_loaded()
+    store._index = index = CountingIndex(store._index)
+
+    chunks = (Chunk(f"チャンク{i}", i, 0, 0, "a.md") for i in range(10))
+    assert store.add_chunks(chunks, batch_size=4) == 10
+
+    # 4 + 4 + 残り 2 件（最後の半端なバッチも 1 回で追加される）
+    assert encoded == [4, 4, 2]
+    assert index.adds == [4, 4, 2]
+    assert len(store) == 10
+    hit = store.search("チャンク9", k=1)[0]
+    assert (hit["text"], hit["chunk_index"]) == ("チャンク9", 9)
+
+# =====================
+# index 種別
+# =====================
+# ivf_pq の学習に必要な件数（2 ** PQ_NBITS）を満たす件数
+N_TRAIN = 300
+
+
+@pytest.mark.parametrize("kind", vector_store.INDEX_KINDS)
+def test_index_kind_build_reload_append(tmp_path, kind):
+    store = make_store(tmp_path, index_kind=kind)
+    store.add_many(items(N_TRAIN))
+    store.flush()
+    assert store.current_kind == kind
+
+    reopened = make_store(tmp_path, index_kind=kind)
+    assert reopened.current_kind == kind
+    assert len(reopened) == N_TRAIN
+
+    reopened.add_many(items(5, start=N_TRAIN))
+    reopened.flush()
+
+    again = make_store(tmp_path, index_kind=kind)
+    assert again.current_kind == kind
+    assert len(again) == N_TRAIN + 5
+    # ivf_pq は近似なので上位に入っていればよい
+    texts = [h["text"] for h in again.search(f"チャンク{N_TRAIN + 2}", k=5)]
+    assert f"チャンク{N_TRAIN + 2}" in (texts if kind == "ivf_pq" else texts[:1])
+
+
+def test_small_ivf_pq_falls_back_to_flat(tmp_path):
+    store = make_store(tmp_path, index_kind="ivf_pq")
+    store.add_many(items(10))
+    store.flush()
+
+    # 学習データが足りないうちは flat で持つ
+    assert store.current_kind == "flat"
+    assert make_store(tmp_path, index_kind="ivf_pq").current_kind == "flat"
+
+    store.add_many(items(N_TRAIN, start=10))
+    store.flush()
+    assert store.current_kind == "ivf_pq"
+
+
+def test_auto_switches_kind_at_flush(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "AUTO_FLAT_MAX", 50)
+    store = make_store(tmp_path, index_kind="auto")
+    store.add_many(items(40))
+    store.flush()
+    assert store.current_kind == "flat"
+
+    store.add_many(items(20, start=40))
+    # 切り替えは flush 時
+    assert store.current_kind == "flat"
+    version = store.version
+    store.flush()
+
+    assert store.current_kind == "hnsw"
+    assert store.version > version
+    assert make_store(tmp_path).current_kind == "hnsw"
+    assert make_store(tmp_path).search("チャンク45", k=1)[0]["text"] == "チャンク45"
+
+
+def test_rebuild_changes_kind(tmp_path):
+    store = make_store(tmp_path, index_kind="flat")
+    store.add_many(items(20))
+    store.flush()
+
+    store.rebuild("hnsw")
+    assert store.current_kind == "hnsw" and store.dirty
+    store.flush()
+
+    reopened = make_store(tmp_path, index_kind="hnsw")
+    assert reopened.current_kind == "hnsw"
+    assert reopened.search("チャンク7", k=1)[0]["text"] == "チャンク7"
+
+    with pytest.raises(ValueError):
+        store.rebuild("annoy")
+
+
+def test_legacy_l2_hnsw_is_converted_on_load(tmp_path):
+    store = make_store(tmp_path, index_kind="hnsw")
+    store.add_many(items(20))
+    store.flush()
+
+    # 同じ行を未正規化ベクトルの L2 HNSW として置き直す（旧形式）
+    vecs = fake_encode([it["text"] for it in items(20)]) * 5
+    legacy = faiss.IndexHNSWFlat(DIM, 32)
+    legacy.add(vecs)
+    faiss.write_index(legacy, str(tmp_path / "faiss.index"))
+
+    reopened = make_store(tmp_path, index_kind="hnsw")
+    hit = reopened.search("チャンク4", k=1)[0]
+    assert reopened.current_kind == "hnsw"
+    assert (hit["text"], hit["score"]) == ("チャンク4", pytest.approx(1.0, abs=1e-5))
+    assert reopened.dirty
+
+    reopened.flush()
+    assert faiss.read_index(str(tmp_path / "faiss.index")).metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+@pytest.mark.parametrize("kind", ["ivf_flat", "ivf_pq"])
+def test_hybrid_scores_bm25_only_hits_on_ivf(tmp_path, monkeypatch, kind):
+    # nprobe=1 でベクトル検索の候補を絞り、BM25 だけでヒットする行を作る
+    monkeypatch.setattr(vector_store, "IVF_NPROBE", 1)
+    store = make_store(tmp_path, index_kind=kind)
+    store.add_many(items(N_TRAIN))
+    store.flush()
+
+    for s in (store, make_store(tmp_path, index_kind=kind)):
+        hits = s.hybrid_search("チャンク", k=40, candidates=1)
+        assert len(hits) == 40
+        assert all(h["score"] is not None for h in hits)
+
+
+def test_rebuild_index_script(tmp_path, monkeypatch, capsys):
+    from scripts import rebuild_index
+
+    monkeypatch.chdir(tmp_path)
+    store = VectorStore(index_kind="flat", checkpoint_every=None)
+    store.add_many(items(20))
+    store.flush()
+
+    monkeypatch.setattr("sys.argv", ["rebuild_index", "--kind", "hnsw"])
+    rebuild_index.main()
+
+    assert "flat → hnsw (20 vectors" in capsys.readouterr().out
+    assert VectorStore(index_kind="hnsw").current_kind == "hnsw"
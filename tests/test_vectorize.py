@@ -0,0 +1,101 @@
+# tests/test_vectorize.py
+# chromadb は使わず、upsert / delete だけを持つ偽 collection に書く
+import numpy as np
+import pytest
+
+from rag.ingest.vectorize import ChromaSink
+
+DIM = 16
+
+
+class FakeCollection:
+    def __init__(self, accept_numpy=True, fail_once=None):
+        self.accept_numpy = accept_numpy
+        self.fail_once = fail_once
+        self.rows = {}
+        self.calls = []
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        if self.fail_once is not None:
+            e, self.fail_once = self.fail_once, None
+            raise e
+        if not isinstance(embeddings, list) and not self.accept_numpy:
+            raise ValueError("Expected embeddings to be a list, got ndarray")
+        self.calls.append((len(ids), embeddings))
+        for i, d, m, e in zip(ids, documents, metadatas, embeddings):
+            self.rows[i] = (d, m, list(e))
+
+    def delete(self, where):
+        paths = set(where["path"]["$in"])
+        self.rows = {k: v for k, v in self.rows.items() if v[1]["path"] not in paths}
+
+
+def make_records(n, path="a.txt"):
+    records = [
+        {"id": f"{path}_{i}", "text": "本文" * 50, "meta": {"path": path, "chunk_id": i}}
+        for i in range(n)
+    ]
+    vecs = np.arange(n * DIM, dtype="float32").reshape(n, DIM)
+    return records, vecs
+
+
+def test_batches_follow_memory_budget_without_copy():
+    col = FakeCollection()
+    sink = ChromaSink(collection=col, memory_budget_mb=0.01)
+    records, vecs = make_records(100)
+
+    assert sink.write(records, vecs) == 100
+
+    per_batch = sink.batch_rows(records, vecs)
+    assert 1 < per_batch < 100
+    assert [n for n, _ in col.calls] == [per_batch] * (100 // per_batch) + (
+        [100 % per_batch] if 100 % per_batch else []
+    )
+    # ndarray の view をそのまま渡している
+    assert all(isinstance(e, np.ndarray) and np.shares_memory(e, vecs) for _, e in col.calls)
+    assert sink.stats()["rows"] == 100
+    assert sink.stats()["batches"] == len(col.calls)
+
+
+def test_falls_back_to_lists_and_shrinks_batches():
+    col = FakeCollection(accept_numpy=False)
+    sink = ChromaSink(collection=col, memory_budget_mb=0.01)
+    records, vecs = make_records(50)
+    numpy_rows = sink.batch_rows(records, vecs)
+
+    sink.write(records, vecs)
+
+    assert len(col.rows) == 50
+    assert all(isinstance(e, list) for _, e in col.calls)
+    # list にすると 1 行が大きくなるので 1 回の行数を減らす（最初のバッチから）
+    list_rows = sink.batch_rows(records, vecs)
+    assert list_rows < numpy_rows
+    assert max(n for n, _ in col.calls) == list_rows
+    assert sink.batches == len(col.calls)
+
+
+def test_other_value_errors_do_not_disable_numpy():
+    col = FakeCollection(fail_once=ValueError("Expected IDs to be unique"))
+    sink = ChromaSink(collection=col)
+    records, vecs = make_records(5)
+
+    with pytest.raises(ValueError, match="unique"):
+        sink.write(records, vecs)
+
+    sink.write(records, vecs)
+    assert all(isinstance(e, np.ndarray) for _, e in col.calls)
+
+
+def test_upsert_is_idempotent_and_delete_by_path():
+    col = FakeCollection()
+    sink = ChromaSink(collection=col)
+    a, va = make_records(10, "a.txt")
+    b, vb = make_records(5, "b.txt")
+
+    sink.write(a, va)
+    sink.write(a, va)  # リトライ
+    sink.write(b, vb)
+    assert len(col.rows) == 15
+
+    sink.delete_paths(["a.txt"])
+    assert {m["path"] for _, m, _ in col.rows.values()} == {"b.txt"}